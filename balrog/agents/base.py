@@ -1,15 +1,44 @@
+import asyncio
+
+
 class BaseAgent:
-    """Base class for agents using prompt-based interactions."""
+    """Base class for agents using prompt-based interactions.
+
+    Subclasses usually implement `build_messages` (and optionally `_extract_final_answer`), which lets the
+    same prompt logic serve both the synchronous `act` and the asynchronous `aact` paths.
+    """
 
     def __init__(self, client_factory, prompt_builder):
         """Initialize the agent with a client and prompt builder."""
         self.client = client_factory()
         self.prompt_builder = prompt_builder
 
-    def act(self, obs):
+    def act(self, obs, prev_action=None):
         """Generate an action based on the observation."""
+        messages = self.build_messages(obs, prev_action=prev_action)
+        response = self.client.generate(messages)
+        return self._extract_final_answer(response)
+
+    async def aact(self, obs, prev_action=None):
+        """Asynchronously generate an action based on the observation.
+
+        Agents that only override `act` are run in a worker thread so they do not block the event loop.
+        """
+        if type(self).build_messages is BaseAgent.build_messages:
+            return await asyncio.to_thread(self.act, obs, prev_action=prev_action)
+
+        messages = self.build_messages(obs, prev_action=prev_action)
+        response = await self.client.agenerate(messages)
+        return self._extract_final_answer(response)
+
+    def build_messages(self, obs, prev_action=None):
+        """Update the prompt with the observation and return the messages to send to the LLM."""
         raise NotImplementedError
 
+    def _extract_final_answer(self, response):
+        """Post-process the LLM response into the final action. Returns the response unchanged by default."""
+        return response
+
     def update_prompt(self, observation, action):
         """Update the prompt with the observation and action."""
         self.prompt_builder.update_observation(observation)
@@ -19,15 +19,15 @@ class ChainOfThoughtAgent(BaseAgent):
         super().__init__(client_factory, prompt_builder)
         self.remember_cot = config.agent.remember_cot
 
-    def act(self, obs, prev_action=None):
-        """Generate the next action using chain-of-thought reasoning based on the current observation.
+    def build_messages(self, obs, prev_action=None):
+        """Build the chain-of-thought prompt messages based on the current observation.
 
         Args:
             obs (dict): The current observation in the environment.
             prev_action (str, optional): The previous action taken.
 
         Returns:
-            LLMResponse: The response containing the final selected action.
+            list: The messages to send to the LLM.
         """
         if prev_action:
             self.prompt_builder.update_action(prev_action)
@@ -44,13 +44,7 @@ Finally, provide a single output action at the end of the message in the form of
 
         messages[-1].content += "\n\n" + cot_instructions
 
-        # Generate the CoT reasoning
-        cot_reasoning = self.client.generate(messages)
-
-        # Extract the final answer from the CoT reasoning
-        final_answer = self._extract_final_answer(cot_reasoning)
-
-        return final_answer
+        return messages
 
     def _extract_final_answer(self, reasoning):
         """Extract the final action from the chain-of-thought reasoning response.
@@ -11,15 +11,15 @@ class CustomAgent(BaseAgent):
         self.client = client_factory()
         self.plan = None
 
-    def act(self, obs, prev_action=None):
-        """Generate the next action and update the plan based on the current observation.
+    def build_messages(self, obs, prev_action=None):
+        """Build the planning prompt messages based on the current observation.
 
         Args:
             obs (dict): The current observation in the environment.
             prev_action (str, optional): The previous action taken.
 
         Returns:
-            LLMResponse: The response containing the updated plan and selected action.
+            list: The messages to send to the LLM.
         """
         if prev_action:
             self.prompt_builder.update_action(prev_action)
@@ -40,8 +40,17 @@ ACTION: <your next action>
         if messages and messages[-1].role == "user":
             messages[-1].content += "\n\n" + plan_text + "\n" + planning_instructions
 
-        response = self.client.generate(messages)
+        return messages
+
+    def _extract_final_answer(self, response):
+        """Update the plan from the LLM response and extract the selected action.
+
+        Args:
+            response (LLMResponse): The response from the LLM.
 
+        Returns:
+            LLMResponse: The response containing the updated plan and selected action.
+        """
         # Extract the plan and action from the LLM's response
         plan, action = self._extract_plan_and_action(response.completion)
 
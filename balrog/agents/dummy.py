@@ -39,3 +39,7 @@ class DummyAgent(BaseAgent):
     def act(self, obs, prev_action=None):
         """Return a dummy action."""
         return make_dummy_action("dummy_action")
+
+    async def aact(self, obs, prev_action=None):
+        """Return a dummy action."""
+        return self.act(obs, prev_action=prev_action)
@@ -24,6 +24,7 @@ class FewShotAgent(BaseAgent):
         self.icl_events = []
         self.max_icl_history = max_icl_history
         self.cached_icl = False
+        self._icl_prompt = None  # Memoized ICL prompt, as (system prompt, messages)
 
     def update_icl_observation(self, obs: dict):
         long_term_context = obs["text"].get("long_term_context", "")
@@ -43,9 +44,20 @@ class FewShotAgent(BaseAgent):
         )
 
     def cache_icl(self):
+        """Register the demonstrations as a prefix cached by the client, instead of resending them inline."""
         self.client.cache_icl_demo(self.get_icl_prompt())
         self.cached_icl = True
 
+    def reset(self):
+        """Reset the prompt builder and drop the demonstrations of the previous episode."""
+        super().reset()
+        self.icl_episodes = []
+        self.icl_events = []
+        self._icl_prompt = None
+        if self.cached_icl:
+            self.client.cache_icl_demo([])
+            self.cached_icl = False
+
     def wrap_episode(self):
         icl_episode = []
         icl_episode.append(
@@ -65,8 +77,20 @@ class FewShotAgent(BaseAgent):
 
         self.icl_episodes.append(icl_episode)
         self.icl_events = []
+        self._icl_prompt = None
 
     def get_icl_prompt(self) -> List[Message]:
+        """Return the ICL prompt: the instruction, the demonstration episodes and the closing message.
+
+        The prompt only changes when an episode is wrapped, the agent is reset or the instruction prompt
+        changes, so it is built once and a new list of the same messages is returned on later calls.
+        """
+        system_prompt = self.prompt_builder.system_prompt
+        if self._icl_prompt is None or self._icl_prompt[0] != system_prompt:
+            self._icl_prompt = (system_prompt, self._build_icl_prompt())
+        return list(self._icl_prompt[1])
+
+    def _build_icl_prompt(self) -> List[Message]:
         icl_instruction = Message(
             role="user",
             content=self.prompt_builder.system_prompt.replace(
@@ -99,15 +123,15 @@ class FewShotAgent(BaseAgent):
 
         return icl_messages
 
-    def act(self, obs, prev_action=None):
-        """Generate the next action based on the observation and previous action.
+    def build_messages(self, obs, prev_action=None):
+        """Build the prompt messages, prefixed with the ICL demonstrations, for the next action.
 
         Args:
             obs (dict): The current observation in the environment.
             prev_action (str, optional): The previous action taken.
 
         Returns:
-            str: The selected action from the LLM response.
+            list: The messages to send to the LLM.
         """
         if prev_action:
             self.prompt_builder.update_action(prev_action)
@@ -128,11 +152,7 @@ You always have to output one of the above actions at a time and no other text.
         if messages and messages[-1].role == "user":
             messages[-1].content += "\n\n" + naive_instruction
 
-        response = self.client.generate(messages)
-
-        final_answer = self._extract_final_answer(response)
-
-        return final_answer
+        return messages
 
     def _extract_final_answer(self, answer):
         """Sanitize the final answer, keeping only alphabetic characters.
@@ -12,15 +12,15 @@ class NaiveAgent(BaseAgent):
         super().__init__(client_factory, prompt_builder)
         self.client = client_factory()
 
-    def act(self, obs, prev_action=None):
-        """Generate the next action based on the observation and previous action.
+    def build_messages(self, obs, prev_action=None):
+        """Build the prompt messages for the next action based on the observation and previous action.
 
         Args:
             obs (dict): The current observation in the environment.
             prev_action (str, optional): The previous action taken.
 
         Returns:
-            str: The selected action from the LLM response.
+            list: The messages to send to the LLM.
         """
         if prev_action:
             self.prompt_builder.update_action(prev_action)
@@ -36,11 +36,7 @@ You always have to output one of the above actions at a time and no other text.
         if messages and messages[-1].role == "user":
             messages[-1].content += "\n\n" + naive_instruction
 
-        response = self.client.generate(messages)
-
-        final_answer = self._extract_final_answer(response)
-
-        return final_answer
+        return messages
 
     def _extract_final_answer(self, answer):
         """Sanitize the final answer, keeping only alphabetic characters.
@@ -0,0 +1,126 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Content-addressed, size-bounded on-disk store backed by SQLite.
+
+    Entries are evicted in least-recently-used order once the total size of the stored values exceeds
+    `max_size_mb`. The database is opened lazily and once per process and thread, so a cache created before
+    forking workers can be used safely by each of them, and by agents running in worker threads.
+    """
+
+    def __init__(self, path, max_size_mb=1024):
+        """Initialize the ResponseCache.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            max_size_mb (float, optional): Maximum total size of the stored values in megabytes. Defaults to 1024.
+        """
+        self.path = path
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self._local = threading.local()
+
+    def _connection(self):
+        """Return the SQLite connection of the current process and thread, creating the database if needed."""
+        if getattr(self._local, "pid", None) != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Replaced rows fire the delete trigger too, which keeps the running total exact
+            conn.execute("PRAGMA recursive_triggers=ON")
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            # Total size of the stored values, maintained by triggers so that it is shared by all processes
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), total_size INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO stats SELECT 0, COALESCE(SUM(size), 0) FROM responses")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN "
+                "UPDATE stats SET total_size = total_size + new.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN "
+                "UPDATE stats SET total_size = total_size - old.size; END"
+            )
+            conn.execute("COMMIT")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def get(self, key):
+        """Return the value stored under `key` and mark it as recently used.
+
+        Args:
+            key (str): The content hash of the entry.
+
+        Returns:
+            str or None: The stored value, or None on a miss.
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting least-recently-used entries if the cache grows too large.
+
+        Args:
+            key (str): The content hash of the entry.
+            value (str): The value to store.
+        """
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, len(value.encode("utf-8")), time.time()),
+        )
+        self._evict(conn)
+
+    def total_size(self):
+        """Return the total size of the stored values in bytes."""
+        return self._connection().execute("SELECT total_size FROM stats").fetchone()[0]
+
+    def _evict(self, conn):
+        """Delete least-recently-used entries until the cache fits in `max_size`."""
+        excess = self.total_size() - self.max_size
+        if excess <= 0:
+            return
+
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            stale_keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+        logger.info(f"Evicted {len(stale_keys)} entries from the response cache {self.path}")
+
+
+_RESPONSE_CACHES = {}
+
+
+def get_response_cache(path, max_size_mb=1024):
+    """Return the ResponseCache for `path`, shared by all clients of the process.
+
+    Args:
+        path (str): Path of the SQLite database file.
+        max_size_mb (float, optional): Maximum total size of the stored values in megabytes. Defaults to 1024.
+
+    Returns:
+        ResponseCache: The cache stored at `path`.
+    """
+    path = os.path.abspath(path)
+    if path not in _RESPONSE_CACHES:
+        _RESPONSE_CACHES[path] = ResponseCache(path, max_size_mb=max_size_mb)
+    return _RESPONSE_CACHES[path]
@@ -1,18 +1,18 @@
-import base64
+import asyncio
+import contextvars
 import datetime
+import hashlib
 import logging
 import time
 import json
 import csv
 import os
 from collections import namedtuple
-from io import BytesIO
+from functools import lru_cache
 
-from google import genai
-from google.genai import types
-
-from anthropic import Anthropic
-from openai import OpenAI
+from balrog.cache import get_response_cache
+from balrog.image import ImageEncoder, create_image_encoder
+from balrog.timing import timed
 
 LLMResponse = namedtuple(
     "LLMResponse",
@@ -30,6 +30,11 @@ httpx_logger = logging.getLogger("httpx")
 httpx_logger.setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+DEFAULT_IMAGE_ENCODER = ImageEncoder()
+
+GEMINI_ICL_CACHE_TTL = 3600  # Lifetime in seconds of the cached contents holding in-context demonstrations
+GEMINI_ICL_CACHE_REFRESH = 1800  # Seconds after which a request extends the lifetime of the cached contents
+
 
 class LLMClientWrapper:
     """Base class for LLM client wrappers.
@@ -53,6 +58,57 @@ class LLMClientWrapper:
         self.max_retries = client_config.max_retries
         self.delay = client_config.delay
         self.alternate_roles = client_config.alternate_roles
+        self.image_encoder = create_image_encoder(client_config)
+        self.icl_prefix = []
+        self._converted_icl_prefix = None
+
+    def cache_icl_demo(self, messages):
+        """Register messages (e.g. in-context demonstrations) as a prefix of every subsequent request.
+
+        The prefix is converted once and sent ahead of the messages passed to `generate`, in the same
+        order every time, so that providers can reuse it from their prompt cache. Subclasses add
+        provider-specific caching on top. Passing an empty list removes the prefix.
+
+        Args:
+            messages (list): The messages forming the prefix.
+        """
+        self.icl_prefix = list(messages)
+        self._converted_icl_prefix = None
+
+    def convert_icl_prefix(self, messages):
+        """Convert the prefix messages to the provider format. Defaults to `convert_messages`."""
+        return self.convert_messages(messages)
+
+    def mark_icl_prefix_end(self, converted_messages, converted_prefix):
+        """Mark the end of the prefix within converted messages for provider-side caching. Does nothing by default.
+
+        Args:
+            converted_messages (list): The converted prefix and messages, possibly merged across the prefix end.
+            converted_prefix (list): The prefix converted on its own.
+        """
+
+    def convert_with_icl_prefix(self, messages):
+        """Convert messages to the provider format, preceded by the registered prefix (if any).
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            list: The converted prefix followed by the converted messages.
+        """
+        if not self.icl_prefix:
+            return self.convert_messages(messages)
+        if self.alternate_roles:
+            # Messages may be merged across the prefix boundary, so the prefix is converted along with them and
+            # its end is marked afterwards
+            if self._converted_icl_prefix is None:
+                self._converted_icl_prefix = self.convert_messages(self.icl_prefix)
+            converted_messages = self.convert_messages(self.icl_prefix + list(messages))
+            self.mark_icl_prefix_end(converted_messages, self._converted_icl_prefix)
+            return converted_messages
+        if self._converted_icl_prefix is None:
+            self._converted_icl_prefix = self.convert_icl_prefix(self.icl_prefix)
+        return self._converted_icl_prefix + self.convert_messages(messages)
 
     def generate(self, messages):
         """Generate a response from the LLM given a list of messages.
@@ -67,6 +123,20 @@ class LLMClientWrapper:
         """
         raise NotImplementedError("This method should be overridden by subclasses")
 
+    async def agenerate(self, messages):
+        """Asynchronously generate a response from the LLM given a list of messages.
+
+        The default implementation runs the blocking `generate` in a worker thread. Subclasses backed by
+        an SDK with a native asynchronous client should override it.
+
+        Args:
+            messages (list): A list of messages to send to the LLM.
+
+        Returns:
+            LLMResponse: The response from the LLM.
+        """
+        return await asyncio.to_thread(self.generate, messages)
+
     def execute_with_retries(self, func, *args, **kwargs):
         """Execute a function with retries upon failure.
 
@@ -82,68 +152,96 @@ class LLMClientWrapper:
             Exception: If the function fails after the maximum number of retries.
         """
         retries = 0
-        while retries < self.max_retries:
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                retries += 1
-                logger.error(f"Retryable error during {func.__name__}: {e}. Retry {retries}/{self.max_retries}")
-                sleep_time = self.delay * (2 ** (retries - 1))  # Exponential backoff
-                time.sleep(sleep_time)
+        with timed("llm"):
+            while retries < self.max_retries:
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    retries += 1
+                    logger.error(f"Retryable error during {func.__name__}: {e}. Retry {retries}/{self.max_retries}")
+                    sleep_time = self.delay * (2 ** (retries - 1))  # Exponential backoff
+                    time.sleep(sleep_time)
         raise Exception(f"Failed to execute {func.__name__} after {self.max_retries} retries.")
 
+    async def aexecute_with_retries(self, func, *args, **kwargs):
+        """Await a coroutine function with retries upon failure.
 
-def process_image_openai(image):
+        Asynchronous counterpart of `execute_with_retries`; backoff sleeps do not block the event loop.
+
+        Args:
+            func (callable): The coroutine function to execute.
+            *args: Positional arguments to pass to the function.
+            **kwargs: Keyword arguments to pass to the function.
+
+        Returns:
+            Any: The result of the function call.
+
+        Raises:
+            Exception: If the function fails after the maximum number of retries.
+        """
+        retries = 0
+        with timed("llm"):
+            while retries < self.max_retries:
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    retries += 1
+                    logger.error(f"Retryable error during {func.__name__}: {e}. Retry {retries}/{self.max_retries}")
+                    sleep_time = self.delay * (2 ** (retries - 1))  # Exponential backoff
+                    await asyncio.sleep(sleep_time)
+        raise Exception(f"Failed to execute {func.__name__} after {self.max_retries} retries.")
+
+
+def process_image_openai(image, encoder=None):
     """Process an image for OpenAI API by converting it to base64.
 
     Args:
         image: The image to process.
+        encoder (ImageEncoder, optional): The encoder to use. Defaults to PNG encoding.
 
     Returns:
         dict: A dictionary containing the image data formatted for OpenAI.
     """
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
-    base64_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    encoder = encoder or DEFAULT_IMAGE_ENCODER
+    base64_image = encoder.encode_base64(image)
     # Return the image content for OpenAI
     return {
         "type": "image_url",
-        "image_url": {"url": f"data:image/png;base64,{base64_image}"},
+        "image_url": {"url": f"data:{encoder.media_type};base64,{base64_image}"},
     }
 
 
-def process_image_claude(image):
+def process_image_claude(image, encoder=None):
     """Process an image for Anthropic's Claude API by converting it to base64.
 
     Args:
         image: The image to process.
+        encoder (ImageEncoder, optional): The encoder to use. Defaults to PNG encoding.
 
     Returns:
         dict: A dictionary containing the image data formatted for Claude.
     """
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
-    base64_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    encoder = encoder or DEFAULT_IMAGE_ENCODER
+    base64_image = encoder.encode_base64(image)
     # Return the image content for Anthropic
     return {
         "type": "image",
-        "source": {"type": "base64", "media_type": "image/png", "data": base64_image},
+        "source": {"type": "base64", "media_type": encoder.media_type, "data": base64_image},
     }
 
 
-def process_image_bedrock(image):
+def process_image_bedrock(image, encoder=None):
     """Process an image for AWS Bedrock Converse API.
 
     Notes:
         The Bedrock Runtime Converse API accepts image content blocks with raw bytes.
         Not all models support images; users can disable image history if needed.
     """
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
+    encoder = encoder or DEFAULT_IMAGE_ENCODER
     return {
         "image": {
-            "format": "png",
-            "source": {"bytes": buffered.getvalue()},
+            "format": encoder.format,
+            "source": {"bytes": encoder.encode(image)},
         }
     }
 
@@ -159,21 +257,45 @@ class OpenAIWrapper(LLMClientWrapper):
         """
         super().__init__(client_config)
         self._initialized = False
+        self._async_initialized = False
+
+    def _openai_kwargs(self):
+        """Return the keyword arguments used to construct the (sync or async) OpenAI client.
+
+        Returns:
+            dict or None: Client keyword arguments, or None if the client name is not recognized.
+        """
+        if self.client_name.lower() == "vllm":
+            return {"api_key": "EMPTY", "base_url": self.base_url}
+        elif self.client_name.lower() == "nvidia" or self.client_name.lower() == "xai":
+            if not self.base_url or not self.base_url.strip():
+                raise ValueError("base_url must be provided when using NVIDIA or XAI client")
+            return {"base_url": self.base_url}
+        elif self.client_name.lower() == "openai":
+            # For OpenAI, always use the standard API regardless of base_url
+            return {}
+        return None
 
     def _initialize_client(self):
         """Initialize the OpenAI client if not already initialized."""
         if not self._initialized:
-            if self.client_name.lower() == "vllm":
-                self.client = OpenAI(api_key="EMPTY", base_url=self.base_url)
-            elif self.client_name.lower() == "nvidia" or self.client_name.lower() == "xai":
-                if not self.base_url or not self.base_url.strip():
-                    raise ValueError("base_url must be provided when using NVIDIA or XAI client")
-                self.client = OpenAI(base_url=self.base_url)
-            elif self.client_name.lower() == "openai":
-                # For OpenAI, always use the standard API regardless of base_url
-                self.client = OpenAI()
+            from openai import OpenAI
+
+            openai_kwargs = self._openai_kwargs()
+            if openai_kwargs is not None:
+                self.client = OpenAI(**openai_kwargs)
             self._initialized = True
 
+    def _initialize_async_client(self):
+        """Initialize the asynchronous OpenAI client if not already initialized."""
+        if not self._async_initialized:
+            from openai import AsyncOpenAI
+
+            openai_kwargs = self._openai_kwargs()
+            if openai_kwargs is not None:
+                self.async_client = AsyncOpenAI(**openai_kwargs)
+            self._async_initialized = True
+
     def convert_messages(self, messages):
         """Convert messages to the format expected by the OpenAI API.
 
@@ -187,7 +309,7 @@ class OpenAIWrapper(LLMClientWrapper):
         for msg in messages:
             new_content = [{"type": "text", "text": msg.content}]
             if msg.attachment is not None:
-                new_content.append(process_image_openai(msg.attachment))
+                new_content.append(process_image_openai(msg.attachment, self.image_encoder))
             if self.alternate_roles and converted_messages and converted_messages[-1]["role"] == msg.role:
                 converted_messages[-1]["content"].extend(new_content)
             else:
@@ -204,25 +326,58 @@ class OpenAIWrapper(LLMClientWrapper):
             LLMResponse: The response from the OpenAI API.
         """
         self._initialize_client()
-        converted_messages = self.convert_messages(messages)
+        converted_messages = self.convert_with_icl_prefix(messages)
 
         def api_call():
-            # Create kwargs for the API call
-            api_kwargs = {
-                "messages": converted_messages,
-                "model": self.model_id,
-                "max_tokens": self.client_kwargs.get("max_tokens", 1024),
-            }
+            return self.client.chat.completions.create(**self._api_kwargs(converted_messages))
 
-            # Only include temperature if it's not None
-            temperature = self.client_kwargs.get("temperature")
-            if temperature is not None:
-                api_kwargs["temperature"] = temperature
+        response = self.execute_with_retries(api_call)
 
-            return self.client.chat.completions.create(**api_kwargs)
+        return self._to_llm_response(response)
 
-        response = self.execute_with_retries(api_call)
+    async def agenerate(self, messages):
+        """Asynchronously generate a response from the OpenAI API given a list of messages.
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            LLMResponse: The response from the OpenAI API.
+        """
+        self._initialize_async_client()
+        converted_messages = self.convert_with_icl_prefix(messages)
+
+        async def api_call():
+            return await self.async_client.chat.completions.create(**self._api_kwargs(converted_messages))
+
+        response = await self.aexecute_with_retries(api_call)
+
+        return self._to_llm_response(response)
+
+    def _api_kwargs(self, converted_messages):
+        """Create the keyword arguments for a chat completions request.
+
+        Args:
+            converted_messages (list): Messages already formatted for the OpenAI API.
+
+        Returns:
+            dict: Keyword arguments for `chat.completions.create`.
+        """
+        api_kwargs = {
+            "messages": converted_messages,
+            "model": self.model_id,
+            "max_tokens": self.client_kwargs.get("max_tokens", 1024),
+        }
+
+        # Only include temperature if it's not None
+        temperature = self.client_kwargs.get("temperature")
+        if temperature is not None:
+            api_kwargs["temperature"] = temperature
+
+        return api_kwargs
 
+    def _to_llm_response(self, response):
+        """Convert a chat completions response into an LLMResponse."""
         return LLMResponse(
             model_id=self.model_id,
             completion=response.choices[0].message.content.strip(),
@@ -244,10 +399,16 @@ class GoogleGenerativeAIWrapper(LLMClientWrapper):
         """
         super().__init__(client_config)
         self._initialized = False
+        self._icl_cache_name = None
+        self._icl_cache_failed = False
+        self._icl_cache_refresh_at = 0.0
 
     def _initialize_client(self):
         """Initialize the Generative AI client if not already initialized."""
         if not self._initialized:
+            from google import genai
+            from google.genai import types
+
             self.client = genai.Client()
             self.model = None
             # Create kwargs dictionary for GenerationConfig
@@ -295,6 +456,8 @@ class GoogleGenerativeAIWrapper(LLMClientWrapper):
         Returns:
             list[types.Content]: A list of Content objects formatted for the API.
         """
+        from google.genai import types
+
         converted_messages = []
         
         for msg in messages:
@@ -317,6 +480,84 @@ class GoogleGenerativeAIWrapper(LLMClientWrapper):
             )
         return converted_messages
 
+    def cache_icl_demo(self, messages):
+        """Register a request prefix, stored server-side as cached content on the next request.
+
+        The cached content of the previous prefix, if any, is deleted.
+
+        Args:
+            messages (list): The messages forming the prefix.
+        """
+        self._delete_icl_cache()
+        self._icl_cache_failed = False
+        super().cache_icl_demo(messages)
+
+    def _delete_icl_cache(self):
+        """Delete the cached content of the current prefix, if any."""
+        if self._icl_cache_name is None:
+            return
+        try:
+            self.client.caches.delete(name=self._icl_cache_name)
+        except Exception as e:
+            logger.warning(f"Failed to delete Gemini cached content {self._icl_cache_name}: {e}")
+        self._icl_cache_name = None
+
+    def _request_contents(self, messages):
+        """Return the contents and generation config of a request, using the cached prefix when available.
+
+        The cached content is created on first use. Its lifetime is extended by the requests made after
+        `GEMINI_ICL_CACHE_REFRESH` seconds, so it does not expire during long episodes, and it is created again
+        if it is gone anyway. If the provider rejects it (e.g. a prefix shorter than the minimum cacheable
+        size), the prefix is sent inline instead.
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            tuple: The contents to send and the generation config to use.
+        """
+        if not self.icl_prefix or self._icl_cache_failed:
+            return self.convert_with_icl_prefix(messages), self.generation_config
+
+        from google.genai import types
+
+        if self._icl_cache_name is not None and time.monotonic() >= self._icl_cache_refresh_at:
+            try:
+                self.client.caches.update(
+                    name=self._icl_cache_name,
+                    config=types.UpdateCachedContentConfig(ttl=f"{GEMINI_ICL_CACHE_TTL}s"),
+                )
+                self._icl_cache_refresh_at = time.monotonic() + GEMINI_ICL_CACHE_REFRESH
+            except Exception as e:
+                logger.warning(f"Failed to extend Gemini cached content {self._icl_cache_name}, recreating it: {e}")
+                self._icl_cache_name = None
+
+        if self._icl_cache_name is None:
+            try:
+                cache = self.client.caches.create(
+                    model=self.model_id,
+                    config=types.CreateCachedContentConfig(
+                        contents=self.convert_icl_prefix(self.icl_prefix),
+                        ttl=f"{GEMINI_ICL_CACHE_TTL}s",
+                    ),
+                )
+                self._icl_cache_name = cache.name
+                self._icl_cache_refresh_at = time.monotonic() + GEMINI_ICL_CACHE_REFRESH
+            except Exception as e:
+                logger.warning(f"Failed to create Gemini cached content, sending the prefix inline instead: {e}")
+                self._icl_cache_failed = True
+                return self.convert_with_icl_prefix(messages), self.generation_config
+
+        config = self.generation_config.model_copy(update={"cached_content": self._icl_cache_name})
+        return self.convert_messages(messages), config
+
+    def _is_missing_cache_error(self, error):
+        """Return whether a failed request referenced cached content that no longer exists (e.g. expired)."""
+        from google.genai import errors
+
+        # The API answers 403 (not found or permission denied) or 404 for unknown cached contents
+        return isinstance(error, errors.ClientError) and error.code in (403, 404) and "cache" in str(error).lower()
+
     def extract_completion(self, response):
         """Extract the completion text (answer) from the API response.
 
@@ -433,14 +674,20 @@ class GoogleGenerativeAIWrapper(LLMClientWrapper):
         """
         self._initialize_client()
 
-        converted_messages = self.convert_messages(messages)
-
         def api_call():
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=converted_messages,
-                config=self.generation_config,
-            )
+            # The contents are prepared for every attempt, since a failed attempt may drop the cached prefix
+            converted_messages, generation_config = self._request_contents(messages)
+            try:
+                response = self.client.models.generate_content(
+                    model=self.model_id,
+                    contents=converted_messages,
+                    config=generation_config,
+                )
+            except Exception as e:
+                if generation_config.cached_content is not None and self._is_missing_cache_error(e):
+                    logger.warning(f"Gemini cached content {self._icl_cache_name} is gone, recreating it")
+                    self._icl_cache_name = None
+                raise
             # Attempt to extract completion and reasoning immediately after API call
             completion = self.extract_completion(response)
             reasoning = self.extract_reasoning(response)
@@ -516,6 +763,8 @@ class ClaudeWrapper(LLMClientWrapper):
     def _initialize_client(self):
         """Initialize the Claude client if not already initialized."""
         if not self._initialized:
+            from anthropic import Anthropic
+
             self.client = Anthropic()
             self._initialized = True
 
@@ -536,10 +785,46 @@ class ClaudeWrapper(LLMClientWrapper):
                 converted_messages[-1]["role"] = "user"
                 converted_messages.append({"role": "assistant", "content": "I'm ready!"})
             if msg.attachment is not None:
-                converted_messages[-1]["content"].append(process_image_claude(msg.attachment))
+                converted_messages[-1]["content"].append(process_image_claude(msg.attachment, self.image_encoder))
 
         return converted_messages
 
+    def convert_icl_prefix(self, messages):
+        """Convert the prefix messages and mark their end as a prompt cache breakpoint.
+
+        Args:
+            messages (list): The messages forming the prefix.
+
+        Returns:
+            list: The prefix formatted for the Claude API.
+        """
+        converted_messages = self.convert_messages(messages)
+        self.mark_icl_prefix_end(converted_messages, converted_messages)
+        return converted_messages
+
+    def mark_icl_prefix_end(self, converted_messages, converted_prefix):
+        """Set a prompt cache breakpoint on the last content block coming from the prefix.
+
+        Args:
+            converted_messages (list): The converted prefix and messages, possibly merged across the prefix end.
+            converted_prefix (list): The prefix converted on its own.
+        """
+
+        def num_blocks(message):
+            return 1 if isinstance(message["content"], str) else len(message["content"])
+
+        remaining = sum(num_blocks(message) for message in converted_prefix)
+        for message in converted_messages:
+            if remaining <= 0:
+                return
+            if remaining <= num_blocks(message):
+                if isinstance(message["content"], str):
+                    # Breakpoints can only be set on content blocks
+                    message["content"] = [{"type": "text", "text": message["content"]}]
+                message["content"][remaining - 1]["cache_control"] = {"type": "ephemeral"}
+                return
+            remaining -= num_blocks(message)
+
     def generate(self, messages):
         """Generate a response from the Claude API given a list of messages.
 
@@ -550,7 +835,7 @@ class ClaudeWrapper(LLMClientWrapper):
             LLMResponse: The response from the Claude API.
         """
         self._initialize_client()
-        converted_messages = self.convert_messages(messages)
+        converted_messages = self.convert_with_icl_prefix(messages)
 
         def api_call():
             # Create kwargs for the API call
@@ -638,7 +923,7 @@ class AWSBedrockWrapper(LLMClientWrapper):
             if msg.content:
                 content_blocks.append({"text": msg.content})
             if msg.attachment is not None:
-                content_blocks.append(process_image_bedrock(msg.attachment))
+                content_blocks.append(process_image_bedrock(msg.attachment, self.image_encoder))
 
             if (
                 self.alternate_roles
@@ -702,7 +987,7 @@ class AWSBedrockWrapper(LLMClientWrapper):
 
     def generate(self, messages):
         self._initialize_client()
-        converted_messages = self.convert_messages(messages)
+        converted_messages = self.convert_with_icl_prefix(messages)
 
         def api_call():
             # Map OpenAI-style kwargs to Bedrock Converse parameters.
@@ -768,6 +1053,349 @@ class AWSBedrockWrapper(LLMClientWrapper):
         )
 
 
+class CompletionsBatcher(OpenAIWrapper):
+    """Sends the concurrent requests of all episodes in flight of a process as one completions request.
+
+    Chat completions endpoints take one conversation per request. The batcher therefore renders every
+    conversation with the model's chat template (from its Hugging Face tokenizer) and sends the token ids
+    of all the prompts collected during `batch_window` seconds (at most `max_batch_size` of them) in a
+    single request to the `completions` endpoint of the server, e.g. vLLM, which returns one choice per
+    prompt.
+    """
+
+    def __init__(self, client_config):
+        """Initialize the CompletionsBatcher.
+
+        Args:
+            client_config: Configuration object containing client-specific settings.
+        """
+        super().__init__(client_config)
+        self.batch_window = client_config.batch_window
+        self.max_batch_size = client_config.max_batch_size
+        self._tokenizer = None
+        self._pending = []
+        self._flush_handle = None
+        self._batches = set()
+
+    def _get_tokenizer(self):
+        """Load the tokenizer of the model on first use."""
+        if self._tokenizer is None:
+            try:
+                from transformers import AutoTokenizer
+            except ImportError as e:
+                raise ImportError(
+                    "client.batch_window requires transformers to apply the chat template of the model. "
+                    "Install it with `pip install transformers` or set `client.batch_window=0`."
+                ) from e
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_id)
+        return self._tokenizer
+
+    async def submit(self, conversation):
+        """Add a conversation to the next batch and wait for its response.
+
+        Args:
+            conversation (list): Messages as `{"role": ..., "content": ...}` dicts with text content.
+
+        Returns:
+            LLMResponse: The response to the conversation.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((conversation, future))
+        # The batch is sent outside of the requesting episode's context, so that its duration is not added
+        # to that episode's step timings
+        if len(self._pending) >= self.max_batch_size:
+            contextvars.Context().run(self._flush)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush, context=contextvars.Context())
+        return await future
+
+    def _flush(self):
+        """Send the pending conversations as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send_batch(batch))
+            # Keep a reference to the task until it completes
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send_batch(self, batch):
+        """Request the completions of a batch and resolve the futures of its conversations."""
+        try:
+            responses = await self._complete([conversation for conversation, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), response in zip(batch, responses):
+            if not future.done():
+                future.set_result(response)
+
+    async def _complete(self, conversations):
+        """Request the completions of several conversations in one request.
+
+        Args:
+            conversations (list): The conversations of the batch.
+
+        Returns:
+            list: One LLMResponse per conversation, in the same order.
+        """
+        self._initialize_async_client()
+        tokenizer = self._get_tokenizer()
+        prompts = [
+            list(tokenizer.apply_chat_template(conversation, tokenize=True, add_generation_prompt=True))
+            for conversation in conversations
+        ]
+        logger.debug(f"Sending a batch of {len(prompts)} requests")
+
+        api_kwargs = {
+            "model": self.model_id,
+            "prompt": prompts,
+            "max_tokens": self.client_kwargs.get("max_tokens", 1024),
+        }
+        temperature = self.client_kwargs.get("temperature")
+        if temperature is not None:
+            api_kwargs["temperature"] = temperature
+
+        async def api_call():
+            return await self.async_client.completions.create(**api_kwargs)
+
+        response = await self.aexecute_with_retries(api_call)
+
+        # The usage of a batch is reported in total, so the tokens of each request are counted locally
+        choices = {choice.index: choice for choice in response.choices}
+        responses = []
+        for idx, prompt in enumerate(prompts):
+            choice = choices[idx]
+            responses.append(
+                LLMResponse(
+                    model_id=self.model_id,
+                    completion=choice.text.strip(),
+                    stop_reason=choice.finish_reason,
+                    input_tokens=len(prompt),
+                    output_tokens=len(tokenizer.encode(choice.text, add_special_tokens=False)),
+                    reasoning=None,
+                )
+            )
+        return responses
+
+
+_COMPLETIONS_BATCHERS = {}
+
+
+def get_completions_batcher(client_config):
+    """Return the CompletionsBatcher shared by all clients of the current process.
+
+    Args:
+        client_config: Configuration object containing client-specific settings.
+
+    Returns:
+        CompletionsBatcher: The batcher of the current process.
+    """
+    pid = os.getpid()
+    if pid not in _COMPLETIONS_BATCHERS:
+        _COMPLETIONS_BATCHERS[pid] = CompletionsBatcher(client_config)
+    return _COMPLETIONS_BATCHERS[pid]
+
+
+class BatchingClientWrapper(LLMClientWrapper):
+    """Wrapper that sends the asynchronous text-only requests of a client through a shared CompletionsBatcher.
+
+    Every agent keeps its own wrapped client (and thus its own per-agent state), while the batcher is shared
+    by all episodes in flight in the process. Requests with images, which the completions endpoint does not
+    take, and synchronous `generate` calls go through the wrapped client unchanged.
+    """
+
+    def __init__(self, client_config, client, batcher):
+        """Initialize the BatchingClientWrapper.
+
+        Args:
+            client_config: Configuration object containing client-specific settings.
+            client (LLMClientWrapper): The client answering the requests that are not batched.
+            batcher (CompletionsBatcher): The batcher shared by the clients of the process.
+        """
+        super().__init__(client_config)
+        self.client = client
+        self.batcher = batcher
+
+    def cache_icl_demo(self, messages):
+        """Register a request prefix on the wrapped client."""
+        self.client.cache_icl_demo(messages)
+
+    def convert_messages(self, messages):
+        """Convert messages to the text conversation rendered by the chat template.
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            list: A list of `{"role": ..., "content": ...}` dicts.
+        """
+        conversation = []
+        for msg in messages:
+            if self.alternate_roles and conversation and conversation[-1]["role"] == msg.role:
+                conversation[-1]["content"] += "\n\n" + msg.content
+            else:
+                conversation.append({"role": msg.role, "content": msg.content})
+        return conversation
+
+    def generate(self, messages):
+        """Generate a response with the wrapped client.
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            LLMResponse: The response from the wrapped client.
+        """
+        return self.client.generate(messages)
+
+    async def agenerate(self, messages):
+        """Generate a response as part of the next batch, or with the wrapped client if it holds images.
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            LLMResponse: The response to the messages.
+        """
+        all_messages = list(self.client.icl_prefix) + list(messages)
+        if any(msg.attachment is not None for msg in all_messages):
+            return await self.client.agenerate(messages)
+        with timed("llm"):
+            return await self.batcher.submit(self.convert_messages(all_messages))
+
+
+class CachedClientWrapper(LLMClientWrapper):
+    """Wrapper that serves repeated requests of a client from an on-disk ResponseCache.
+
+    Requests are keyed by a SHA-256 hash of the client name, model id, generation settings and the
+    messages, including the raw bytes of image attachments. Only deterministic clients (temperature 0) are
+    wrapped, see `create_llm_client`. Hits and misses are counted so that the evaluator can report them per
+    episode; the tokens of cached responses are counted apart, and cached responses report none.
+    """
+
+    def __init__(self, client_config, client, cache):
+        """Initialize the CachedClientWrapper.
+
+        Args:
+            client_config: Configuration object containing client-specific settings.
+            client (LLMClientWrapper): The client answering cache misses.
+            cache (ResponseCache): The store holding the cached responses.
+        """
+        super().__init__(client_config)
+        self.client = client
+        self.cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cached_input_tokens = 0
+        self.cached_output_tokens = 0
+        self._prefix_digest = ""
+
+    def cache_icl_demo(self, messages):
+        """Register a request prefix on the wrapped client and include it in the cache keys."""
+        self.client.cache_icl_demo(messages)
+        self._prefix_digest = ""
+        if messages:
+            self._prefix_digest = self.cache_key(messages)
+
+    def cache_key(self, messages):
+        """Compute the content hash identifying a request.
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            str: The hex digest of the request.
+        """
+        digest = hashlib.sha256()
+        settings = {
+            "client_name": self.client_name,
+            "model_id": self.model_id,
+            "generate_kwargs": self.client_kwargs,
+            "alternate_roles": self.alternate_roles,
+            "image_encoding": [
+                self.image_encoder.format,
+                self.image_encoder.quality,
+                self.image_encoder.compress_level,
+                self.image_encoder.max_size,
+            ],
+        }
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(self._prefix_digest.encode("utf-8"))
+        for msg in messages:
+            digest.update(json.dumps([msg.role, msg.content]).encode("utf-8"))
+            if msg.attachment is not None:
+                image = msg.attachment
+                digest.update(f"{image.mode}{image.size}".encode("utf-8"))
+                digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def _lookup(self, key):
+        """Return the cached response for `key`, updating the hit and miss counters."""
+        value = self.cache.get(key)
+        if value is None:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        response = LLMResponse(**json.loads(value))
+        self.cached_input_tokens += response.input_tokens
+        self.cached_output_tokens += response.output_tokens
+        # No tokens were spent on this request
+        return response._replace(input_tokens=0, output_tokens=0)
+
+    def _store(self, key, response):
+        """Store a response, unless it reports a failed request."""
+        if response.stop_reason == "error_max_retries":
+            return
+        self.cache.put(key, json.dumps(response._asdict(), default=str))
+
+    def generate(self, messages):
+        """Return the cached response for the messages, or generate and cache it.
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            LLMResponse: The cached or freshly generated response.
+        """
+        key = self.cache_key(messages)
+        response = self._lookup(key)
+        if response is None:
+            response = self.client.generate(messages)
+            self._store(key, response)
+        return response
+
+    async def agenerate(self, messages):
+        """Asynchronously return the cached response for the messages, or generate and cache it.
+
+        Args:
+            messages (list): A list of message objects.
+
+        Returns:
+            LLMResponse: The cached or freshly generated response.
+        """
+        key = self.cache_key(messages)
+        response = self._lookup(key)
+        if response is None:
+            response = await self.client.agenerate(messages)
+            self._store(key, response)
+        return response
+
+
+@lru_cache(maxsize=None)
+def _warn_uncached_sampling(temperature):
+    """Warn (once per process and temperature) that the responses of a sampling client are not cached."""
+    logger.warning(
+        f"client.cache_path is ignored with temperature={temperature}: only deterministic requests "
+        "(client.generate_kwargs.temperature=0) are cached, so that sampled responses are not replayed"
+    )
+
+
 def create_llm_client(client_config):
     """
     Factory function to create the appropriate LLM client based on the client name.
@@ -779,7 +1407,7 @@ def create_llm_client(client_config):
         callable: A factory function that returns an instance of the appropriate LLM client.
     """
 
-    def client_factory():
+    def base_client_factory():
         client_name_lower = client_config.client_name.lower()
         if "openai" in client_name_lower or "vllm" in client_name_lower or "nvidia" in client_name_lower or "xai" in client_name_lower:
             # NVIDIA and XAI use OpenAI-compatible API, so we use the OpenAI wrapper
@@ -793,4 +1421,19 @@ def create_llm_client(client_config):
         else:
             raise ValueError(f"Unsupported client name: {client_config.client_name}")
 
+    def client_factory():
+        client = base_client_factory()
+        if client_config.batch_window > 0:
+            if "vllm" not in client_config.client_name.lower():
+                raise ValueError("client.batch_window requires a local server, i.e. client.client_name=vllm")
+            client = BatchingClientWrapper(client_config, client, get_completions_batcher(client_config))
+        if client_config.cache_path:
+            temperature = client_config.generate_kwargs.get("temperature")
+            if temperature == 0:
+                cache = get_response_cache(client_config.cache_path, max_size_mb=client_config.cache_max_size_mb)
+                client = CachedClientWrapper(client_config, client, cache)
+            else:
+                _warn_uncached_sampling(temperature)
+        return client
+
     return client_factory
@@ -1,4 +1,5 @@
 import glob
+import json
 import logging
 import os
 import random
@@ -7,6 +8,8 @@ from pathlib import Path
 
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 
 def natural_sort_key(s):
     return [int(c) if c.isdigit() else c.lower() for c in re.split(r"(\d+)", str(s))]
@@ -17,15 +20,191 @@ def choice_excluding(lst, excluded_element):
     return random.choice(possible_choices)
 
 
+COMPILED_DIR = "_compiled"  # Directory holding the compiled store of a demonstrations directory
+COMPILED_VERSION = 2
+
+
+def find_demos(demos_dir):
+    return list(sorted(glob.glob(os.path.join(demos_dir, "**/*.npz"), recursive=True), key=natural_sort_key))
+
+
+def demo_sources(demos_dir, demo_paths):
+    """Return the modification time of every recording, keyed by its path relative to `demos_dir`.
+
+    A compiled store records the sources it was compiled from, so that adding, removing or changing a
+    recording afterwards is detected.
+    """
+    return {os.path.relpath(path, demos_dir): os.stat(path).st_mtime_ns for path in demo_paths}
+
+
+def load_episode(filename):
+    # Load the compressed NPZ file
+    with np.load(filename, allow_pickle=True) as data:
+        # Convert to dictionary if you want
+        episode = {k: data[k] for k in data.files}
+    return episode
+
+
+def episode_events(demo_path):
+    """Read a recorded demonstration as the sequence of texts fed to the agent.
+
+    Args:
+        demo_path (str): Path of the `.npz` recording.
+
+    Returns:
+        tuple: The alternating observation and action texts (starting with an observation), and whether
+            the recording reached the end of the episode.
+    """
+    episode = load_episode(demo_path)
+
+    actions = episode.pop("action").tolist()
+    rewards = episode.pop("reward").tolist()
+    terminated = episode.pop("terminated")
+    truncated = episode.pop("truncated")
+    dones = np.any([terminated, truncated], axis=0).tolist()
+    observations = [dict(zip(episode.keys(), values)) for values in zip(*episode.values())]
+
+    # first transition only contains observation (like env.reset())
+    observation, action, reward, done = observations.pop(0), actions.pop(0), rewards.pop(0), dones.pop(0)
+    events = [observation["text"].get("long_term_context", "")]
+
+    for observation, action, reward, done in zip(observations, actions, rewards, dones):
+        events.append(str(action))
+        events.append(observation["text"].get("long_term_context", ""))
+
+        if done:
+            break
+
+    return events, done
+
+
+def compile_demos(demos_dir):
+    """Compile the recordings of a demonstrations directory into a memory-mappable store.
+
+    The store, written to `<demos_dir>/_compiled`, holds the UTF-8 texts of all episodes concatenated in
+    `strings.npy`, their boundaries in `offsets.npy`, and the episodes and the modification times of their
+    recordings in `index.json`.
+
+    Args:
+        demos_dir (str): Directory containing the `.npz` recordings of a task.
+
+    Returns:
+        int: The number of compiled episodes.
+    """
+    demo_paths = find_demos(demos_dir)
+    chunks = []
+    offsets = [0]
+    episodes = []
+    for demo_path in demo_paths:
+        events, done = episode_events(demo_path)
+        start = len(offsets) - 1
+        for text in events:
+            chunk = text.encode("utf-8")
+            chunks.append(chunk)
+            offsets.append(offsets[-1] + len(chunk))
+        episodes.append(
+            {
+                "path": os.path.relpath(demo_path, demos_dir),
+                "start": start,
+                "stop": len(offsets) - 1,
+                "done": bool(done),
+            }
+        )
+
+    compiled_dir = Path(demos_dir) / COMPILED_DIR
+    compiled_dir.mkdir(exist_ok=True)
+    np.save(compiled_dir / "strings.npy", np.frombuffer(b"".join(chunks), dtype=np.uint8))
+    np.save(compiled_dir / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+    # The index is written last, it marks the store as complete
+    with open(compiled_dir / "index.json", "w") as f:
+        json.dump(
+            {"version": COMPILED_VERSION, "episodes": episodes, "sources": demo_sources(demos_dir, demo_paths)}, f
+        )
+
+    return len(episodes)
+
+
+class CompiledDemoStore:
+    """Read-only view of a compiled demonstrations directory.
+
+    The text arrays are memory-mapped, so processes reading the same store share their pages and only the
+    episodes actually used are read from disk.
+    """
+
+    def __init__(self, demos_dir):
+        compiled_dir = Path(demos_dir) / COMPILED_DIR
+        with open(compiled_dir / "index.json") as f:
+            index = json.load(f)
+        if index.get("version") != COMPILED_VERSION:
+            raise ValueError(f"Unsupported compiled demonstrations version in {compiled_dir}, recompile them.")
+
+        self.demos_dir = demos_dir
+        self.sources = index["sources"]
+        self.strings = np.load(compiled_dir / "strings.npy", mmap_mode="r")
+        self.offsets = np.load(compiled_dir / "offsets.npy", mmap_mode="r")
+        self.episodes = {os.path.join(demos_dir, episode["path"]): episode for episode in index["episodes"]}
+
+    @staticmethod
+    def exists(demos_dir):
+        return (Path(demos_dir) / COMPILED_DIR / "index.json").is_file()
+
+    def is_stale(self):
+        """Whether recordings were added, removed or changed since the store was compiled."""
+        return self.sources != demo_sources(self.demos_dir, find_demos(self.demos_dir))
+
+    def demo_paths(self):
+        return list(sorted(self.episodes, key=natural_sort_key))
+
+    def episode_events(self, demo_path):
+        """Same as the module-level `episode_events`, read from the compiled store."""
+        episode = self.episodes[demo_path]
+        start, stop = episode["start"], episode["stop"]
+        bounds = np.asarray(self.offsets[start : stop + 1])
+        data = bytes(self.strings[bounds[0] : bounds[-1]])
+        base = bounds[0]
+        events = [data[a - base : b - base].decode("utf-8") for a, b in zip(bounds[:-1], bounds[1:])]
+        return events, episode["done"]
+
+
 class InContextDataset:
     def __init__(self, config, env_name, original_cwd) -> None:
         self.config = config
         self.env_name = env_name
         self.original_cwd = original_cwd
+        self._icl_episodes = {}
+        self._stores = {}
+
+    def demos_dir(self, task):
+        return os.path.join(self.original_cwd, self.config.eval.icl_dataset, self.env_name, task)
+
+    def store(self, task):
+        """Return the compiled store of a task, or None if its demonstrations are not compiled.
+
+        A store compiled by another version of BALROG, or before the recordings changed, is ignored with a
+        warning, and the recordings are read instead.
+        """
+        if task not in self._stores:
+            demos_dir = self.demos_dir(task)
+            store = None
+            if CompiledDemoStore.exists(demos_dir):
+                try:
+                    store = CompiledDemoStore(demos_dir)
+                    if store.is_stale():
+                        raise ValueError(f"The recordings in {demos_dir} changed since they were compiled, recompile them.")
+                except ValueError as e:
+                    logger.warning(f"Reading the recordings instead of the compiled demonstrations: {e}")
+                    store = None
+            self._stores[task] = store
+        return self._stores[task]
 
     def icl_episodes(self, task):
-        demos_dir = Path(self.original_cwd) / self.config.eval.icl_dataset / self.env_name / task
-        return list(sorted(glob.glob(os.path.join(demos_dir, "**/*.npz"), recursive=True), key=natural_sort_key))
+        if task not in self._icl_episodes:
+            store = self.store(task)
+            if store is not None:
+                self._icl_episodes[task] = store.demo_paths()
+            else:
+                self._icl_episodes[task] = find_demos(self.demos_dir(task))
+        return list(self._icl_episodes[task])
 
     def extract_seed(self, demo_path):
         # extract seed from record, example format: `20241201T225823-seed13-rew1.00-len47.npz`
@@ -58,11 +237,7 @@ class InContextDataset:
         return demo_path
 
     def load_episode(self, filename):
-        # Load the compressed NPZ file
-        with np.load(filename, allow_pickle=True) as data:
-            # Convert to dictionary if you want
-            episode = {k: data[k] for k in data.files}
-        return episode
+        return load_episode(filename)
 
     def load_in_context_learning_episodes(self, num_episodes, task, agent):
         demo_task = self.demo_task(task)
@@ -71,30 +246,20 @@ class InContextDataset:
         demo_paths = demo_paths[:num_episodes]
 
         for demo_path in demo_paths:
-            self.load_in_context_learning_episode(demo_path, agent)
-
-    def load_in_context_learning_episode(self, demo_path, agent):
-        episode = self.load_episode(demo_path)
-
-        actions = episode.pop("action").tolist()
-        rewards = episode.pop("reward").tolist()
-        terminated = episode.pop("terminated")
-        truncated = episode.pop("truncated")
-        dones = np.any([terminated, truncated], axis=0).tolist()
-        observations = [dict(zip(episode.keys(), values)) for values in zip(*episode.values())]
-
-        # first transition only contains observation (like env.reset())
-        observation, action, reward, done = observations.pop(0), actions.pop(0), rewards.pop(0), dones.pop(0)
-        agent.update_icl_observation(observation)
+            self.load_in_context_learning_episode(demo_path, agent, task=demo_task)
 
-        for observation, action, reward, done in zip(observations, actions, rewards, dones):
-            action = str(action)
+    def load_in_context_learning_episode(self, demo_path, agent, task=None):
+        store = self.store(task) if task is not None else None
+        if store is not None and demo_path in store.episodes:
+            events, done = store.episode_events(demo_path)
+        else:
+            events, done = episode_events(demo_path)
 
-            agent.update_icl_action(action)
-            agent.update_icl_observation(observation)
+        agent.update_icl_observation({"text": {"long_term_context": events[0]}})
 
-            if done:
-                break
+        for i in range(1, len(events), 2):
+            agent.update_icl_action(events[i])
+            agent.update_icl_observation({"text": {"long_term_context": events[i + 1]}})
 
         if not done:
             logging.info("icl trajectory ended without done")
@@ -4,10 +4,48 @@ import baba
 import gym
 import numpy as np
 from baba.world_object import name_mapping
-from PIL import Image
+
+from balrog.image import LazyImage
+from balrog.timing import timed
 
 BABAISAI_ACTION_SPACE = [a.name for a in baba.grid.BabaIsYouEnv.Actions]
 
+# Types of the objects described in the text observations
+OBJECT_TYPES = ["fball", "fwall", "fdoor", "fkey", "rule_object", "rule_is", "rule_property"]
+
+
+def describe_offset(name, x, y):
+    """Describe an object `x` cells to the right and `y` cells below the player."""
+
+    def steps(v):
+        return "steps" if v > 1 else "step"
+
+    name = name.removeprefix("f")
+
+    x_direction = ""
+    if x > 0:
+        x_direction = f"{x} {steps(x)} to the right"
+    elif x < 0:
+        x_direction = f"{-x} {steps(x)} to the left"
+
+    y_direction = ""
+    if y > 0:
+        y_direction = f"{y} {steps(y)} down"
+    elif y < 0:
+        y_direction = f"{-y} {steps(y)} up"
+
+    description = ""
+    if x_direction:
+        description = f"{name} {x_direction}"
+
+    if y_direction:
+        if x_direction:
+            description += f" and {y_direction}"
+        else:
+            description = f"{name} {y_direction}"
+
+    return description
+
 
 class BabaIsAIWrapper(gym.Wrapper):
     def __init__(self, env: gym.Env, add_ruleset=True, vlm=False):
@@ -16,6 +54,9 @@ class BabaIsAIWrapper(gym.Wrapper):
         self.language_action_space = BABAISAI_ACTION_SPACE[:]
         self.progression = 0.0
         self.target_plan = None
+        self._image = None
+        self._ruleset_key = None
+        self._ruleset = None
 
     @property
     def default_action(self):
@@ -30,19 +71,56 @@ class BabaIsAIWrapper(gym.Wrapper):
 
         This method extracts rules from the environment's grid ruleset,
         formats them into human-readable strings, and returns them as a
-        single string with each rule on a new line.
+        single string with each rule on a new line. The text is cached
+        until the ruleset changes.
+        """
+        return self._parse_ruleset()[0]
+
+    def _parse_ruleset(self):
+        """Return the ruleset text and the object that is "you", recomputed only when the ruleset changes."""
+        rules = self.env.grid._ruleset["_rule_"]
+        key = tuple((rule.get("object"), rule.get("property")) for rule in rules)
+        if key != self._ruleset_key:
+            lines = []
+            you = None
+            for rule in rules:
+                # all objects start with f, eg `fwall`, `fkey`...
+                # are objects that can be manipulated, `wall` is used to indicate end of map
+                if "object" in rule:  # BabaIsAI bug fix
+                    name = rule["object"].removeprefix("f")
+                    lines.append(f"{name} is {name_mapping[rule['property']]}")
+                if "property" in rule and name_mapping[rule["property"]] == "you":  # BabaIsAI bug fix
+                    you = rule["object"]
+            self._ruleset_key = key
+            self._ruleset = ("\n".join(lines), you)
+        return self._ruleset
+
+    def index_objects(self):
         """
-        rules = []
-        for rule in self.env.grid._ruleset["_rule_"]:
-            # all objects start with f, eg `fwall`, `fkey`...
-            # are objects that can be manipulated, `wall` is used to indicate end of map
-            if "object" not in rule:  # BabaIsAI bug fix
-                continue
-            name = rule["object"].removeprefix("f")
-            named_property = name_mapping[rule["property"]]
-            rules.append(f"{name} is {named_property}")
-
-        return "\n".join(rules)
+        Scan the grid once and index the positions of its objects by type.
+
+        Returns a dict mapping each object type to the (x, y) positions and
+        display names of its objects, in row-major order.
+        """
+        index = defaultdict(lambda: ([], []))
+        get = self.env.grid.get
+        for j in range(0, self.env.height):
+            for i in range(0, self.env.width):
+                cell = get(i, j)
+                if cell is None:
+                    continue
+                if cell.type == "rule_object":
+                    name = f"rule `{cell.name}`"
+                elif cell.type == "rule_is":
+                    name = f"rule `{name_mapping[cell.name]}`"
+                elif cell.type == "rule_property":
+                    name = f"rule `{name_mapping[cell.property]}`"
+                else:
+                    name = cell.type
+                positions, names = index[cell.type]
+                positions.append((i, j))
+                names.append(name)
+        return index
 
     def get_text_observation(self, obs):
         """
@@ -52,97 +130,27 @@ class BabaIsAIWrapper(gym.Wrapper):
         including the relative positions of various objects with respect
         to the player's position (represented by 'baba').
         """
-
-        def find_objects(objects):
-            obj = []
-            for j in range(0, self.env.height):
-                for i in range(0, self.env.width):
-                    cell = self.env.grid.get(i, j)
-                    if cell is not None and cell.type in objects:
-                        if cell.type == "rule_object":
-                            name = f"rule `{cell.name}`"
-                        elif cell.type == "rule_is":
-                            name = f"rule `{name_mapping[cell.name]}`"
-                        elif cell.type == "rule_property":
-                            name = f"rule `{name_mapping[cell.property]}`"
-                        else:
-                            name = cell.type
-                        obj.append(((i, j), name))
-            return obj
-
-        def calculate_offsets(reference_position, positions):
-            reference_position = np.asanyarray(reference_position)
-            positions = np.asanyarray(positions)
-
-            relative_positions = []
-            for pos in positions:
-                relative_positions.append(pos - reference_position)
-
-            return relative_positions
-
-        def form_description(relative_positions):
-            def steps(v):
-                return "steps" if v > 1 else "step"
-
-            descriptions = []
-            for pos in relative_positions:
-                (x, y), name = pos
-                name = name.removeprefix("f")
-
-                x_direction = ""
-                if x > 0:
-                    x_direction = f"{x} {steps(x)} to the right"
-                elif x < 0:
-                    x_direction = f"{-x} {steps(x)} to the left"
-
-                y_direction = ""
-                if y > 0:
-                    y_direction = f"{y} {steps(y)} down"
-                elif y < 0:
-                    y_direction = f"{-y} {steps(y)} up"
-
-                description = ""
-                if x_direction:
-                    description = f"{name} {x_direction}"
-
-                if y_direction:
-                    if x_direction:
-                        description += f" and {y_direction}"
-                    else:
-                        description = f"{name} {y_direction}"
-
-                descriptions.append(description)
-
-            return "\n".join(descriptions)
-
-        you = None
-        for rule in self.env.grid._ruleset["_rule_"]:
-            if "property" not in rule:  # BabaIsAI bug fix
-                continue
-            named_property = name_mapping[rule["property"]]
-            if named_property == "you":
-                you = rule["object"]
+        you = self._parse_ruleset()[1]
+        index = self.index_objects()
 
         # TODO: we need to handle multilpe me)
-        my_position = find_objects([you])
-        if len(my_position) == 0:
+        if you not in index:
             # We should reset the environment, as baba cannot legally move anymore
             return self.reset(), True
-        my_position = my_position[0]
-        other_positions = find_objects(
-            [
-                "fball",
-                "fwall",
-                "fdoor",
-                "fkey",
-                "rule_object",
-                "rule_is",
-                "rule_property",
-            ]
+        my_position = index[you][0][0]
+
+        positions, names = [], []
+        for object_type in OBJECT_TYPES:
+            if object_type in index:
+                positions += index[object_type][0]
+                names += index[object_type][1]
+        positions = np.array(positions, dtype=int).reshape(-1, 2)
+        # Describe the objects in row-major order
+        order = np.lexsort((positions[:, 0], positions[:, 1]))
+        offsets = positions[order] - my_position
+        text_observation = "\n".join(
+            describe_offset(names[k], x, y) for k, (x, y) in zip(order.tolist(), offsets.tolist())
         )
-        offsets = calculate_offsets(my_position[0], [p[0] for p in other_positions])
-        relative_positions = [(tuple(offset), pos[1]) for offset, pos in zip(offsets, other_positions)]
-        text_observation = form_description(relative_positions)
 
         return text_observation, False
 
@@ -157,8 +165,11 @@ class BabaIsAIWrapper(gym.Wrapper):
         obs = defaultdict(lambda: None)
 
         obs["text"] = {"long_term_context": prompt, "short_term_context": ""}
-        image = Image.fromarray(self.env.render(mode="rgb_array")).convert("RGB")
-        obs["image"] = image
+        # The previous frame can no longer be rendered from the live environment
+        if self._image is not None:
+            self._image.expire()
+        self._image = LazyImage(lambda: self.env.render(mode="rgb_array"))
+        obs["image"] = self._image
 
         return obs
 
@@ -176,7 +187,9 @@ class BabaIsAIWrapper(gym.Wrapper):
         if done:
             self.progression = 1.0 if reward > 0 else 0.0
 
-        return self.textworld_process_obsv(obs), reward, done, info
+        with timed("observation"):
+            obs = self.textworld_process_obsv(obs)
+        return obs, reward, done, info
 
     def get_stats(self):
         return {"target_plan": self.target_plan, "progression": self.progression}
@@ -1,8 +1,12 @@
+import random
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 import gymnasium as gym
 import minigrid
+import numpy as np
 
 from balrog.environments.babyai_text import BabyAITextCleanLangWrapper
 
@@ -17,15 +21,7 @@ broken_bonus_envs = {
 }
 
 
-# get all babyai envs (except the broken ones)
-BABYAI_ENVS = []
-for env_spec in gym.envs.registry:
-    id = env_spec
-    if id.split("-")[0] == "BabyAI":
-        if id not in broken_bonus_envs:
-            BABYAI_ENVS.append(id)
-
-BABYAI_ENVS += [
+MIXED_ENVS = [
     "BabyAI-MixedTrainLocal-v0/goto",
     "BabyAI-MixedTrainLocal-v0/pickup",
     "BabyAI-MixedTrainLocal-v0/open",
@@ -34,13 +30,73 @@ BABYAI_ENVS += [
 ]
 
 
+@lru_cache(maxsize=None)
+def babyai_envs():
+    """Return all babyai envs (except the broken ones), followed by the mixed tasks."""
+    envs = [id for id in gym.envs.registry if id.split("-")[0] == "BabyAI" and id not in broken_bonus_envs]
+    return envs + MIXED_ENVS
+
+
+def __getattr__(name):
+    # BABYAI_ENVS is listed from the gym registry on first access rather than at import
+    if name == "BABYAI_ENVS":
+        return babyai_envs()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# First construction seed known to give each goal of the mixed tasks, per (base_task, goal)
+_GOAL_SEEDS = {}
+
+
+@contextmanager
+def seeded_global_rng(seed):
+    """Seed the global `random` and `numpy` generators for the enclosed block, then restore their state."""
+    random_state = random.getstate()
+    np_random_state = np.random.get_state()
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        yield
+    finally:
+        random.setstate(random_state)
+        np.random.set_state(np_random_state)
+
+
+def make_mixed_env(base_task, goal, render_mode=None, **kwargs):
+    """Create a mixed BabyAI environment whose missions are of kind `goal`.
+
+    Mixed environments pick their kind of mission when they are constructed. They are constructed with
+    seeded global generators, trying seeds in order until the goal matches, and the matching seed is
+    remembered so that later environments for the same goal are created with a single construction.
+    Since the kind of mission never changes afterwards, the environment can be reset with new seeds
+    for further episodes.
+
+    Args:
+        base_task (str): The registered mixed environment, e.g. "BabyAI-MixedTrainLocal-v0".
+        goal (str): The kind of mission, e.g. "goto" or "pick_up_seq_go_to".
+        render_mode (str, optional): The render mode of the environment. Defaults to None.
+        **kwargs: Keyword arguments for `gym.make`.
+
+    Returns:
+        gym.Env: The environment.
+    """
+    seed = _GOAL_SEEDS.get((base_task, goal), 0)
+    while True:
+        with seeded_global_rng(seed):
+            env = gym.make(base_task, render_mode=render_mode, **kwargs)
+        if env.unwrapped.action_kinds[0].replace(" ", "_") == goal:
+            _GOAL_SEEDS[(base_task, goal)] = seed
+            return env
+        env.close()
+        seed += 1
+
+
 def make_babyai_env(env_name, task, config, render_mode: Optional[str] = None):
     if task.startswith("BabyAI-MixedTrainLocal-v0/"):
         base_task, goal = task.split("/")
-        while 1:
-            env = gym.make(base_task, render_mode=render_mode, **config.envs.babyai_kwargs)
-            if env.unwrapped.action_kinds[0].replace(" ", "_") == goal:
-                break
+        env = make_mixed_env(base_task, goal, render_mode=render_mode, **config.envs.babyai_kwargs)
+    else:
+        env = gym.make(task, render_mode=render_mode, **config.envs.babyai_kwargs)
 
     env = BabyAITextCleanLangWrapper(env, **config.envs.babyai_kwargs)
 
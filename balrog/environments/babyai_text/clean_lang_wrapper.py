@@ -1,5 +1,7 @@
 import gymnasium as gym
-from PIL import Image
+
+from balrog.image import LazyImage
+from balrog.timing import timed
 
 BABYAI_ACTION_SPACE = [
     "turn left",
@@ -17,6 +19,7 @@ class BabyAITextCleanLangWrapper(gym.Wrapper):
         self.language_action_space = BABYAI_ACTION_SPACE[:]
         self._mission = None
         self.progression = 0.0
+        self._image = None
 
     @property
     def max_steps(self):
@@ -34,7 +37,10 @@ class BabyAITextCleanLangWrapper(gym.Wrapper):
         return self.language_action_space[action.value]
 
     def get_prompt(self, obs, infos):
-        image = Image.fromarray(self.env.unwrapped.get_pov_render(tile_size=16)).convert("RGB")
+        # The previous frame can no longer be rendered from the live environment
+        if self._image is not None:
+            self._image.expire()
+        self._image = image = LazyImage(lambda: self.env.unwrapped.get_pov_render(tile_size=16))
 
         def _form_prompt(description):
             return "\n".join([d.replace("You see ", "") for d in description])
@@ -59,7 +65,8 @@ class BabyAITextCleanLangWrapper(gym.Wrapper):
         obs, reward, terminated, truncated, infos = self.env.step(action_int)
         if reward > 0:
             self.progression = 1.0
-        prompt, image = self.get_prompt(obs, infos)
+        with timed("observation"):
+            prompt, image = self.get_prompt(obs, infos)
         obs["text"] = {"long_term_context": prompt, "short_term_context": ""}
         obs["image"] = image
         return obs, reward, terminated, truncated, infos
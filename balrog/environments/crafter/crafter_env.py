@@ -26,6 +26,7 @@ def make_crafter_env(env_name, task, config, render_mode: Optional[str] = None):
         precise_location=precise_location,
         skip_items=skip_items,
         edge_only_items=edge_only_items,
+        world_seed=crafter_kwargs.get("seed"),
     )
     env = GymV21CompatibilityV0(env=env, render_mode=render_mode)
 
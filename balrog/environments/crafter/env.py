@@ -1,14 +1,13 @@
 import itertools
-import re
-from collections import defaultdict
+import logging
 
-import crafter
 import gym
 import numpy as np
-from PIL import Image
 from scipy import ndimage
 
 from balrog.environments import Strings
+from balrog.image import LazyImage
+from balrog.timing import timed
 
 ACTIONS = [
     "Noop",
@@ -30,17 +29,57 @@ ACTIONS = [
     "Make Iron Sword",
 ]
 
-id_to_item = [0] * 19
+logger = logging.getLogger(__name__)
+
+# Names of the ids of crafter's semantic view: the world's materials, then the object types. Precomputed
+# with `semantic_item_names` so that importing this module does not construct a crafter.Env
+id_to_item = [
+    "None",
+    "water",
+    "grass",
+    "stone",
+    "path",
+    "sand",
+    "tree",
+    "lava",
+    "coal",
+    "iron",
+    "diamond",
+    "table",
+    "furnace",
+    "player",
+    "cow",
+    "zombie",
+    "skeleton",
+    "arrow",
+    "plant",
+]
+player_idx = id_to_item.index("player")
 
 
-dummyenv = crafter.Env()
-for name, ind in itertools.chain(dummyenv._world._mat_ids.items(), dummyenv._sem_view._obj_ids.items()):
-    name = (
-        str(name)[str(name).find("objects.") + len("objects.") : -2].lower() if "objects." in str(name) else str(name)
-    )
-    id_to_item[ind] = name
-player_idx = id_to_item.index("player")
-del dummyenv
+def semantic_item_names(env):
+    """Return the names of the ids of the semantic view of a crafter.Env."""
+    mat_ids = env._world._mat_ids
+    obj_ids = env._sem_view._obj_ids
+    names = [0] * (len(mat_ids) + len(obj_ids))
+    for name, ind in itertools.chain(mat_ids.items(), obj_ids.items()):
+        name = (
+            str(name)[str(name).find("objects.") + len("objects.") : -2].lower()
+            if "objects." in str(name)
+            else str(name)
+        )
+        names[ind] = name
+    return names
+
+
+def check_semantic_item_names(env):
+    """Update the precomputed `id_to_item` table if the installed crafter numbers its items differently."""
+    global player_idx
+    names = semantic_item_names(env)
+    if names != id_to_item:
+        logger.warning("The crafter semantic ids differ from the precomputed table, using the ones of the environment")
+        id_to_item[:] = names
+        player_idx = id_to_item.index("player")
 
 vitals = [
     "health",
@@ -141,7 +180,7 @@ def describe_env(
     center = np.array([info["view"][0] // 2, info["view"][1] // 2 - 1])
     result = ""
     describe_loc = describe_loc_precise if precise_location else describe_loc_old
-    obj_info_list = []
+    skip_ids = [id_to_item.index(o) for o in skip_items]
 
     facing = info["player_facing"]
     max_x, max_y = semantic.shape
@@ -153,53 +192,41 @@ def describe_env(
         target_item = id_to_item[target_id]
 
         # skip grass, sand or path so obs here, since we are not displaying them
-        if target_id in [id_to_item.index(o) for o in skip_items]:
+        if target_id in skip_ids:
             target_item = "nothing"
 
         obs = "You face {} at your front.".format(target_item)
     else:
         obs = "You face nothing at your front."
 
-    # Edge detection
-    edge_masks = {}
+    # Visible cells, in row-major order, without the player and the skipped items
+    visible = semantic != player_idx
+    if skip_ids:
+        visible &= ~np.isin(semantic, skip_ids)
+
+    # Edge detection: only display the edge of items that are in edge_only_items
     for item_name in edge_only_items:
         item_idx = id_to_item.index(item_name)
-        edge_masks[item_idx] = get_edge_items(semantic, item_idx)
+        visible &= (semantic != item_idx) | get_edge_items(semantic, item_idx)
 
-    for i in range(semantic.shape[0]):
-        for j in range(semantic.shape[1]):
-            idx = semantic[i, j]
-            if idx == player_idx:
-                continue
-
-            # only display the edge of items that are in edge_only_items
-            if idx in edge_masks and not edge_masks[idx][i, j]:
-                continue
-
-            # skip grass, sand or path so obs is not too long
-            if idx in [id_to_item.index(o) for o in skip_items]:
-                continue
-
-            obj_info_list.append((id_to_item[idx], describe_loc(np.array([0, 0]), np.array([i, j]) - center)))
-
-    def extract_numbers(s):
-        """Extract all numbers from a string."""
-        return [int(num) for num in re.findall(r"\d+", s)]
+    rows, cols = np.nonzero(visible)
+    ids = semantic[rows, cols]
+    offsets = np.stack([rows - center[0], cols - center[1]], axis=1)
 
     # filter out items, so we only display closest item of each type
     if unique_items:
-        closest_obj_info_list = defaultdict(str)
-        for item_name, loc in obj_info_list:
-            loc_dist = sum(extract_numbers(loc))
-            current_dist = (
-                sum(extract_numbers(closest_obj_info_list[item_name]))
-                if closest_obj_info_list[item_name]
-                else float("inf")
-            )
-
-            if loc_dist < current_dist:
-                closest_obj_info_list[item_name] = loc
-        obj_info_list = [(name, loc) for name, loc in closest_obj_info_list.items()]
+        # Per item type, the first cell (in row-major order) at the smallest Manhattan distance
+        distances = np.abs(offsets).sum(axis=1)
+        by_distance = np.lexsort((np.arange(len(ids)), distances, ids))
+        _, group_starts = np.unique(ids[by_distance], return_index=True)
+        closest = by_distance[group_starts]
+        # Types are listed in the order of their first appearance
+        _, first_seen = np.unique(ids, return_index=True)
+        cells = closest[np.argsort(first_seen)]
+    else:
+        cells = range(len(ids))
+
+    obj_info_list = [(id_to_item[ids[k]], describe_loc(np.array([0, 0]), offsets[k])) for k in cells]
 
     if len(obj_info_list) > 0:
         status_str = "You see:\n{}".format("\n".join(["- {} {}".format(name, loc) for name, loc in obj_info_list]))
@@ -274,18 +301,22 @@ class CrafterLanguageWrapper(gym.Wrapper):
         precise_location=False,
         skip_items=[],
         edge_only_items=[],
+        world_seed=None,
     ):
         super().__init__(env)
+        check_semantic_item_names(env)
         self.score_tracker = 0
         self.language_action_space = Strings(ACTIONS)
         self.default_action = "Noop"
         self.max_steps = max_episode_steps
         self.achievements = None
+        self._image = None
 
         self.unique_items = unique_items
         self.precise_location = precise_location
         self.skip_items = skip_items
         self.edge_only_items = edge_only_items
+        self.world_seed = world_seed
 
     def get_text_action(self, action):
         return self.language_action_space._values[action]
@@ -305,6 +336,18 @@ class CrafterLanguageWrapper(gym.Wrapper):
         aug_info["view"] = self.env._view
         return obs, reward, done, aug_info
 
+    def seed(self, seed=None):
+        # Crafter derives the world of each reset from its seed and an episode counter; restarting the
+        # counter makes the next world depend only on the seed, whether or not the instance was used before.
+        # A configured world seed takes precedence over `seed`, so that every episode plays the same world,
+        # as a new instance created with that seed would
+        if self.world_seed is not None:
+            seed = self.world_seed
+        if seed is not None:
+            self.env._seed = seed
+            self.env._episode = 0
+        return [seed]
+
     def reset(self):
         self.env.reset()
         obs, reward, done, info = self._step_impl(0)
@@ -315,11 +358,15 @@ class CrafterLanguageWrapper(gym.Wrapper):
     def step(self, action):
         obs, reward, done, info = self._step_impl(self.language_action_space.map(action))
         self.score_tracker = self.update_progress(info)
-        obs = self.process_obs(obs, info)
+        with timed("observation"):
+            obs = self.process_obs(obs, info)
         return obs, reward, done, info
 
     def process_obs(self, obs, info):
-        img = Image.fromarray(self.env.render()).convert("RGB")
+        # The previous frame can no longer be rendered from the live environment
+        if self._image is not None:
+            self._image.expire()
+        self._image = img = LazyImage(self.env.render)
         long_term_context, short_term_context = describe_frame(
             info,
             unique_items=self.unique_items,
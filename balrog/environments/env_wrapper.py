@@ -19,6 +19,7 @@ class EnvWrapper(gym.Wrapper):
         return self.env.max_steps
 
     def reset(self, **kwargs):
+        self.failed_candidates = []
         obs, info = self.env.reset(**kwargs)
         return self._process_observation(obs), info
 
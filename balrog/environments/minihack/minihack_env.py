@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional
 
 import gym
@@ -6,11 +7,18 @@ import minihack  # NOQA: F401
 from balrog.environments.nle import AutoMore, NLELanguageWrapper
 from balrog.environments.wrappers import GymV21CompatibilityV0, NLETimeLimit
 
-MINIHACK_ENVS = []
-for env_spec in gym.envs.registry.all():
-    id = env_spec.id
-    if id.split("-")[0] == "MiniHack":
-        MINIHACK_ENVS.append(id)
+
+@lru_cache(maxsize=None)
+def minihack_envs():
+    """Return the ids of the registered MiniHack environments."""
+    return [env_spec.id for env_spec in gym.envs.registry.all() if env_spec.id.split("-")[0] == "MiniHack"]
+
+
+def __getattr__(name):
+    # MINIHACK_ENVS is listed from the gym registry on first access rather than at import
+    if name == "MINIHACK_ENVS":
+        return minihack_envs()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def make_minihack_env(env_name, task, config, render_mode: Optional[str] = None):
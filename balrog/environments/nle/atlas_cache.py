@@ -0,0 +1,79 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the cached arrays changes, to invalidate the atlases cached by older versions
+ATLAS_CACHE_VERSION = 1
+
+
+def atlas_cache_dirs():
+    """Directories searched for cached atlases, in order: the package directory, then the user cache."""
+    user_cache = os.environ.get("BALROG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "balrog"))
+    return [Path(__file__).parent, Path(user_cache)]
+
+
+def atlas_cache_key(sources, extra=()):
+    """Return the key of an atlas built from `sources`, changing whenever one of them or the cache format changes.
+
+    Args:
+        sources (Iterable[str]): Paths of the files the atlas is built from, including the module building it.
+        extra (Iterable): Other values the atlas depends on, e.g. the version of the library rendering it.
+
+    Returns:
+        str: Hexadecimal digest of the cache format version, the contents of the sources and the extra values.
+    """
+    digest = hashlib.sha256(f"v{ATLAS_CACHE_VERSION}".encode())
+    for path in sources:
+        digest.update(Path(path).read_bytes())
+    for value in extra:
+        digest.update(str(value).encode())
+    return digest.hexdigest()[:16]
+
+
+def load_cached_atlas(name, build, sources, extra=()):
+    """Return a texture atlas memory-mapped from its `.npy` cache, building and caching it on first use.
+
+    The atlas is read-only. Processes mapping the same file share a single copy of its pages. The cached
+    file is named after a key of its sources (see `atlas_cache_key`), so that an atlas cached before one of
+    them changed is rebuilt instead of being reused; stale atlases are removed when the new one is written.
+
+    Args:
+        name (str): File name of the cached atlas, without extension.
+        build (callable): Function building the atlas as an array when it is not cached yet.
+        sources (Iterable[str]): Paths of the files the atlas is built from.
+        extra (Iterable): Other values the atlas depends on.
+
+    Returns:
+        np.ndarray: The texture atlas.
+    """
+    file_name = f"{name}-{atlas_cache_key(sources, extra)}.npy"
+    for cache_dir in atlas_cache_dirs():
+        path = cache_dir / file_name
+        if path.is_file():
+            try:
+                return np.load(path, mmap_mode="r")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable atlas cache {path}: {e}")
+
+    atlas = build()
+    for cache_dir in atlas_cache_dirs():
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so that concurrent workers never map a partial file
+            with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".npy", delete=False) as f:
+                np.save(f, atlas)
+            os.replace(f.name, cache_dir / file_name)
+        except OSError:
+            continue
+        for stale_path in cache_dir.glob(f"{name}-*.npy"):
+            if stale_path.name != file_name:
+                stale_path.unlink(missing_ok=True)
+        return np.load(cache_dir / file_name, mmap_mode="r")
+    logger.warning(f"Could not cache the {name} atlas, it will be rebuilt by every process.")
+    return atlas
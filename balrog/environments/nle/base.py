@@ -1,16 +1,18 @@
 import random
 
+import numpy as np
 from nle import nle_language_obsv
 from nle.language_wrapper.wrappers import nle_language_wrapper as language_wrapper
 from nle.nethack import USEFUL_ACTIONS
-from PIL import Image
 
 from balrog.environments import Strings
+from balrog.image import LazyImage
+from balrog.timing import timed
 
 from ..minihack import ACTIONS as MINIHACK_ACTIONS
 from .progress import get_progress_system
 from .render import tty_render_image
-from .render_rgb import rgb_render_image
+from .render_rgb import IncrementalTileRenderer
 
 
 class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
@@ -21,6 +23,8 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         self.env = env
         self.vlm = vlm
         self.done = False
+        self._tile_renderer = IncrementalTileRenderer()
+        self._translations = {}  # Last translation of each observation part, with the arrays it was made from
 
         if not vlm:
             self.prompt_mode = "hybrid"
@@ -40,12 +44,15 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         return self.post_step(obsv)
 
     def reset(self, **kwargs):
+        self.done = False
+        self._translations.clear()
         self.progress = get_progress_system(self.env)
         obsv = self.env.reset(**kwargs)
         return self.post_reset(obsv)
 
     def post_step(self, nle_obsv):
-        return self.nle_process_obsv(nle_obsv)
+        with timed("observation"):
+            return self.nle_process_obsv(nle_obsv)
 
     @property
     def default_action(self):
@@ -58,7 +65,12 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         return NLELanguageWrapper.all_nle_action_map[self.env.actions[action]][0]
 
     def nle_process_obsv(self, nle_obsv):
-        img = Image.fromarray(self.render("tiles")).convert("RGB") if self.vlm else None
+        img = None
+        if self.vlm:
+            # NLE updates its arrays in place, so the image renders a snapshot of the current glyphs
+            obs = self.env.unwrapped.last_observation
+            glyphs = obs[self.env.unwrapped._observation_keys.index("glyphs")].copy()
+            img = LazyImage(lambda: self._tile_renderer.render(glyphs))
         text = self.nle_obsv_type(nle_obsv)
 
         return {
@@ -80,7 +92,7 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         if mode == "tiles":
             obs = self.env.unwrapped.last_observation
             glyphs = obs[self.env.unwrapped._observation_keys.index("glyphs")]
-            return rgb_render_image(glyphs)
+            return self._tile_renderer.render(glyphs).copy()
         elif mode == "tty_image":
             obs = self.env.unwrapped.last_observation
             tty_chars = obs[self.env.unwrapped._observation_keys.index("tty_chars")]
@@ -119,14 +131,12 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         return Strings(all_actions)
 
     def ascii_render(self, chars):
+        # Append a newline column and decode the whole grid at once (latin-1 maps each byte to chr(byte))
         rows, cols = chars.shape
-        result = ""
-        for i in range(rows):
-            for j in range(cols):
-                entry = chr(chars[i, j])
-                result += entry
-            result += "\n"
-        return result
+        buffer = np.empty((rows, cols + 1), dtype=np.uint8)
+        buffer[:, :cols] = chars
+        buffer[:, cols] = ord("\n")
+        return buffer.tobytes().decode("latin-1")
 
     def nle_obsv_to_language(self, nle_obsv):
         """Translate NLE Observation into a language observation.
@@ -148,16 +158,50 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         inv_strs = nle_obsv["inv_strs"]
         inv_letters = nle_obsv["inv_letters"]
 
+        # The glyph and cursor descriptions only depend on the player's position (x, y) within blstats, so
+        # they are keyed on it rather than on blstats, whose turn counter changes at every step
+        position = blstats[:2]
+
         return {
-            "text_glyphs": self.nle_language.text_glyphs(glyphs, blstats).decode("latin-1"),
+            "text_glyphs": self._translate(
+                "text_glyphs", lambda: self.nle_language.text_glyphs(glyphs, blstats), glyphs, position
+            ),
             "text_message": message,
-            "text_blstats": self.nle_language.text_blstats(blstats).decode("latin-1"),
-            "text_inventory": self.nle_language.text_inventory(inv_strs, inv_letters).decode("latin-1"),
-            "text_cursor": self.nle_language.text_cursor(glyphs, blstats, tty_cursor).decode("latin-1"),
+            "text_blstats": self._translate("text_blstats", lambda: self.nle_language.text_blstats(blstats), blstats),
+            "text_inventory": self._translate(
+                "text_inventory", lambda: self.nle_language.text_inventory(inv_strs, inv_letters), inv_strs, inv_letters
+            ),
+            "text_cursor": self._translate(
+                "text_cursor",
+                lambda: self.nle_language.text_cursor(glyphs, blstats, tty_cursor),
+                glyphs,
+                position,
+                tty_cursor,
+            ),
             "tty_chars": nle_obsv["tty_chars"],
             "tty_cursor": nle_obsv["tty_cursor"],
         }
 
+    def _translate(self, name, translate, *arrays):
+        """Return the decoded output of `translate`, reusing the previous one if its input arrays are unchanged.
+
+        NLE updates its observation arrays in place, so copies of the inputs are kept for the comparison.
+
+        Args:
+            name (str): Name of the observation part.
+            translate (callable): Function computing the part, as latin-1 encoded bytes.
+            *arrays: The arrays the part is computed from.
+
+        Returns:
+            str: The translated observation part.
+        """
+        cached = self._translations.get(name)
+        if cached is not None and all(np.array_equal(prev, array) for prev, array in zip(cached[0], arrays)):
+            return cached[1]
+        text = translate().decode("latin-1")
+        self._translations[name] = (tuple(np.array(array, copy=True) for array in arrays), text)
+        return text
+
     def render_text(self, nle_obsv):
         long_term_observations = [
             ("text_message", "message"),
@@ -179,10 +223,9 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         }
 
     def render_hybrid(self, nle_obsv):
-        ascii_map = self.ascii_render(nle_obsv["tty_chars"])
+        ascii_map = self.ascii_render(nle_obsv["tty_chars"][1:])  # skip the first (message) line
         cursor = nle_obsv["tty_cursor"]
         cursor = f"(x={cursor[1]}, y={cursor[0]})"
-        ascii_map = "\n".join(ascii_map.split("\n")[1:])  # remove first line
 
         nle_obsv["map"] = ascii_map
         nle_obsv["text_cursor"] = nle_obsv["text_cursor"] + "\n" + cursor
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional
 
 import gym
@@ -6,11 +7,18 @@ import nle  # NOQA: F401
 from balrog.environments.nle import AutoMore, NLELanguageWrapper
 from balrog.environments.wrappers import GymV21CompatibilityV0, NLETimeLimit
 
-NETHACK_ENVS = []
-for env_spec in gym.envs.registry.all():
-    id = env_spec.id
-    if "NetHack" in id:
-        NETHACK_ENVS.append(id)
+
+@lru_cache(maxsize=None)
+def nethack_envs():
+    """Return the ids of the registered NetHack environments."""
+    return [env_spec.id for env_spec in gym.envs.registry.all() if "NetHack" in env_spec.id]
+
+
+def __getattr__(name):
+    # NETHACK_ENVS is listed from the gym registry on first access rather than at import
+    if name == "NETHACK_ENVS":
+        return nethack_envs()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def make_nle_env(env_name, task, config, render_mode: Optional[str] = None):
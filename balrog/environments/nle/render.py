@@ -1,9 +1,12 @@
 import os
 
 import numpy as np
+import PIL
 from nle.language_wrapper.wrappers.nle_language_wrapper import NLELanguageWrapper
 from PIL import Image, ImageDraw, ImageFont
 
+from .atlas_cache import load_cached_atlas
+
 MAX_ACTION_LENGTH = max(
     [len(action_strs[0]) for action, action_strs in NLELanguageWrapper.all_nle_action_map.items()]
     + [
@@ -12,6 +15,9 @@ MAX_ACTION_LENGTH = max(
 )
 
 
+FONT_PATH = os.path.join(os.path.dirname(__file__), "Hack-Regular.ttf")
+
+
 def create_texture_map():
     COLORS = [
         "#000000",
@@ -34,8 +40,7 @@ def create_texture_map():
 
     # Load a font (using default font here)
     dummy_draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
-    path = os.path.join(os.path.dirname(__file__), "Hack-Regular.ttf")
-    font = ImageFont.truetype(path, 12)
+    font = ImageFont.truetype(FONT_PATH, 12)
     cell_width, cell_height = map(
         max,
         zip(*[dummy_draw.textbbox((0, 0), text=chr(i), font=font)[2:] for i in range(256)]),
@@ -89,12 +94,30 @@ def make_atlas():
     # plt.imsave("new_image.png", new_image)
 
 
-DEFAULT_TEXTURE_ATLAS = make_atlas()
+_DEFAULT_TEXTURE_ATLAS = None
+
+
+def default_texture_atlas():
+    """Return the font atlas, memory-mapped from its cache (built on first use)."""
+    global _DEFAULT_TEXTURE_ATLAS
+    if _DEFAULT_TEXTURE_ATLAS is None:
+        # The glyphs are rendered by Pillow, whose version is part of the cache key
+        _DEFAULT_TEXTURE_ATLAS = load_cached_atlas(
+            "font_atlas", make_atlas, sources=[FONT_PATH, __file__], extra=[PIL.__version__]
+        )
+    return _DEFAULT_TEXTURE_ATLAS
+
+
+def __getattr__(name):
+    # DEFAULT_TEXTURE_ATLAS is loaded on first access rather than at import
+    if name == "DEFAULT_TEXTURE_ATLAS":
+        return default_texture_atlas()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def tty_render_image(tty_chars, tty_colors, tty_cursor=None, *, texture_atlas=None):
     if texture_atlas is None:
-        texture_atlas = DEFAULT_TEXTURE_ATLAS
+        texture_atlas = default_texture_atlas()
     tty_colors_masked = (
         tty_colors & 15
     )  # I don't know why sometimes color > 15 but this is effectively what the ASCII renderers do
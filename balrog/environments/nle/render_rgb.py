@@ -5,6 +5,8 @@ import numpy as np
 from nle.language_wrapper.wrappers.nle_language_wrapper import NLELanguageWrapper
 from PIL import Image, ImageDraw, ImageFont
 
+from .atlas_cache import load_cached_atlas
+
 glyph2tile = np.array(
     [
         0,
@@ -5993,15 +5995,32 @@ MAXOTHTILE = 1037
 # MAX_ACTION_LENGTH = max([len(action_strs[0]) for action, action_strs in NLELanguageWrapper.all_nle_action_map.items()] + [len("ACTION HISTORY"),])
 
 
+TILES_PATH = os.path.join(os.path.dirname(__file__), "tiles.pkl")
+
+
 def load_atlas():
-    tiles_path = os.path.join(os.path.dirname(__file__), "tiles.pkl")
-    with open(tiles_path, "rb") as f:
+    with open(TILES_PATH, "rb") as f:
         tiles = pickle.load(f)
     N = len(tiles)
     return np.stack([tiles[i] for i in range(N)])
 
 
-DEFAULT_TEXTURE_ATLAS = load_atlas()
+_DEFAULT_TEXTURE_ATLAS = None
+
+
+def default_texture_atlas():
+    """Return the tile atlas, memory-mapped from its cache (built from tiles.pkl on first use)."""
+    global _DEFAULT_TEXTURE_ATLAS
+    if _DEFAULT_TEXTURE_ATLAS is None:
+        _DEFAULT_TEXTURE_ATLAS = load_cached_atlas("tiles_atlas", load_atlas, sources=[TILES_PATH, __file__])
+    return _DEFAULT_TEXTURE_ATLAS
+
+
+def __getattr__(name):
+    # DEFAULT_TEXTURE_ATLAS is loaded on first access rather than at import
+    if name == "DEFAULT_TEXTURE_ATLAS":
+        return default_texture_atlas()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # image = np.concatenate((DEFAULT_TEXTURE_ATLAS, np.zeros((38, 16, 16, 3), dtype=DEFAULT_TEXTURE_ATLAS.dtype)), axis=0)
 # image = image.reshape(28, 40, 16, 16, 3).transpose(0, 2, 1, 3, 4).reshape(448, 640, 3)
@@ -6010,7 +6029,7 @@ DEFAULT_TEXTURE_ATLAS = load_atlas()
 
 def rgb_render_image(glyphs, *, texture_atlas=None):
     if texture_atlas is None:
-        texture_atlas = DEFAULT_TEXTURE_ATLAS
+        texture_atlas = default_texture_atlas()
     nrows, ncols = glyphs.shape
     tiles = glyph2tile[glyphs]
     assert tiles.max() < MAXOTHTILE
@@ -6021,6 +6040,39 @@ def rgb_render_image(glyphs, *, texture_atlas=None):
     )
 
 
+class IncrementalTileRenderer:
+    """Renders glyph grids like `rgb_render_image`, into a frame buffer kept across calls.
+
+    Only the cells whose glyph differs from the previously rendered grid are blitted, which between two
+    NetHack steps is usually a handful of cells. The returned frame is overwritten by the next call, so
+    callers that keep it must copy it.
+    """
+
+    def __init__(self, texture_atlas=None):
+        self.texture_atlas = texture_atlas
+        self._glyphs = None
+        self._frame = None
+
+    def render(self, glyphs):
+        if self.texture_atlas is None:
+            self.texture_atlas = default_texture_atlas()
+        if self._glyphs is None or self._glyphs.shape != glyphs.shape:
+            self._frame = np.ascontiguousarray(rgb_render_image(glyphs, texture_atlas=self.texture_atlas))
+            self._glyphs = glyphs.copy()
+            return self._frame
+
+        rows, cols = np.nonzero(glyphs != self._glyphs)
+        if rows.size:
+            tiles = glyph2tile[glyphs[rows, cols]]
+            assert tiles.max() < MAXOTHTILE
+            nrows, ncols = glyphs.shape
+            tile_height, tile_width = self.texture_atlas.shape[1:3]
+            cells = self._frame.reshape(nrows, tile_height, ncols, tile_width, 3)
+            cells[rows, :, cols] = self.texture_atlas[tiles]
+            self._glyphs[rows, cols] = glyphs[rows, cols]
+        return self._frame
+
+
 if __name__ == "__main__":
     from nle.env import tasks
     from nle.nethack import tty_render
@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from balrog.environments import make_env
+
+logger = logging.getLogger(__name__)
+
+# Environments whose instances can be reset with a new seed and replay a fresh episode, identical to the
+# first episode of a new instance reset with that seed. TextWorld binds a game file to each instance, so it
+# is rebuilt. BabyAI instances keep the goal of their mixed task, which is what the pool is keyed by.
+REUSABLE_ENVS = {"nle", "minihack", "crafter", "babaisai", "babyai"}
+
+
+class EnvPool:
+    """Per-process pool of idle environments, keyed by (env_name, task).
+
+    Environments are leased for one episode. When `reuse` is enabled, instances of reusable environments
+    are kept alive afterwards and reset with the seed of the next episode, instead of being rebuilt (which
+    for NLE and MiniHack means spawning a new NetHack process). All other environments are closed when
+    their episode ends.
+    """
+
+    def __init__(self, config, reuse=True):
+        """Initialize the EnvPool.
+
+        Args:
+            config (omegaconf.DictConfig): Configuration used to create the environments.
+            reuse (bool, optional): Whether to keep environments alive across episodes. Defaults to True.
+        """
+        self.config = config
+        self.reuse = reuse
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def acquire(self, env_name, task):
+        """Return an idle environment for the task, or a new one if none is available.
+
+        Args:
+            env_name (str): The name of the environment.
+            task (str): The task within the environment.
+
+        Returns:
+            EnvWrapper: The environment, to be reset before use.
+        """
+        with self._lock:
+            idle = self._idle[(env_name, task)]
+            if idle:
+                return idle.pop()
+        return make_env(env_name, task, self.config)
+
+    def release(self, env):
+        """Return an environment to the pool after its episode, closing it if it cannot be reused.
+
+        Args:
+            env (EnvWrapper): The environment returned by `acquire`.
+        """
+        if self.reuse and env.env_name in REUSABLE_ENVS:
+            with self._lock:
+                self._idle[(env.env_name, env.task_name)].append(env)
+        else:
+            self.discard(env)
+
+    def discard(self, env):
+        """Close an environment without returning it to the pool.
+
+        Args:
+            env (EnvWrapper): The environment returned by `acquire`.
+        """
+        try:
+            env.close()
+        except Exception as e:
+            logger.warning(f"Failed to close environment {env.env_name}/{env.task_name}: {e}")
+
+    @contextmanager
+    def lease(self, env_name, task):
+        """Context manager acquiring an environment for one episode.
+
+        The environment is released when the block completes, and discarded if it raises, since its state
+        is then unknown.
+
+        Args:
+            env_name (str): The name of the environment.
+            task (str): The task within the environment.
+
+        Yields:
+            EnvWrapper: The environment, to be reset before use.
+        """
+        env = self.acquire(env_name, task)
+        try:
+            yield env
+        except BaseException:
+            self.discard(env)
+            raise
+        self.release(env)
+
+    def close(self):
+        """Close all idle environments."""
+        with self._lock:
+            idle = [env for envs in self._idle.values() for env in envs]
+            self._idle.clear()
+        for env in idle:
+            self.discard(env)
+
+
+_ENV_POOLS = {}
+
+
+def get_env_pool(config):
+    """Return the environment pool of the current process, creating it if needed.
+
+    Pools are never shared across processes: a pool inherited through fork holds environments backed by
+    the parent's native resources.
+
+    Args:
+        config (omegaconf.DictConfig): Configuration used to create the environments.
+
+    Returns:
+        EnvPool: The pool of the current process.
+    """
+    pid = os.getpid()
+    if pid not in _ENV_POOLS:
+        _ENV_POOLS[pid] = EnvPool(config, reuse=config.eval.get("reuse_envs", True))
+    return _ENV_POOLS[pid]
+
+
+def close_env_pool():
+    """Close the idle environments of the current process's pool, if any."""
+    pool = _ENV_POOLS.pop(os.getpid(), None)
+    if pool is not None:
+        pool.close()
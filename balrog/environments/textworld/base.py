@@ -1,5 +1,7 @@
 import glob
 import importlib.resources
+import json
+import logging
 import os
 from collections import defaultdict
 from pathlib import Path
@@ -8,8 +10,81 @@ import gym
 import textworld
 import textworld.gym
 
+from balrog.timing import timed
+
+logger = logging.getLogger(__name__)
+
 workspace_dir = os.path.dirname(importlib.resources.files("balrog").__str__())
 
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+GAME_PATTERNS = ["*.ulx", "*.z8"]
+
+
+def scan_games(games_path):
+    """Find the game files under `games_path`, grouped by task (the name of the directory holding them).
+
+    Args:
+        games_path (str): Root directory of the games.
+
+    Returns:
+        dict: The paths of the games of each task, relative to `games_path`.
+    """
+    games = defaultdict(list)
+    for pattern in GAME_PATTERNS:
+        for entry in sorted(glob.glob(os.path.join(games_path, f"**/{pattern}"), recursive=True)):
+            games[Path(entry).parent.name].append(os.path.relpath(entry, games_path))
+    return dict(games)
+
+
+def _game_directory_mtimes(games_path, games):
+    """Return the modification times of the directories holding the games, which change when games are added or removed."""
+    directories = {os.path.dirname(path) for paths in games.values() for path in paths}
+    return {directory: os.stat(os.path.join(games_path, directory)).st_mtime_ns for directory in sorted(directories)}
+
+
+def load_game_manifest(games_path, tasks=()):
+    """Return the game files under `games_path` grouped by task, from the manifest stored next to them.
+
+    The manifest is rebuilt (by scanning the whole tree) when it is missing, when a directory holding games
+    was modified since it was written, or when one of `tasks` is not in it.
+
+    Args:
+        games_path (str): Root directory of the games.
+        tasks (iterable, optional): Tasks that are expected to have games. Defaults to ().
+
+    Returns:
+        dict: The paths of the games of each task, relative to `games_path`.
+    """
+    manifest_path = os.path.join(games_path, MANIFEST_FILENAME)
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        games = manifest["games"]
+        if (
+            manifest.get("version") == MANIFEST_VERSION
+            and manifest["directories"] == _game_directory_mtimes(games_path, games)
+            and all(task in games for task in tasks)
+        ):
+            return games
+    except (OSError, ValueError, KeyError):
+        pass
+
+    games = scan_games(games_path)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "games": games,
+        "directories": _game_directory_mtimes(games_path, games),
+    }
+    try:
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        logger.warning(f"Could not write the TextWorld game manifest {manifest_path}: {e}")
+    return games
+
 
 class TextWorldFactory:
     """
@@ -17,6 +92,8 @@ class TextWorldFactory:
 
     This class manages the creation of TextWorld environments for different tasks,
     cycling through available games for each task or allowing specific game selection.
+    The games of each task are listed from a manifest, and each game is registered
+    with TextWorld only when it is first played.
     """
 
     _instance = None
@@ -39,13 +116,28 @@ class TextWorldFactory:
 
         self.request_infos = textworld.EnvInfos(**kwargs)
 
-        self.env_ids = defaultdict(list)
-        for pattern in ["*.ulx", "*.z8"]:
-            for entry in sorted(glob.glob(os.path.join(textworld_games_path, f"**/{pattern}"), recursive=True)):
-                task = Path(entry).parent.name
-                if task in tasks:
-                    env_id = textworld.gym.register_game(entry, self.request_infos, max_episode_steps=max_episode_steps)
-                    self.env_ids[task].append(env_id)
+        games = load_game_manifest(textworld_games_path, tasks)
+        self.game_paths = {
+            task: [os.path.join(textworld_games_path, path) for path in paths]
+            for task, paths in games.items()
+            if task in tasks
+        }
+        self._env_ids = {}
+
+    def get_env_id(self, game_path):
+        """Return the gym id of a game, registering it with TextWorld on first use.
+
+        Args:
+            game_path (str): Path of the game file.
+
+        Returns:
+            str: The id to pass to `textworld.gym.make`.
+        """
+        if game_path not in self._env_ids:
+            self._env_ids[game_path] = textworld.gym.register_game(
+                game_path, self.request_infos, max_episode_steps=self.max_steps
+            )
+        return self._env_ids[game_path]
 
     def get_textworld_env(self, task, seed=None, **kwargs):
         """
@@ -63,16 +155,17 @@ class TextWorldFactory:
         Raises:
             KeyError: If the specified task is not found in the available tasks.
         """
-        if task not in self.env_ids:
-            raise KeyError(f"Task '{task}' not found. Available tasks are: {list(self.env_ids.keys())}")
+        if task not in self.game_paths:
+            raise KeyError(f"Task '{task}' not found. Available tasks are: {list(self.game_paths.keys())}")
 
+        game_paths = self.game_paths[task]
         if seed is not None:
-            env_id = self.env_ids[task][seed % len(self.env_ids[task])]
+            game_path = game_paths[seed % len(game_paths)]
         else:
             self.count[task] += 1
-            env_id = self.env_ids[task][self.count[task] % len(self.env_ids[task])]
+            game_path = game_paths[self.count[task] % len(game_paths)]
 
-        env = textworld.gym.make(env_id, **kwargs)
+        env = textworld.gym.make(self.get_env_id(game_path), **kwargs)
         env = TextWorldWrapper(env, max_steps=self.max_steps)
         return env
 
@@ -124,12 +217,13 @@ class TextWorldWrapper(gym.Wrapper):
 
     def step(self, action):
         obs, reward, done, info = self.env.step(action)
-        obs = self.filter_objective(obs, info)
 
         if done:
             self.progression = max(info["score"] / info["max_score"], 1.0 if info["won"] else 0.0)
 
-        return self.textworld_process_obsv(obs), reward, done, info
+        with timed("observation"):
+            obs = self.textworld_process_obsv(self.filter_objective(obs, info))
+        return obs, reward, done, info
 
     def get_stats(self):
         return {"progression": self.progression}
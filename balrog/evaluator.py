@@ -1,22 +1,30 @@
+import asyncio
 import copy
-import csv
 import json
 import logging
 import multiprocessing
 import os
+import queue
 import random
 import time
 import traceback
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
 from omegaconf import OmegaConf
 from tqdm import tqdm
 
-from balrog.agents.few_shot import FewShotAgent
 from balrog.dataset import InContextDataset
-from balrog.environments import make_env
+from balrog.environments.pool import close_env_pool, get_env_pool
+from balrog.image import resolve_image
+from balrog.metrics import EvalMetrics, is_step_report, report_step, set_step_sink
+from balrog.results import ResultsIndex
+from balrog.scheduler import schedule_tasks
+from balrog.timing import StepTimer, timed
+from balrog.trajectory import NullTrajectory, close_trajectory_writer, get_trajectory_writer
 from balrog.utils import get_unique_seed
 
 logger = logging.getLogger(__name__)
@@ -26,7 +34,8 @@ class EvaluatorManager:
     """Manages evaluation of agents across multiple environments and tasks.
 
     The EvaluatorManager initializes evaluators for each specified environment and handles the execution
-    of evaluation tasks either sequentially or in parallel using multiple workers.
+    of evaluation tasks either sequentially or in parallel using multiple workers. When `eval.episodes_in_flight`
+    is greater than one, every worker (or the main process) drives that many episodes concurrently with asyncio.
     """
 
     def __init__(self, config, original_cwd="", output_dir="."):
@@ -60,7 +69,18 @@ class EvaluatorManager:
                         logging.info(f"Skipping completed task: {env_name}, {task}, episode {episode_idx}")
                     else:
                         self.tasks.append((env_name, task, episode_idx))
+
+        self.results_index = ResultsIndex(self.output_dir)
+        # Index the completed episodes of a resumed run that are missing from the index
+        self.results_index.reconcile(self.output_dir)
+
+        if config.eval.get("schedule", "longest_first") == "longest_first":
+            history_dirs = [output_dir] + [
+                os.path.join(original_cwd, history_dir) for history_dir in config.eval.get("schedule_history", [])
+            ]
+            self.tasks = schedule_tasks(self.tasks, config, history_dirs=history_dirs)
         self.num_workers = config.eval.num_workers
+        self.episodes_in_flight = config.eval.episodes_in_flight
 
     def run(self, agent_factory):
         """Run the evaluation using the specified agent factory.
@@ -71,10 +91,23 @@ class EvaluatorManager:
         Returns:
             dict: Results of the evaluation aggregated by environment name.
         """
-        if self.num_workers > 1:
-            results = self._run_parallel(agent_factory)
-        else:
-            results = self._run_sequential(agent_factory)
+        self.metrics = EvalMetrics(
+            self.output_dir,
+            len(self.tasks),
+            interval=self.config.eval.get("metrics_interval", 10),
+            port=self.config.eval.get("metrics_port", None),
+            host=self.config.eval.get("metrics_host", "127.0.0.1"),
+        )
+        try:
+            if self.num_workers > 1:
+                results = self._run_parallel(agent_factory)
+            elif self.episodes_in_flight > 1:
+                results = self._run_async(agent_factory)
+            else:
+                results = self._run_sequential(agent_factory)
+        finally:
+            set_step_sink(None)
+            self.metrics.close()
         return results
 
     def _run_sequential(self, agent_factory):
@@ -88,13 +121,55 @@ class EvaluatorManager:
         """
         results = defaultdict(list)
         total_episodes = len(self.tasks)
-        with tqdm(total=total_episodes, desc="Evaluating Episodes", position=0) as pbar:
-            for env_name, task, episode_idx in self.tasks:
-                evaluator = self.env_evaluators[env_name]
-                agent = agent_factory.create_agent()
-                episode_log = evaluator.run_episode(task, agent, position=1, episode_idx=episode_idx)
-                results[env_name].append(episode_log)
+        set_step_sink(self.metrics.record_step)
+        try:
+            with tqdm(total=total_episodes, desc="Evaluating Episodes", position=0) as pbar:
+                for env_name, task, episode_idx in self.tasks:
+                    evaluator = self.env_evaluators[env_name]
+                    agent = agent_factory.create_agent()
+                    episode_log = evaluator.run_episode(task, agent, position=1, episode_idx=episode_idx)
+                    results[env_name].append(episode_log)
+                    self.results_index.add(env_name, episode_log)
+                    self.metrics.record_episode(env_name, episode_log)
+                    pbar.update(1)
+        finally:
+            close_env_pool()
+            close_trajectory_writer()
+        return results
+
+    def _run_async(self, agent_factory):
+        """Run the evaluation in the main process, keeping `episodes_in_flight` episodes in flight.
+
+        Args:
+            agent_factory (AgentFactory): Factory object to create agents for evaluation.
+
+        Returns:
+            dict: Results of the evaluation aggregated by environment name.
+        """
+        results = defaultdict(list)
+        pending_tasks = iter(self.tasks)
+
+        async def next_task():
+            return next(pending_tasks, None)
+
+        set_step_sink(self.metrics.record_step)
+        with tqdm(total=len(self.tasks), desc="Evaluating Episodes", position=0) as pbar:
+
+            def put_result(result):
+                if "error" in result:
+                    logging.error(f"Error in task {result['task']}: {result['error']}")
+                    logging.error(f"Traceback:\n{result['traceback']}")
+                else:
+                    results[result["env_name"]].append(result)
+                    self.results_index.add(result["env_name"], result)
+                self.metrics.record_episode(result["env_name"], result)
                 pbar.update(1)
+
+            try:
+                asyncio.run(self._drive_episodes(agent_factory, next_task, put_result, process_num=None, position=1))
+            finally:
+                close_env_pool()
+                close_trajectory_writer()
         return results
 
     def _run_parallel(self, agent_factory):
@@ -111,8 +186,9 @@ class EvaluatorManager:
 
         ctx = multiprocessing.get_context("fork")
 
-        # Initially fill the task queue with tasks up to the number of workers
-        for item in self.tasks[: self.num_workers]:
+        # Initially fill the task queue with one task per episode slot
+        num_slots = self.num_workers * self.episodes_in_flight
+        for item in self.tasks[:num_slots]:
             task_queue.put(item)
 
         # Create a master progress bar
@@ -121,11 +197,12 @@ class EvaluatorManager:
         # Assign unique positions for progress bars
         positions = list(range(self.num_workers))
 
+        worker = self._async_worker if self.episodes_in_flight > 1 else self._worker
         processes = []
         for idx in range(self.num_workers):
             position = positions[idx]
             p = ctx.Process(
-                target=self._worker,
+                target=worker,
                 args=(task_queue, results_queue, agent_factory, position),
             )
             processes.append(p)
@@ -133,17 +210,27 @@ class EvaluatorManager:
 
         results = defaultdict(list)
         tasks_completed = 0
-        tasks_queued = self.num_workers
+        tasks_queued = num_slots
 
         total_tasks = len(self.tasks)
 
         while tasks_completed < total_tasks:
-            result = results_queue.get()
+            try:
+                result = results_queue.get(timeout=self.metrics.interval)
+            except queue.Empty:
+                # Keep the metrics file fresh while no worker reports anything (e.g. all of them are stalled)
+                self.metrics.maybe_write()
+                continue
+            if is_step_report(result):
+                self.metrics.record_step(result)
+                continue
             if "error" in result:
                 logging.error(f"Error in task {result['task']} processed by {result['process_num']}: {result['error']}")
                 logging.error(f"Traceback:\n{result['traceback']}")
             else:
                 results[result["env_name"]].append(result)
+                self.results_index.add(result["env_name"], result)
+            self.metrics.record_episode(result["env_name"], result)
             tasks_completed += 1
 
             # Update progress bar
@@ -155,8 +242,8 @@ class EvaluatorManager:
                 task_queue.put(self.tasks[tasks_queued])
                 tasks_queued += 1
 
-        # Signal workers to stop
-        for _ in range(self.num_workers):
+        # Signal every episode slot to stop
+        for _ in range(num_slots):
             task_queue.put(None)
 
         # Wait for all processes to finish
@@ -183,35 +270,145 @@ class EvaluatorManager:
 
         agent = agent_factory.create_agent()
         process_num = multiprocessing.current_process().name
-        while True:
-            item = task_queue.get()
-            if item is None:
-                break
-            try:
-                env_name, task, episode_idx = item
-                evaluator = self.env_evaluators[env_name]
-                result = evaluator.run_episode(
-                    task,
-                    agent,
+        set_step_sink(results_queue.put)
+        try:
+            while True:
+                item = task_queue.get()
+                if item is None:
+                    break
+                try:
+                    env_name, task, episode_idx = item
+                    evaluator = self.env_evaluators[env_name]
+                    result = evaluator.run_episode(
+                        task,
+                        agent,
+                        process_num=process_num,
+                        position=position + 1,
+                        episode_idx=episode_idx,
+                    )
+                    result["process_num"] = process_num  # Include process number in result
+                    result["env_name"] = env_name
+                    results_queue.put(result)
+                except Exception as e:
+                    tb = traceback.format_exc()
+                    logging.error(f"Error in worker processing task {task}: {e}\n{tb}")
+                    results_queue.put(
+                        {
+                            "env_name": env_name,
+                            "task": task,
+                            "error": str(e),
+                            "traceback": tb,
+                            "process_num": process_num,
+                        }
+                    )
+        finally:
+            close_env_pool()
+            close_trajectory_writer()
+
+    def _async_worker(self, task_queue, results_queue, agent_factory, position):
+        """Worker process driving up to `episodes_in_flight` episodes concurrently with asyncio.
+
+        Args:
+            task_queue (multiprocessing.Queue): Queue containing tasks to process.
+            results_queue (multiprocessing.Queue): Queue to put the results.
+            agent_factory (AgentFactory): Factory object to create agents.
+            position (int): Position index of the worker, used to place the progress bars.
+        """
+        seed = get_unique_seed(process_num=position)
+        random.seed(seed)
+        np.random.seed(seed)
+
+        process_num = multiprocessing.current_process().name
+        set_step_sink(results_queue.put)
+
+        async def next_task():
+            return await asyncio.get_running_loop().run_in_executor(None, task_queue.get)
+
+        try:
+            asyncio.run(
+                self._drive_episodes(
+                    agent_factory,
+                    next_task,
+                    results_queue.put,
                     process_num=process_num,
-                    position=position + 1,
-                    episode_idx=episode_idx,
+                    position=position * self.episodes_in_flight + 1,
                 )
-                result["process_num"] = process_num  # Include process number in result
-                result["env_name"] = env_name
-                results_queue.put(result)
-            except Exception as e:
-                tb = traceback.format_exc()
-                logging.error(f"Error in worker processing task {task}: {e}\n{tb}")
-                results_queue.put(
-                    {
+            )
+        finally:
+            close_env_pool()
+            close_trajectory_writer()
+
+    async def _drive_episodes(self, agent_factory, next_task, put_result, process_num=None, position=0):
+        """Play episodes on `episodes_in_flight` concurrent slots until `next_task` returns None.
+
+        Each slot owns its agent, since agents keep per-episode prompt state.
+
+        Args:
+            agent_factory (AgentFactory): Factory object to create agents.
+            next_task (callable): Coroutine function returning the next `(env_name, task, episode_idx)` or None.
+            put_result (callable): Callback receiving each episode log (or error report).
+            process_num (str, optional): Identifier of the process running the episodes. Defaults to None.
+            position (int, optional): Position index of the first slot's progress bar. Defaults to 0.
+        """
+        # A slot blocks at most one thread at a time (waiting on the task queue, running a synchronous agent or
+        # an environment operation)
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.episodes_in_flight))
+
+        async def slot(slot_idx):
+            agent = agent_factory.create_agent()
+            while True:
+                item = await next_task()
+                if item is None:
+                    break
+                env_name, task, episode_idx = item
+                try:
+                    result = await self.env_evaluators[env_name].arun_episode(
+                        task,
+                        agent,
+                        process_num=process_num,
+                        position=position + slot_idx,
+                        episode_idx=episode_idx,
+                    )
+                    result["process_num"] = process_num
+                    result["env_name"] = env_name
+                except Exception as e:
+                    tb = traceback.format_exc()
+                    logging.error(f"Error in episode slot processing task {task}: {e}\n{tb}")
+                    result = {
                         "env_name": env_name,
                         "task": task,
                         "error": str(e),
                         "traceback": tb,
                         "process_num": process_num,
                     }
-                )
+                put_result(result)
+
+        await asyncio.gather(*(slot(slot_idx) for slot_idx in range(self.episodes_in_flight)))
+
+
+class _BlockingCall:
+    """Blocking operation of an episode (e.g. a NetHack process spawn or a Crafter world generation).
+
+    `Evaluator._play_episode` yields it to its runner, which runs it and sends back the result: directly in
+    synchronous mode, in the event loop's default executor in asynchronous mode.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self):
+        return self.func(*self.args, **self.kwargs)
+
+
+@lru_cache(maxsize=None)
+def _few_shot_agent_class():
+    """Return the FewShotAgent class, imported on first use so that importing the evaluator does not load the agents."""
+    from balrog.agents.few_shot import FewShotAgent
+
+    return FewShotAgent
 
 
 class Evaluator:
@@ -238,6 +435,7 @@ class Evaluator:
         self.num_episodes = config.eval.num_episodes[self.env_name]
         self.num_workers = config.eval.num_workers
         self.max_steps_per_episode = config.eval.max_steps_per_episode
+        self.trajectory_format = config.eval.get("trajectory_format", "csv")
 
         self.dataset = InContextDataset(self.config, self.env_name, original_cwd=original_cwd)
 
@@ -254,132 +452,235 @@ class Evaluator:
         Returns:
             dict: Log of the episode containing statistics and results.
         """
-        env = make_env(self.env_name, task, self.config)
-        agent.reset()
-
-        seed = self.config.envs.env_kwargs.seed
-        if seed is None:
-            seed = get_unique_seed(process_num=process_num, episode_idx=episode_idx)
-        random.seed(seed)
-        np.random.seed(seed)
-        obs, info = env.reset(seed=seed)
-        episode_log = {
-            "task": task,
-            "action_frequency": defaultdict(int),
-            "input_tokens": 0,
-            "output_tokens": 0,
-        }
-
-        instructions = None
-        if self.env_name == "babyai":
-            instructions = obs["mission"]
-        agent.prompt_builder.update_instruction_prompt(env.get_instruction_prompt(instructions=instructions))
-
-        episode_return = 0.0
-
-        max_steps_per_episode = env.max_steps if self.max_steps_per_episode is None else self.max_steps_per_episode
+        episode = self._play_episode(task, agent, process_num=process_num, position=position, episode_idx=episode_idx)
+        try:
+            request = next(episode)
+            while True:
+                if isinstance(request, _BlockingCall):
+                    request = episode.send(request())
+                else:
+                    obs, prev_action = request
+                    request = episode.send(agent.act(obs, prev_action=prev_action))
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            episode.close()
+
+    async def arun_episode(self, task, agent, process_num=None, position=0, episode_idx=0):
+        """Run a single evaluation episode, awaiting the agent's asynchronous `aact`.
+
+        The construction, resets and steps of the environment run in the event loop's default executor.
 
-        # Create a unique CSV filename for this episode
-        csv_filename = os.path.join(self.output_dir, self.env_name, task, f"{task}_run_{episode_idx:02d}.csv")
-        Path(csv_filename).parent.mkdir(exist_ok=True, parents=True)
+        Args:
+            task (str): Task name.
+            agent (Agent): Agent to evaluate.
+            process_num (str, optional): Identifier of the process running the episode. Defaults to None.
+            position (int, optional): Position index for the progress bar. Defaults to 0.
+            episode_idx (int, optional): Index of the episode. Defaults to 0.
 
-        # Open the CSV file and write the header
-        with open(csv_filename, mode="w", newline="", encoding="utf-8") as csv_file:
-            csv_writer = csv.writer(csv_file, escapechar="˘", quoting=csv.QUOTE_MINIMAL)
-            csv_writer.writerow(["Step", "Action", "Reasoning", "Observation", "Reward", "Done"])
+        Returns:
+            dict: Log of the episode containing statistics and results.
+        """
+        episode = self._play_episode(task, agent, process_num=process_num, position=position, episode_idx=episode_idx)
+        try:
+            request = next(episode)
+            while True:
+                if isinstance(request, _BlockingCall):
+                    # Environment operations run in the executor, so that the other episodes in flight keep going
+                    request = episode.send(await asyncio.to_thread(request))
+                else:
+                    obs, prev_action = request
+                    request = episode.send(await agent.aact(obs, prev_action=prev_action))
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            episode.close()
+
+    @staticmethod
+    def _cache_counters(client):
+        """Return the response cache counters of a CachedClientWrapper."""
+        return {
+            "cache_hits": client.cache_hits,
+            "cache_misses": client.cache_misses,
+            "cached_input_tokens": client.cached_input_tokens,
+            "cached_output_tokens": client.cached_output_tokens,
+        }
 
-            # If the agent is an FewShotAgent, load the in-context learning episode
-            if isinstance(agent, FewShotAgent):
-                self.dataset.load_in_context_learning_episodes(self.config.eval.icl_episodes, task, agent)
+    def _play_episode(self, task, agent, process_num=None, position=0, episode_idx=0):
+        """Play a single evaluation episode as a generator.
 
-                if self.config.agent.cache_icl and self.config.client.client_name == "gemini":
-                    agent.cache_icl()
+        The generator yields `(obs, prev_action)` whenever the agent has to act and expects the agent's
+        response to be sent back, so that the synchronous and asynchronous runners share the episode logic.
+        Blocking environment operations are yielded as `_BlockingCall`s, whose result is expected back.
 
-            pbar_desc = f"Task: {task}, Proc: {process_num}"
-            pbar = tqdm(
-                total=max_steps_per_episode,
-                desc=pbar_desc,
-                position=position,
-                leave=False,  # Keep the progress bar after completion
-                dynamic_ncols=True,
-            )
+        Args:
+            task (str): Task name.
+            agent (Agent): Agent to evaluate.
+            process_num (str, optional): Identifier of the process running the episode. Defaults to None.
+            position (int, optional): Position index for the progress bar. Defaults to 0.
+            episode_idx (int, optional): Index of the episode. Defaults to 0.
 
-            action = None
-            for step in range(max_steps_per_episode):
-                response = agent.act(obs, prev_action=action)
-                action = env.check_action_validity(response.completion)
-                reasoning = response.reasoning if hasattr(response, "reasoning") else ""
+        Returns:
+            dict: Log of the episode containing statistics and results, as the generator's return value.
+        """
+        env_pool = get_env_pool(self.config)
+        env = yield _BlockingCall(env_pool.acquire, self.env_name, task)
+        try:
+            agent.reset()
+
+            # Snapshot the response cache counters (if any) to report per-episode hits and misses
+            cache_counters = None
+            if hasattr(agent.client, "cache_hits"):
+                cache_counters = self._cache_counters(agent.client)
+
+            seed = self.config.envs.env_kwargs.seed
+            if seed is None:
+                seed = get_unique_seed(process_num=process_num, episode_idx=episode_idx)
+            random.seed(seed)
+            np.random.seed(seed)
+            obs, info = yield _BlockingCall(env.reset, seed=seed)
+            episode_log = {
+                "task": task,
+                "action_frequency": defaultdict(int),
+                "input_tokens": 0,
+                "output_tokens": 0,
+            }
+
+            instructions = None
+            if self.env_name == "babyai":
+                instructions = obs["mission"]
+            agent.prompt_builder.update_instruction_prompt(env.get_instruction_prompt(instructions=instructions))
+
+            episode_return = 0.0
+
+            max_steps_per_episode = env.max_steps if self.max_steps_per_episode is None else self.max_steps_per_episode
+
+            # Open the trajectory file of this episode, written in the background
+            if self.config.eval.save_trajectories:
+                trajectory_path = os.path.join(self.output_dir, self.env_name, task, f"{task}_run_{episode_idx:02d}")
+                trajectory = get_trajectory_writer().open(trajectory_path, self.trajectory_format)
+            else:
+                trajectory = NullTrajectory()
 
-                episode_log["action_frequency"][action] += 1
-                episode_log["input_tokens"] += response.input_tokens
-                episode_log["output_tokens"] += response.output_tokens
+            with trajectory, StepTimer() as step_timer:
 
-                obs, reward, terminated, truncated, info = env.step(action)
-                done = terminated or truncated
+                # If the agent is an FewShotAgent, load the in-context learning episode
+                if isinstance(agent, _few_shot_agent_class()):
+                    self.dataset.load_in_context_learning_episodes(self.config.eval.icl_episodes, task, agent)
 
-                episode_return += reward
+                    if self.config.agent.cache_icl:
+                        agent.cache_icl()
 
-                # Give feedback on the action (if not valid)
-                obs["text"]["long_term_context"] = (
-                    f"\n\nYour previous output did not contain a valid action. Defaulted to action: {action}\n\nObservation:\n"
-                    + obs["text"]["long_term_context"]
-                    if (action != response.completion) and (self.config.eval.feedback_on_invalid_action)
-                    else obs["text"]["long_term_context"]
-                )
-                action = response.completion
-                # Write the step data to the CSV file
-                csv_writer.writerow(
-                    [
-                        step,
-                        action,
-                        reasoning,
-                        obs["text"]["long_term_context"],
-                        reward,
-                        done,
-                    ]
+                pbar_desc = f"Task: {task}, Proc: {process_num}"
+                pbar = tqdm(
+                    total=max_steps_per_episode,
+                    desc=pbar_desc,
+                    position=position,
+                    leave=False,  # Keep the progress bar after completion
+                    dynamic_ncols=True,
                 )
 
-                pbar.update(1)
+                action = None
+                for step in range(max_steps_per_episode):
+                    step_start = time.perf_counter()
+                    response = yield obs, action
+                    latency = time.perf_counter() - step_start
+                    step_timer.add("agent", latency)
+                    action = env.check_action_validity(response.completion)
+                    reasoning = response.reasoning if hasattr(response, "reasoning") else ""
+
+                    episode_log["action_frequency"][action] += 1
+                    episode_log["input_tokens"] += response.input_tokens
+                    episode_log["output_tokens"] += response.output_tokens
+                    report_step(
+                        self.env_name,
+                        process_num,
+                        latency,
+                        response.input_tokens,
+                        response.output_tokens,
+                        action != response.completion,
+                    )
 
-                if self.config.eval.save_images and obs["image"]:
-                    images_dir = os.path.join(self.output_dir, self.env_name, task, f"episode_{episode_idx:02d}")
-                    Path(images_dir).mkdir(exist_ok=True, parents=True)
-                    image_filename = os.path.join(images_dir, f"step_{step:04d}.png")
-                    image = obs["image"]
-                    image.save(image_filename)
-
-                if done:
-                    logging.info(f"Episode done with reward: {episode_return}")
-                    episode_log["done"] = True
-                    if pbar.n < pbar.total:
-                        pbar.update(pbar.total - pbar.n)
-                    pbar.set_postfix_str("DONE")
-                    break
+                    with timed("env_step"):
+                        obs, reward, terminated, truncated, info = yield _BlockingCall(env.step, action)
+                    done = terminated or truncated
 
-            if pbar.n < pbar.total:
-                pbar.update(pbar.total - pbar.n)
-            if "done" not in episode_log:
-                pbar.set_postfix_str("DONE")
-            pbar.close()
-
-            episode_log["episode_return"] = episode_return
-            episode_log["num_steps"] = step + 1
-            episode_log["failed_candidates"] = env.failed_candidates
-            episode_log.update(env.get_stats())
-            episode_log["process_num"] = process_num
-            episode_log["seed"] = seed
-            episode_log["agent"] = OmegaConf.to_container(self.config.agent, resolve=True)
-            episode_log["client"] = OmegaConf.to_container(self.config.client, resolve=True)
-
-            # Save the episode_log to a JSON file
-            json_filename = os.path.join(
-                self.output_dir,
-                self.env_name,
-                task,
-                f"{task}_run_{episode_idx:02d}.json",
-            )
-            Path(json_filename).parent.mkdir(exist_ok=True, parents=True)
-            with open(json_filename, "w") as f:
-                json.dump(episode_log, f, indent=4)
+                    episode_return += reward
 
+                    # Give feedback on the action (if not valid)
+                    obs["text"]["long_term_context"] = (
+                        f"\n\nYour previous output did not contain a valid action. Defaulted to action: {action}\n\nObservation:\n"
+                        + obs["text"]["long_term_context"]
+                        if (action != response.completion) and (self.config.eval.feedback_on_invalid_action)
+                        else obs["text"]["long_term_context"]
+                    )
+                    action = response.completion
+                    # Write the step data to the trajectory file
+                    with timed("trajectory"):
+                        trajectory.write_step(
+                            step,
+                            action,
+                            reasoning,
+                            obs["text"]["long_term_context"],
+                            reward,
+                            done,
+                        )
+
+                        if self.config.eval.save_images and obs["image"]:
+                            images_dir = os.path.join(self.output_dir, self.env_name, task, f"episode_{episode_idx:02d}")
+                            image_filename = os.path.join(images_dir, f"step_{step:04d}.png")
+                            get_trajectory_writer().save_image(resolve_image(obs["image"]), image_filename)
+                    step_timer.end_step()
+
+                    pbar.update(1)
+
+                    if done:
+                        logging.info(f"Episode done with reward: {episode_return}")
+                        episode_log["done"] = True
+                        if pbar.n < pbar.total:
+                            pbar.update(pbar.total - pbar.n)
+                        pbar.set_postfix_str("DONE")
+                        break
+
+                if pbar.n < pbar.total:
+                    pbar.update(pbar.total - pbar.n)
+                if "done" not in episode_log:
+                    pbar.set_postfix_str("DONE")
+                pbar.close()
+
+                episode_log["episode_return"] = episode_return
+                episode_log["num_steps"] = step + 1
+                episode_log["failed_candidates"] = env.failed_candidates
+                episode_log.update(env.get_stats())
+                episode_log["process_num"] = process_num
+                episode_log["seed"] = seed
+                episode_log["episode_idx"] = episode_idx
+                episode_log["step_timings"] = step_timer.durations
+                if cache_counters is not None:
+                    for name, value in self._cache_counters(agent.client).items():
+                        episode_log[name] = value - cache_counters[name]
+                episode_log["agent"] = OmegaConf.to_container(self.config.agent, resolve=True)
+                episode_log["client"] = OmegaConf.to_container(self.config.client, resolve=True)
+
+                # The episode JSON marks the episode as complete (e.g. for resuming), so the steps and images
+                # queued to the trajectory writer are written first
+                if self.config.eval.save_trajectories or self.config.eval.save_images:
+                    yield _BlockingCall(get_trajectory_writer().sync)
+
+                # Save the episode_log to a JSON file
+                json_filename = os.path.join(
+                    self.output_dir,
+                    self.env_name,
+                    task,
+                    f"{task}_run_{episode_idx:02d}.json",
+                )
+                Path(json_filename).parent.mkdir(exist_ok=True, parents=True)
+                with open(json_filename, "w") as f:
+                    json.dump(episode_log, f, indent=4)
+        except BaseException:
+            # The state of the environment is unknown after an error
+            env_pool.discard(env)
+            raise
+
+        yield _BlockingCall(env_pool.release, env)
         return episode_log
@@ -0,0 +1,170 @@
+import base64
+import weakref
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+
+class LazyImage:
+    """Handle to an observation image that is only rendered when it is used.
+
+    Environments put a LazyImage in the `image` entry of their observations instead of rendering every
+    frame. The render callable must either capture a snapshot of the state it draws, or read the live
+    environment; in the latter case the environment calls `expire` before moving to the next frame, after
+    which an image that was never resolved can no longer be rendered.
+    """
+
+    def __init__(self, render):
+        """Initialize the LazyImage.
+
+        Args:
+            render (callable): Function returning the frame as an RGB (or RGBA) array.
+        """
+        self._render = render
+        self._image = None
+
+    def resolve(self):
+        """Render the frame if needed and return it.
+
+        Returns:
+            PIL.Image.Image: The RGB image of the frame.
+
+        Raises:
+            RuntimeError: If the frame expired before being rendered.
+        """
+        if self._image is None:
+            if self._render is None:
+                raise RuntimeError("The image of this observation expired before it was rendered.")
+            self._image = Image.fromarray(self._render()).convert("RGB")
+            self._render = None
+        return self._image
+
+    def expire(self):
+        """Mark the frame as gone. An image that was already resolved stays available."""
+        self._render = None
+
+    def save(self, *args, **kwargs):
+        """Render the frame if needed and save it, see `PIL.Image.Image.save`."""
+        return self.resolve().save(*args, **kwargs)
+
+
+def resolve_image(image):
+    """Return the PIL image of an observation image, rendering it if it is a LazyImage.
+
+    Args:
+        image (PIL.Image.Image, LazyImage or None): The `image` entry of an observation.
+
+    Returns:
+        PIL.Image.Image or None: The rendered image.
+    """
+    if isinstance(image, LazyImage):
+        return image.resolve()
+    return image
+
+
+class ImageEncoder:
+    """Encodes observation images for request payloads, once per image.
+
+    Encoded images are cached by object identity (guarded by a weak reference, so a recycled id never
+    returns a stale encoding). With `max_image_history > 1` the frames kept in the history are therefore
+    encoded only once, when they first appear.
+    """
+
+    FORMATS = {
+        "png": ("PNG", "image/png"),
+        "webp": ("WEBP", "image/webp"),
+        "jpeg": ("JPEG", "image/jpeg"),
+    }
+
+    def __init__(self, format="png", quality=85, compress_level=6, max_size=None, cache_size=64):
+        """Initialize the ImageEncoder.
+
+        Args:
+            format (str, optional): Codec, one of "png", "webp" or "jpeg". Defaults to "png".
+            quality (int, optional): Quality of the lossy codecs (WebP and JPEG). Defaults to 85.
+            compress_level (int, optional): zlib compression level of PNG, from 0 (fastest) to 9. Defaults to 6.
+            max_size (int, optional): If set, images whose longest side exceeds it are downscaled first.
+                Defaults to None.
+            cache_size (int, optional): Number of encoded images kept. Defaults to 64.
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported image format: {format}. Use one of {list(self.FORMATS)}.")
+        self.format = format
+        self.quality = quality
+        self.compress_level = compress_level
+        self.max_size = max_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @property
+    def media_type(self):
+        return self.FORMATS[self.format][1]
+
+    def encode(self, image):
+        """Return the encoded bytes of an image.
+
+        Args:
+            image (PIL.Image.Image): The image to encode.
+
+        Returns:
+            bytes: The encoded image.
+        """
+        return self._entry(image)["bytes"]
+
+    def encode_base64(self, image):
+        """Return the base64 encoding of the encoded image.
+
+        Args:
+            image (PIL.Image.Image): The image to encode.
+
+        Returns:
+            str: The base64 encoded image.
+        """
+        entry = self._entry(image)
+        if entry["base64"] is None:
+            entry["base64"] = base64.b64encode(entry["bytes"]).decode("utf-8")
+        return entry["base64"]
+
+    def _entry(self, image):
+        key = id(image)
+        entry = self._cache.get(key)
+        if entry is not None and entry["ref"]() is image:
+            self._cache.move_to_end(key)
+            return entry
+
+        entry = {"ref": weakref.ref(image), "bytes": self._encode(image), "base64": None}
+        self._cache[key] = entry
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    def _encode(self, image):
+        if self.max_size is not None and max(image.size) > self.max_size:
+            image = image.copy()
+            image.thumbnail((self.max_size, self.max_size), Image.LANCZOS)
+
+        buffered = BytesIO()
+        pil_format = self.FORMATS[self.format][0]
+        if self.format == "png":
+            image.save(buffered, format=pil_format, compress_level=self.compress_level)
+        else:
+            image.save(buffered, format=pil_format, quality=self.quality)
+        return buffered.getvalue()
+
+
+def create_image_encoder(client_config):
+    """Create the ImageEncoder configured by the `image_*` settings of a client config.
+
+    Args:
+        client_config: Configuration object containing client-specific settings.
+
+    Returns:
+        ImageEncoder: The image encoder.
+    """
+    return ImageEncoder(
+        format=client_config.get("image_format", "png"),
+        quality=client_config.get("image_quality", 85),
+        compress_level=client_config.get("image_compress_level", 6),
+        max_size=client_config.get("image_max_size", None),
+    )
@@ -0,0 +1,264 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILENAME = "metrics.prom"
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+
+_STEP_SINK = None
+
+
+def set_step_sink(sink):
+    """Set where the current process reports its steps.
+
+    Args:
+        sink (callable or None): Callable receiving one dict per step (e.g. `EvalMetrics.record_step` in the
+            main process, or `results_queue.put` in a worker). None disables the reports.
+    """
+    global _STEP_SINK
+    _STEP_SINK = sink
+
+
+def report_step(env_name, process_num, latency, input_tokens, output_tokens, invalid_action):
+    """Report a played step to the sink of the current process, if any.
+
+    Args:
+        env_name (str): Name of the environment.
+        process_num (str): Identifier of the process playing the episode.
+        latency (float): Seconds the agent took to answer.
+        input_tokens (int): Input tokens of the LLM call.
+        output_tokens (int): Output tokens of the LLM call.
+        invalid_action (bool): Whether the answer did not contain a valid action.
+    """
+    if _STEP_SINK is None:
+        return
+    _STEP_SINK(
+        {
+            "metric": "step",
+            "env_name": env_name,
+            "process_num": process_num,
+            "time": time.time(),
+            "latency": latency,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "invalid_action": invalid_action,
+        }
+    )
+
+
+def is_step_report(result):
+    """Return whether an item of the results queue is a step report rather than an episode result."""
+    return result.get("metric") == "step"
+
+
+class EvalMetrics:
+    """Live throughput metrics of an evaluation, in the Prometheus text format.
+
+    Cumulative counters (episodes, steps, tokens, errors) are kept per environment, while the rates and the
+    latency quantiles are computed over the steps of the last `window` seconds, so a throughput regression or
+    a stalled worker shows up while the run is in progress. The metrics are written to `metrics.prom` in the
+    output directory at most every `interval` seconds and, if `port` is set, served over HTTP at `/metrics`.
+    """
+
+    def __init__(self, output_dir, total_episodes, interval=10.0, window=60.0, port=None, host="127.0.0.1"):
+        """Initialize the EvalMetrics.
+
+        Args:
+            output_dir (str): Directory to write `metrics.prom` to.
+            total_episodes (int): Number of episodes to play in this run.
+            interval (float, optional): Minimum seconds between writes of the metrics file. Defaults to 10.0.
+            window (float, optional): Seconds of recent steps the rates and quantiles are computed over.
+                Defaults to 60.0.
+            port (int, optional): Port of the HTTP endpoint; None disables it. Defaults to None.
+            host (str, optional): Address the HTTP endpoint binds to. Defaults to "127.0.0.1", so the metrics
+                are only reachable from the local machine.
+        """
+        self.path = os.path.join(output_dir, METRICS_FILENAME)
+        self.total_episodes = total_episodes
+        self.interval = interval
+        self.window = window
+        self.start_time = time.time()
+
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        self._episodes = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._steps = defaultdict(int)
+        self._invalid_actions = defaultdict(int)
+        self._input_tokens = defaultdict(int)
+        self._output_tokens = defaultdict(int)
+        self._latency_sum = defaultdict(float)
+        self._recent_steps = deque()
+        self._last_step = {}
+
+        self._server = None
+        if port is not None:
+            self._serve(host, port)
+
+    def record_step(self, step):
+        """Record a step reported by `report_step`.
+
+        Args:
+            step (dict): The step report.
+        """
+        env_name = step["env_name"]
+        with self._lock:
+            self._steps[env_name] += 1
+            self._invalid_actions[env_name] += int(step["invalid_action"])
+            self._input_tokens[env_name] += step["input_tokens"]
+            self._output_tokens[env_name] += step["output_tokens"]
+            self._latency_sum[env_name] += step["latency"]
+            self._recent_steps.append(step)
+            self._last_step[str(step["process_num"])] = step["time"]
+        self.maybe_write()
+
+    def record_episode(self, env_name, result):
+        """Record a finished episode or an episode that failed with an error.
+
+        Args:
+            env_name (str): Name of the environment.
+            result (dict): The episode log, or the error report of the episode.
+        """
+        with self._lock:
+            if "error" in result:
+                self._errors[env_name] += 1
+            else:
+                self._episodes[env_name] += 1
+        self.maybe_write()
+
+    def maybe_write(self):
+        """Write the metrics file if the last write is older than `interval` seconds."""
+        if time.time() - self._last_write >= self.interval:
+            self.write()
+
+    def write(self):
+        """Atomically replace the metrics file with the current metrics."""
+        self._last_write = time.time()
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(self.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write the metrics file {self.path}: {e}")
+
+    def close(self):
+        """Write the final metrics and stop the HTTP endpoint."""
+        self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def render(self):
+        """Render the current metrics.
+
+        Returns:
+            str: The metrics in the Prometheus text exposition format.
+        """
+        now = time.time()
+        with self._lock:
+            while self._recent_steps and self._recent_steps[0]["time"] < now - self.window:
+                self._recent_steps.popleft()
+            recent = defaultdict(list)
+            for step in self._recent_steps:
+                recent[step["env_name"]].append(step)
+            window = min(self.window, now - self.start_time) or 1.0
+
+            lines = []
+
+            def header(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            def sample(name, value, **labels):
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+            def per_env(name, kind, help_text, counts):
+                header(name, kind, help_text)
+                for env_name, value in sorted(counts.items()):
+                    sample(name, value, env=env_name)
+
+            done = sum(self._episodes.values()) + sum(self._errors.values())
+            header("balrog_episodes_remaining", "gauge", "Episodes left to play.")
+            sample("balrog_episodes_remaining", self.total_episodes - done)
+            per_env("balrog_episodes_total", "counter", "Finished episodes.", self._episodes)
+            per_env("balrog_episode_errors_total", "counter", "Episodes that failed with an error.", self._errors)
+            per_env("balrog_steps_total", "counter", "Played steps.", self._steps)
+            per_env(
+                "balrog_invalid_actions_total",
+                "counter",
+                "Steps whose answer did not contain a valid action.",
+                self._invalid_actions,
+            )
+            per_env("balrog_input_tokens_total", "counter", "LLM input tokens.", self._input_tokens)
+            per_env("balrog_output_tokens_total", "counter", "LLM output tokens.", self._output_tokens)
+            per_env(
+                "balrog_steps_per_second",
+                "gauge",
+                f"Steps per second over the last {self.window:g} seconds.",
+                {env_name: len(steps) / window for env_name, steps in recent.items()},
+            )
+            per_env(
+                "balrog_tokens_per_second",
+                "gauge",
+                f"LLM input and output tokens per second over the last {self.window:g} seconds.",
+                {
+                    env_name: sum(step["input_tokens"] + step["output_tokens"] for step in steps) / window
+                    for env_name, steps in recent.items()
+                },
+            )
+
+            header(
+                "balrog_llm_latency_seconds",
+                "summary",
+                f"Time the agent took to answer, with quantiles over the last {self.window:g} seconds.",
+            )
+            for env_name, steps in sorted(recent.items()):
+                quantiles = np.quantile([step["latency"] for step in steps], LATENCY_QUANTILES)
+                for q, value in zip(LATENCY_QUANTILES, quantiles):
+                    sample("balrog_llm_latency_seconds", float(value), env=env_name, quantile=f"{q:g}")
+            for env_name in sorted(self._steps):
+                sample("balrog_llm_latency_seconds_sum", self._latency_sum[env_name], env=env_name)
+                sample("balrog_llm_latency_seconds_count", self._steps[env_name], env=env_name)
+
+            name = "balrog_worker_seconds_since_last_step"
+            header(name, "gauge", "Seconds since each worker last reported a step; a growing value is a stalled worker.")
+            for process, last in sorted(self._last_step.items()):
+                sample(name, now - last, process=process)
+        return "\n".join(lines) + "\n"
+
+    def _serve(self, host, port):
+        """Serve the metrics at `http://<host>:<port>/metrics` from a daemon thread."""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            logger.warning(f"Could not serve the metrics on {host}:{port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving evaluation metrics at http://{host}:{port}/metrics")
@@ -1,4 +1,5 @@
 from .history import HistoryPromptBuilder
+from .tokenizer import create_token_counter
 
 import warnings
 
@@ -14,6 +15,10 @@ def create_prompt_builder(config):
             - max_text_history (int): Maximum number of text history entries to retain.
             - max_image_history (int): Maximum number of image history entries to retain.
             - max_cot_history (int): Maximum number of chain-of-thought history entries to retain.
+            - max_prompt_tokens (int, optional): Token budget of the prompt history. If null, only the
+              count limits above apply.
+            - tokenizer (str, optional): "approx" or the name of a tiktoken encoding, used to count
+              tokens when max_prompt_tokens is set.
     Returns:
         PromptBuilder: An instance of a prompt builder configured with the specified
             history limits and any additional parameters defined in the config.
@@ -27,8 +32,15 @@ def create_prompt_builder(config):
     if max_text_history is None:
         max_text_history = config.max_text_history
 
+    max_prompt_tokens = config.get("max_prompt_tokens", None)
+    token_counter = None
+    if max_prompt_tokens is not None:
+        token_counter = create_token_counter(config.get("tokenizer", "approx"))
+
     return HistoryPromptBuilder(
         max_text_history=max_text_history,
         max_image_history=config.max_image_history,
         max_cot_history=config.max_cot_history,
+        max_prompt_tokens=max_prompt_tokens,
+        token_counter=token_counter,
     )
@@ -1,5 +1,9 @@
 from collections import deque
-from typing import List, Optional
+from typing import Callable, List, Optional
+
+from balrog.image import resolve_image
+
+from .tokenizer import create_token_counter
 
 
 class Message:
@@ -19,6 +23,17 @@ class HistoryPromptBuilder:
 
     Maintains a configurable history of text, images, and chain-of-thought reasoning to
     construct prompt messages for conversational agents.
+
+    Messages are rendered once, when their event is added, and kept next to the event in a sliding
+    window. An existing message is only re-rendered when it crosses a window boundary (the current
+    observation becomes a past one, or its text, image or reasoning falls out of the history), so
+    building a prompt costs O(1) new messages per step and the messages of the prefix stay the same
+    objects from one step to the next.
+
+    If `max_prompt_tokens` is set, the history is additionally limited to a token budget: messages
+    are taken newest-first while they fit, the current observation always being included, and the
+    trimmed history starts with an observation. The token count of each message is computed once,
+    when it is rendered.
     """
 
     def __init__(
@@ -27,6 +42,8 @@ class HistoryPromptBuilder:
         max_image_history: int = 1,
         system_prompt: Optional[str] = None,
         max_cot_history: int = 1,
+        max_prompt_tokens: Optional[int] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
     ):
         self.max_text_history = max_text_history
         self.max_image_history = max_image_history
@@ -36,6 +53,17 @@ class HistoryPromptBuilder:
         self._last_short_term_obs = None  # To store the latest short-term observation
         self.previous_reasoning = None
         self.max_cot_history = max_cot_history
+        self.max_prompt_tokens = max_prompt_tokens
+        self.token_counter = token_counter
+        if self.max_prompt_tokens is not None and self.token_counter is None:
+            self.token_counter = create_token_counter()
+
+        # Most recent events that show their text, image, or reasoning, oldest first
+        self._text_window = deque()
+        self._image_window = deque()
+        self._reasoning_window = deque()
+        self._system_message = None
+        self._system_tokens = 0
 
     def update_instruction_prompt(self, instruction: str):
         """Set the system-level instruction prompt."""
@@ -48,25 +76,48 @@ class HistoryPromptBuilder:
         text = long_term_context
 
         image = obs.get("image", None)
-
-        # Add observation to events
-        self._events.append(
-            {
-                "type": "observation",
-                "text": text,
-                "image": image,
-            }
-        )
+        if image is not None and self.max_image_history > 0:
+            # Lazy images are rendered now, while their frame is current
+            image = resolve_image(image)
+
+        event = {
+            "type": "observation",
+            "text": text,
+            "image": image,
+            "include_text": False,
+            "include_image": False,
+        }
+        # The previous observation stops being the current one
+        self._append_event(event)
+
+        if text is not None:
+            event["include_text"] = True
+            for evicted in self._push_window(self._text_window, self.max_text_history, event):
+                evicted["include_text"] = False
+                self._render(evicted)
+        if image is not None:
+            event["include_image"] = True
+            for evicted in self._push_window(self._image_window, self.max_image_history, event):
+                evicted["include_image"] = False
+                self._render(evicted)
+
+        self._render(event, current=True)
 
     def update_action(self, action: str):
         """Add an action to the prompt history, including reasoning if available."""
-        self._events.append(
-            {
-                "type": "action",
-                "action": action,
-                "reasoning": self.previous_reasoning,
-            }
-        )
+        event = {
+            "type": "action",
+            "action": action,
+            "reasoning": self.previous_reasoning,
+        }
+        self._append_event(event)
+
+        if event["reasoning"] is not None:
+            for evicted in self._push_window(self._reasoning_window, self.max_cot_history, event):
+                evicted["reasoning"] = None
+                self._render(evicted)
+
+        self._render(event)
 
     def update_reasoning(self, reasoning: str):
         """Set the reasoning text to be included with subsequent actions."""
@@ -75,80 +126,94 @@ class HistoryPromptBuilder:
     def reset(self):
         """Clear the event history."""
         self._events.clear()
+        self._text_window.clear()
+        self._image_window.clear()
+        self._reasoning_window.clear()
+
+    def _append_event(self, event: dict):
+        """Append an event, demoting the current observation to a past one."""
+        if self._events and self._events[-1]["type"] == "observation":
+            self._render(self._events[-1])
+        self._events.append(event)
+
+    @staticmethod
+    def _push_window(window: deque, limit: int, event: dict) -> List[dict]:
+        """Add an event to a history window and return the events that no longer fit in it."""
+        window.append(event)
+        evicted = []
+        while len(window) > max(limit, 0):
+            evicted.append(window.popleft())
+        return evicted
+
+    def _render(self, event: dict, current: bool = False):
+        """Render the message of an event from its current state."""
+        if event["type"] == "observation":
+            message_parts = []
+
+            if current:
+                message_parts.append("Current Observation:")
+                if self._last_short_term_obs:
+                    message_parts.append(self._last_short_term_obs)
+            else:
+                message_parts.append("Observation:")
+
+            if event["include_text"]:
+                message_parts.append(event["text"])
+
+            image = None
+            if event["include_image"]:
+                image = event["image"]
+                message_parts.append("Image observation provided.")
+
+            content = "\n".join(message_parts)
+            event["message"] = Message(role="user", content=content, attachment=image)
+        elif event["type"] == "action":
+            if event["reasoning"] is not None:
+                content = "Previous plan:\n" + event["reasoning"]
+            else:
+                content = event["action"]
+            event["message"] = Message(role="assistant", content=content)
+
+        if self.max_prompt_tokens is not None:
+            event["tokens"] = self.token_counter(event["message"].content)
 
     def get_prompt(self, icl_episodes=False) -> List[Message]:
         """Generate a list of Message objects representing the prompt.
 
+        The last message is returned as a copy, so that agents can extend its content with their
+        instructions without altering the history.
+
         Returns:
             List[Message]: Messages constructed from the event history.
         """
         messages = []
+        budget = self.max_prompt_tokens
 
         if self.system_prompt and not icl_episodes:
-            messages.append(Message(role="user", content=self.system_prompt))
-
-        # Determine which text observations to include
-        text_needed = self.max_text_history
-        for event in reversed(self._events):
-            if event["type"] == "observation":
-                if text_needed > 0 and event.get("text") is not None:
-                    event["include_text"] = True
-                    text_needed -= 1
-                else:
-                    event["include_text"] = False
-
-        # Determine which image observations to include
-        images_needed = self.max_image_history
-        for event in reversed(self._events):
-            if event["type"] == "observation":
-                if images_needed > 0 and event.get("image") is not None:
-                    event["include_image"] = True
-                    images_needed -= 1
-                else:
-                    event["include_image"] = False
-
-        # determine the reasoning to include
-        reasoning_needed = self.max_cot_history
-        for event in reversed(self._events):
-            if event["type"] == "action":
-                if reasoning_needed > 0 and event.get("reasoning") is not None:
-                    reasoning_needed -= 1
-                else:
-                    event["reasoning"] = None
-
-        # Process events to create messages
-        for idx, event in enumerate(self._events):
-            if event["type"] == "observation":
-                message_parts = []
-
-                if idx == len(self._events) - 1:
-                    message_parts.append("Current Observation:")
-                    if self._last_short_term_obs:
-                        message_parts.append(self._last_short_term_obs)
-                else:
-                    message_parts.append("Observation:")
-
-                if event.get("include_text", False):
-                    message_parts.append(event["text"])
-                    
-                image = None
-                if event.get("include_image", False):
-                    image = event["image"]
-                    message_parts.append("Image observation provided.")
-
-                content = "\n".join(message_parts)
-                message = Message(role="user", content=content, attachment=image)
-
-                # Clean up temporary flags
-                for flag in ["include_text", "include_image"]:
-                    if flag in event:
-                        del event[flag]
-            elif event["type"] == "action":
-                if event.get("reasoning") is not None:
-                    content = "Previous plan:\n" + event["reasoning"]
-                else:
-                    content = event["action"]
-                message = Message(role="assistant", content=content)
-            messages.append(message)
+            if self._system_message is None or self._system_message.content != self.system_prompt:
+                self._system_message = Message(role="user", content=self.system_prompt)
+                if self.max_prompt_tokens is not None:
+                    self._system_tokens = self.token_counter(self.system_prompt)
+            messages.append(self._system_message)
+            if budget is not None:
+                budget -= self._system_tokens
+
+        if budget is None:
+            messages.extend(event["message"] for event in self._events)
+        else:
+            history = []
+            for event in reversed(self._events):
+                if history and event["tokens"] > budget:
+                    # The trimmed history starts with an observation, not with an action answering nothing
+                    while len(history) > 1 and history[-1].role == "assistant":
+                        history.pop()
+                    break
+                budget -= event["tokens"]
+                history.append(event["message"])
+            messages.extend(reversed(history))
+
+        if messages:
+            last = messages[-1]
+            messages[-1] = Message(role=last.role, content=last.content, attachment=last.attachment)
 
         return messages
@@ -0,0 +1,44 @@
+from functools import lru_cache
+
+
+class ApproxTokenCounter:
+    """Estimates token counts from the number of characters (about four characters per token)."""
+
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+
+    def __call__(self, text: str) -> int:
+        return int(len(text) / self.chars_per_token) + 1
+
+
+class TiktokenCounter:
+    """Counts tokens exactly with a tiktoken encoding."""
+
+    def __init__(self, encoding_name: str):
+        try:
+            import tiktoken
+        except ImportError as e:
+            raise ImportError(
+                f"The '{encoding_name}' tokenizer requires tiktoken. Install it with `pip install tiktoken` "
+                "or use `agent.tokenizer=approx`."
+            ) from e
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def __call__(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=None)
+def create_token_counter(name: str = "approx"):
+    """Create the callable that counts the tokens of a string.
+
+    Args:
+        name (str): Either "approx" for a character-based estimate, or the name of a tiktoken
+            encoding (e.g. "cl100k_base", "o200k_base").
+
+    Returns:
+        Callable[[str], int]: The token counter.
+    """
+    if name == "approx":
+        return ApproxTokenCounter()
+    return TiktokenCounter(name)
@@ -0,0 +1,245 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+from collections import Counter, defaultdict
+
+from balrog.timing import PHASES, histogram_bucket, histogram_labels
+
+logger = logging.getLogger(__name__)
+
+_EPISODE_FILENAME = re.compile(r"_run_(\d+)\.json$")
+
+
+class ResultsIndex:
+    """Append-only index of the episode results of a run, stored as a SQLite table next to the results.
+
+    Every finished episode adds one row holding the columns the summaries are computed from, so a run can
+    be summarized at any time (also while it is still running) with a few aggregate queries instead of
+    loading every episode JSON.
+    """
+
+    FILENAME = "results.sqlite"
+
+    def __init__(self, output_dir):
+        """Initialize the ResultsIndex.
+
+        Args:
+            output_dir (str): Directory of the run.
+        """
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self._conn = None
+        self._pid = None
+
+    @classmethod
+    def exists(cls, output_dir):
+        """Return whether the run in `output_dir` has a results index."""
+        return os.path.isfile(os.path.join(output_dir, cls.FILENAME))
+
+    def _connection(self):
+        """Return the SQLite connection of the current process, creating the table if needed."""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS episodes ("
+                "env_name TEXT NOT NULL, task TEXT NOT NULL, episode_idx INTEGER NOT NULL, "
+                "progression REAL NOT NULL, num_steps INTEGER NOT NULL, "
+                "input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL, "
+                "agent TEXT, client TEXT, "
+                "PRIMARY KEY (env_name, task, episode_idx))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS step_timings ("
+                "env_name TEXT NOT NULL, task TEXT NOT NULL, episode_idx INTEGER NOT NULL, "
+                "phase TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, total REAL NOT NULL, "
+                "PRIMARY KEY (env_name, task, episode_idx, phase, bucket))"
+            )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def add(self, env_name, episode_log, episode_idx=None):
+        """Add (or replace) the result of an episode.
+
+        Args:
+            env_name (str): Name of the environment.
+            episode_log (dict): Log of the episode, as returned by `Evaluator.run_episode`.
+            episode_idx (int, optional): Index of the episode. Defaults to the log's `episode_idx`.
+        """
+        if episode_idx is None:
+            episode_idx = episode_log["episode_idx"]
+        task = episode_log.get("task")
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO episodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                env_name,
+                task,
+                episode_idx,
+                episode_log.get("progression", 0.0),
+                episode_log.get("num_steps", 0),
+                episode_log.get("input_tokens", 0),
+                episode_log.get("output_tokens", 0),
+                json.dumps(episode_log["agent"]) if "agent" in episode_log else None,
+                json.dumps(episode_log["client"]) if "client" in episode_log else None,
+            ),
+        )
+
+        # Store the step durations of every phase as histogram buckets
+        rows = []
+        for phase, durations in episode_log.get("step_timings", {}).items():
+            counts = Counter()
+            totals = Counter()
+            for duration in durations:
+                bucket = histogram_bucket(duration)
+                counts[bucket] += 1
+                totals[bucket] += duration
+            rows += [(env_name, task, episode_idx, phase, bucket, counts[bucket], totals[bucket]) for bucket in counts]
+        conn.execute(
+            "DELETE FROM step_timings WHERE env_name = ? AND task = ? AND episode_idx = ?",
+            (env_name, task, episode_idx),
+        )
+        conn.executemany("INSERT INTO step_timings VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def reconcile(self, output_dir):
+        """Index the episode JSON files of a run directory that are missing from the index.
+
+        This covers runs started before the index existed, as well as episodes whose JSON was written but
+        which were not indexed because the run stopped in between. Only the missing files are loaded.
+
+        Args:
+            output_dir (str): Directory of the run.
+        """
+        if not os.path.isdir(output_dir):
+            return
+        indexed = defaultdict(set)
+        for env_name, task, episode_idx in self._connection().execute(
+            "SELECT env_name, task, episode_idx FROM episodes"
+        ):
+            indexed[env_name].add(os.path.normpath(os.path.join(task, f"{task}_run_{episode_idx:02d}.json")))
+
+        count = 0
+        for env_name in os.listdir(output_dir):
+            env_dir = os.path.join(output_dir, env_name)
+            if not os.path.isdir(env_dir):
+                continue
+            for root, dirs, files in os.walk(env_dir):
+                for filename in files:
+                    match = _EPISODE_FILENAME.search(filename)
+                    if match is None:
+                        continue
+                    path = os.path.join(root, filename)
+                    if os.path.relpath(path, env_dir) in indexed[env_name]:
+                        continue
+                    with open(path, "r") as f:
+                        episode_log = json.load(f)
+                    self.add(env_name, episode_log, episode_idx=episode_log.get("episode_idx", int(match.group(1))))
+                    count += 1
+        if count:
+            logger.info(f"Indexed {count} episodes of {output_dir} missing from the results index")
+
+    def episode_steps(self):
+        """Return the number of steps of the indexed episodes.
+
+        Returns:
+            dict: Mapping from `(env_name, task)` to the list of episode lengths.
+        """
+        steps = defaultdict(list)
+        for env_name, task, num_steps in self._connection().execute("SELECT env_name, task, num_steps FROM episodes"):
+            steps[(env_name, task)].append(num_steps)
+        return steps
+
+    def summarize(self):
+        """Compute the summary of the indexed episodes.
+
+        Returns:
+            tuple: The per-environment summaries (with per-task summaries under "tasks" and step duration
+                histograms under "step_timings"), and the first recorded agent and client configurations.
+        """
+        conn = self._connection()
+
+        task_rows = conn.execute(
+            "SELECT e.env_name, e.task, COUNT(*), a.mean, SUM((e.progression - a.mean) * (e.progression - a.mean)) "
+            "FROM episodes e JOIN (SELECT env_name, task, AVG(progression) AS mean FROM episodes "
+            "GROUP BY env_name, task) a ON e.env_name = a.env_name AND e.task = a.task "
+            "GROUP BY e.env_name, e.task ORDER BY e.env_name, e.task"
+        ).fetchall()
+        env_rows = conn.execute(
+            "SELECT e.env_name, COUNT(*), a.mean, SUM((e.progression - a.mean) * (e.progression - a.mean)), "
+            "SUM(e.num_steps), SUM(e.input_tokens), SUM(e.output_tokens) "
+            "FROM episodes e JOIN (SELECT env_name, AVG(progression) AS mean FROM episodes GROUP BY env_name) a "
+            "ON e.env_name = a.env_name GROUP BY e.env_name ORDER BY e.env_name"
+        ).fetchall()
+        configs = conn.execute(
+            "SELECT agent, client FROM episodes WHERE agent IS NOT NULL AND client IS NOT NULL LIMIT 1"
+        ).fetchone()
+
+        env_summaries = {}
+        for env_name, count, mean, squares, total_steps, input_tokens, output_tokens in env_rows:
+            env_summaries[env_name] = {
+                "progression_percentage": 100 * mean,
+                "standard_error": 100 * _standard_error(count, squares),
+                "average_steps": total_steps / count,
+                "episodes_played": count,
+                "tasks": {},
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "step_timings": self.step_timings(env_name),
+            }
+        for env_name, task, count, mean, squares in task_rows:
+            env_summaries[env_name]["tasks"][task] = {
+                "progression_percentage": 100 * mean,
+                "standard_error": 100 * _standard_error(count, squares),
+                "episodes_played": count,
+            }
+
+        agent_config, client_config = (json.loads(configs[0]), json.loads(configs[1])) if configs else (None, None)
+        return env_summaries, agent_config, client_config
+
+    def step_timings(self, env_name=None):
+        """Compute the step duration histograms of every timed phase.
+
+        Args:
+            env_name (str, optional): Restrict the histograms to this environment. Defaults to all environments.
+
+        Returns:
+            dict: Per phase, the number of steps, their total and mean duration, and the number of steps per
+                histogram bucket keyed by the bucket's upper bound in seconds.
+        """
+        query = "SELECT phase, bucket, SUM(count), SUM(total) FROM step_timings"
+        params = ()
+        if env_name is not None:
+            query += " WHERE env_name = ?"
+            params = (env_name,)
+        histograms = defaultdict(dict)
+        for phase, bucket, count, total in self._connection().execute(query + " GROUP BY phase, bucket", params):
+            histograms[phase][bucket] = (count, total)
+        return {
+            phase: _format_timing_histogram(histograms[phase]) for phase in sorted(histograms, key=_phase_order)
+        }
+
+
+def _phase_order(phase):
+    return (PHASES.index(phase) if phase in PHASES else len(PHASES), phase)
+
+
+def _format_timing_histogram(histogram):
+    """Format a `{bucket: (count, total_seconds)}` step duration histogram for the summaries."""
+    steps = sum(count for count, _ in histogram.values())
+    total = sum(total for _, total in histogram.values())
+    return {
+        "steps": steps,
+        "total_seconds": total,
+        "mean_seconds": total / steps if steps else 0.0,
+        "histogram": {label: histogram.get(bucket, (0, 0.0))[0] for bucket, label in enumerate(histogram_labels())},
+    }
+
+
+def _standard_error(count, squares):
+    """Standard error of the mean from the number of samples and the sum of squared deviations."""
+    if count <= 1:
+        return 0.0
+    return math.sqrt(squares / count) / math.sqrt(count)
@@ -0,0 +1,96 @@
+import glob
+import json
+import logging
+import os
+from collections import defaultdict
+
+from balrog.results import ResultsIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_STEPS = 100  # Step estimate for environments without a configured step limit (BabyAI, BabaIsAI)
+
+
+def load_step_history(history_dirs):
+    """Collect the number of steps of previously played episodes.
+
+    The lengths are read from the results index of each directory, or from its episode JSON files for runs
+    without an index.
+
+    Args:
+        history_dirs (list): Results directories of previous runs, laid out as `<dir>/<env_name>/<task>/`.
+
+    Returns:
+        dict: Mapping from `(env_name, task)` to the list of recorded episode lengths.
+    """
+    history = defaultdict(list)
+    for history_dir in history_dirs:
+        if not os.path.isdir(history_dir):
+            continue
+        if ResultsIndex.exists(history_dir):
+            for key, steps in ResultsIndex(history_dir).episode_steps().items():
+                history[key].extend(steps)
+            continue
+        for env_name in os.listdir(history_dir):
+            env_dir = os.path.join(history_dir, env_name)
+            if not os.path.isdir(env_dir):
+                continue
+            pattern = os.path.join(glob.escape(env_dir), "**", "*_run_*.json")
+            for json_filename in glob.glob(pattern, recursive=True):
+                try:
+                    with open(json_filename) as f:
+                        episode_log = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if "task" in episode_log and "num_steps" in episode_log:
+                    history[(env_name, episode_log["task"])].append(episode_log["num_steps"])
+    return history
+
+
+def configured_max_steps(config, env_name):
+    """Return the step limit of an environment's episodes according to the config.
+
+    Args:
+        config (omegaconf.DictConfig): Configuration object containing evaluation settings.
+        env_name (str): Name of the environment.
+
+    Returns:
+        int: The maximum number of steps of an episode.
+    """
+    max_steps = config.envs.get(f"{env_name}_kwargs", {}).get("max_episode_steps", None) or DEFAULT_MAX_STEPS
+    if config.eval.max_steps_per_episode is not None:
+        max_steps = min(max_steps, config.eval.max_steps_per_episode)
+    return max_steps
+
+
+def schedule_tasks(tasks, config, history_dirs=()):
+    """Order episodes longest-expected-first.
+
+    The expected length of an episode is the mean length of the episodes of its task found in
+    `history_dirs`, or the configured step limit if none was recorded. Workers pull episodes from a
+    shared queue as they become free, so starting with the longest ones keeps the long NetHack episodes
+    from running alone at the end of the evaluation. The sort is stable: episodes of equal expected
+    length keep their config order.
+
+    Args:
+        tasks (list): Episodes to schedule, as `(env_name, task, episode_idx)` tuples.
+        config (omegaconf.DictConfig): Configuration object containing evaluation settings.
+        history_dirs (list, optional): Results directories of previous runs. Defaults to ().
+
+    Returns:
+        list: The episodes in scheduling order.
+    """
+    history = load_step_history(history_dirs)
+
+    expected = {}
+    for env_name, task, _ in tasks:
+        if (env_name, task) in expected:
+            continue
+        steps = history.get((env_name, task))
+        if steps:
+            expected[(env_name, task)] = sum(steps) / len(steps)
+        else:
+            expected[(env_name, task)] = configured_max_steps(config, env_name)
+        logger.info(f"Expected length of {env_name}/{task} episodes: {expected[(env_name, task)]:.0f} steps")
+
+    return sorted(tasks, key=lambda item: expected[(item[0], item[1])], reverse=True)
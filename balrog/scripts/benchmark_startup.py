@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import balrog
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(balrog.__file__), "config", "config.yaml")
+DEFAULT_MODULES = ["balrog", "balrog.environments", "balrog.agents", "balrog.evaluator"]
+DEFAULT_ENVS = ["nle", "minihack", "babyai", "crafter", "textworld", "babaisai"]
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+"""
+
+MAKE_ENV_SNIPPET = """
+import json, time
+from omegaconf import OmegaConf
+config = OmegaConf.load({config!r})
+task = config.tasks[{env_name!r} + "_tasks"][0]
+start = time.perf_counter()
+from balrog.environments import make_env
+imported = time.perf_counter()
+env = make_env({env_name!r}, task, config)
+made = time.perf_counter()
+print(json.dumps({{"import_seconds": imported - start, "make_seconds": made - imported, "seconds": made - start}}))
+"""
+
+
+def run_snippet(snippet):
+    """Run a snippet in a fresh interpreter and return the JSON object it prints last."""
+    result = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(snippet, repeats):
+    """Return the median of every timing of a snippet over `repeats` fresh interpreters, or the error."""
+    try:
+        runs = [run_snippet(snippet) for _ in range(repeats)]
+    except RuntimeError as e:
+        return {"error": str(e)}
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the import time of the balrog modules and the latency of the first make_env "
+        "of each environment, each in fresh interpreters."
+    )
+    parser.add_argument("--modules", nargs="*", default=DEFAULT_MODULES, help="Modules whose import is timed.")
+    parser.add_argument("--envs", nargs="*", default=DEFAULT_ENVS, help="Environments whose first make_env is timed.")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Config used to create the environments.")
+    parser.add_argument("--repeats", type=int, default=3, help="Interpreters per measurement; the median is kept.")
+    parser.add_argument("--output", default=None, help="JSONL file to append the results to, to track them over time.")
+    args = parser.parse_args()
+
+    results = {"imports": {}, "make_env": {}}
+    for module in args.modules:
+        results["imports"][module] = measure(IMPORT_SNIPPET.format(module=module), args.repeats)
+        print(f"import {module:<30} {_format(results['imports'][module])}")
+    for env_name in args.envs:
+        snippet = MAKE_ENV_SNIPPET.format(config=os.path.abspath(args.config), env_name=env_name)
+        results["make_env"][env_name] = measure(snippet, args.repeats)
+        print(f"make_env {env_name:<28} {_format(results['make_env'][env_name])}")
+
+    if args.output is not None:
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **results,
+        }
+        with open(args.output, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def _format(result):
+    if "error" in result:
+        return f"error: {result['error']}"
+    details = ", ".join(f"{key.removesuffix('_seconds')} {value:.3f}s" for key, value in result.items() if key != "seconds")
+    return f"{result['seconds']:.3f}s" + (f" ({details})" if details else "")
+
+
+if __name__ == "__main__":
+    main()
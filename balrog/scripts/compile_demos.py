@@ -0,0 +1,29 @@
+import argparse
+import os
+
+from balrog.dataset import compile_demos
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile the ICL demonstrations of every <dataset>/<env>/<task> directory into memory-mapped stores."
+    )
+    parser.add_argument("icl_dataset", nargs="?", default="records", help="Root directory of the demonstrations.")
+    parser.add_argument("--envs", nargs="*", default=None, help="Environments to compile (default: all).")
+    args = parser.parse_args()
+
+    envs = args.envs or sorted(os.listdir(args.icl_dataset))
+    for env_name in envs:
+        env_dir = os.path.join(args.icl_dataset, env_name)
+        if not os.path.isdir(env_dir):
+            continue
+        for task in sorted(os.listdir(env_dir)):
+            demos_dir = os.path.join(env_dir, task)
+            if not os.path.isdir(demos_dir):
+                continue
+            num_episodes = compile_demos(demos_dir)
+            print(f"Compiled {num_episodes} demonstrations in {demos_dir}")
+
+
+if __name__ == "__main__":
+    main()
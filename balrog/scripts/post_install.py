@@ -31,9 +31,19 @@ def download_textworld_levels():
     os.remove("tw-games.zip")
 
 
+def precompute_texture_atlases():
+    from balrog.environments.nle.render import default_texture_atlas as font_atlas
+    from balrog.environments.nle.render_rgb import default_texture_atlas as tiles_atlas
+
+    print("Precomputing NLE texture atlases...")
+    font_atlas()
+    tiles_atlas()
+
+
 def main():
     download_boxoban_levels()
     download_textworld_levels()
+    precompute_texture_atlases()
 
 
 if __name__ == "__main__":
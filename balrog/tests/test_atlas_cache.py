@@ -0,0 +1,49 @@
+import numpy as np
+
+from balrog.environments.nle import atlas_cache
+from balrog.environments.nle.atlas_cache import load_cached_atlas
+
+
+class CountingBuild:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return np.full((2, 3), self.value, dtype=np.uint8)
+
+
+def test_atlas_is_rebuilt_when_a_source_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(atlas_cache, "atlas_cache_dirs", lambda: [tmp_path / "cache"])
+    source = tmp_path / "tiles.pkl"
+    source.write_bytes(b"tiles")
+
+    build = CountingBuild(1)
+    atlas = load_cached_atlas("tiles_atlas", build, sources=[source])
+    assert isinstance(atlas, np.memmap)
+    load_cached_atlas("tiles_atlas", build, sources=[source])
+    assert build.calls == 1
+
+    # A modified source gets a new cache file, and the stale one is removed
+    source.write_bytes(b"new tiles")
+    build = CountingBuild(2)
+    atlas = load_cached_atlas("tiles_atlas", build, sources=[source])
+    assert build.calls == 1
+    assert (atlas == 2).all()
+    assert len(list((tmp_path / "cache").glob("tiles_atlas-*.npy"))) == 1
+
+
+def test_atlas_is_rebuilt_when_the_format_or_extra_values_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(atlas_cache, "atlas_cache_dirs", lambda: [tmp_path])
+    source = tmp_path / "font.ttf"
+    source.write_bytes(b"font")
+
+    build = CountingBuild(1)
+    load_cached_atlas("font_atlas", build, sources=[source], extra=["10.0.0"])
+    load_cached_atlas("font_atlas", build, sources=[source], extra=["11.0.0"])
+    assert build.calls == 2
+
+    monkeypatch.setattr(atlas_cache, "ATLAS_CACHE_VERSION", atlas_cache.ATLAS_CACHE_VERSION + 1)
+    load_cached_atlas("font_atlas", build, sources=[source], extra=["11.0.0"])
+    assert build.calls == 3
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+baba = pytest.importorskip("baba")
+pytest.importorskip("gym")
+
+from baba.world_object import name_mapping  # noqa: E402
+
+from balrog.environments.babaisai import BabaIsAIWrapper  # noqa: E402
+
+TASKS = [
+    "env/make_win-distr_obj_rule",
+    "env/goto_win-distr_obj_rule",
+    "env/goto_win-distr_obj-irrelevant_rule",
+    "env/make_win-distr_rule",
+]
+
+
+def reference_ruleset(env):
+    """The ruleset text of the implementation `BabaIsAIWrapper.get_ruleset` replaced."""
+    rules = []
+    for rule in env.grid._ruleset["_rule_"]:
+        if "object" not in rule:
+            continue
+        name = rule["object"].removeprefix("f")
+        named_property = name_mapping[rule["property"]]
+        rules.append(f"{name} is {named_property}")
+    return "\n".join(rules)
+
+
+def reference_text_observation(env):
+    """The object descriptions of the cell-by-cell implementation `get_text_observation` replaced.
+
+    Returns None where the old implementation reset the environment because no object is "you".
+    """
+
+    def find_objects(objects):
+        obj = []
+        for j in range(0, env.height):
+            for i in range(0, env.width):
+                cell = env.grid.get(i, j)
+                if cell is not None and cell.type in objects:
+                    if cell.type == "rule_object":
+                        name = f"rule `{cell.name}`"
+                    elif cell.type == "rule_is":
+                        name = f"rule `{name_mapping[cell.name]}`"
+                    elif cell.type == "rule_property":
+                        name = f"rule `{name_mapping[cell.property]}`"
+                    else:
+                        name = cell.type
+                    obj.append(((i, j), name))
+        return obj
+
+    def steps(v):
+        return "steps" if v > 1 else "step"
+
+    you = None
+    for rule in env.grid._ruleset["_rule_"]:
+        if "property" not in rule:
+            continue
+        if name_mapping[rule["property"]] == "you":
+            you = rule["object"]
+
+    my_position = find_objects([you])
+    if len(my_position) == 0:
+        return None
+    my_position = np.asanyarray(my_position[0][0])
+    other_positions = find_objects(["fball", "fwall", "fdoor", "fkey", "rule_object", "rule_is", "rule_property"])
+
+    descriptions = []
+    for position, name in other_positions:
+        x, y = np.asanyarray(position) - my_position
+        name = name.removeprefix("f")
+
+        x_direction = ""
+        if x > 0:
+            x_direction = f"{x} {steps(x)} to the right"
+        elif x < 0:
+            x_direction = f"{-x} {steps(x)} to the left"
+
+        y_direction = ""
+        if y > 0:
+            y_direction = f"{y} {steps(y)} down"
+        elif y < 0:
+            y_direction = f"{-y} {steps(y)} up"
+
+        description = ""
+        if x_direction:
+            description = f"{name} {x_direction}"
+        if y_direction:
+            if x_direction:
+                description += f" and {y_direction}"
+            else:
+                description = f"{name} {y_direction}"
+        descriptions.append(description)
+    return "\n".join(descriptions)
+
+
+def call(func, *args):
+    """Return the result of `func`, or the type of the error it raised."""
+    try:
+        return func(*args)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("task", TASKS)
+@pytest.mark.parametrize("seed", [0, 1])
+def test_text_observation_matches_reference(task, seed):
+    env = baba.make(task)
+    env.seed(seed)
+    env.reset()
+    wrapper = BabaIsAIWrapper(env)
+    rng = np.random.default_rng(seed)
+    for _ in range(100):
+        # The old implementation read the ruleset first, then described the objects
+        ruleset = call(reference_ruleset, env)
+        assert call(wrapper.get_ruleset) == ruleset
+        if isinstance(ruleset, type):
+            break
+
+        text_observation = reference_text_observation(env)
+        if text_observation is None:
+            # Both implementations reset the environment here; check the condition without resetting
+            assert wrapper._parse_ruleset()[1] not in wrapper.index_objects()
+            break
+        assert wrapper.get_text_observation(None) == (text_observation, False)
+
+        _, _, done, _ = env.step(int(rng.integers(len(wrapper.language_action_space))))
+        if done:
+            break
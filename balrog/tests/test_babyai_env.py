@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+import pytest
+
+gym = pytest.importorskip("gymnasium")
+pytest.importorskip("minigrid")
+
+from balrog.environments.babyai_text import babyai_env  # noqa: E402
+from balrog.environments.babyai_text.babyai_env import make_mixed_env  # noqa: E402
+
+GOALS = ["goto", "pickup", "open", "putnext", "pick_up_seq_go_to"]
+FAKE_TASK = "BabyAI-FakeMixedTrainLocal-v0"
+
+
+class FakeMixedEnv(gym.Env):
+    """Picks its kind of mission from the global generator when constructed, like MixedTrainLocal."""
+
+    instances = []
+
+    def __init__(self, render_mode=None):
+        self.action_kinds = [random.choice(GOALS).replace("_", " ")]
+        self.closed = False
+        FakeMixedEnv.instances.append(self)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        return {"mission": f"{self.action_kinds[0]} {self.np_random.integers(1000)}"}, {}
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_mixed_task(monkeypatch):
+    if FAKE_TASK not in gym.envs.registry:
+        gym.register(FAKE_TASK, entry_point=FakeMixedEnv, disable_env_checker=True)
+    monkeypatch.setattr(babyai_env, "_GOAL_SEEDS", {})
+    FakeMixedEnv.instances.clear()
+    return FAKE_TASK
+
+
+def test_mixed_env_construction_seed_is_cached_per_goal(fake_mixed_task):
+    random_state, np_random_state = random.getstate(), np.random.get_state()
+    env = make_mixed_env(fake_mixed_task, "pick_up_seq_go_to")
+    assert env.unwrapped.action_kinds == ["pick up seq go to"]
+    # Every rejected environment is closed, and the global generators are left untouched
+    assert all(instance.closed for instance in FakeMixedEnv.instances[:-1])
+    assert random.getstate() == random_state
+    assert (np.random.get_state()[1] == np_random_state[1]).all()
+
+    # Later environments for the goal take a single construction
+    num_constructions = len(FakeMixedEnv.instances)
+    assert make_mixed_env(fake_mixed_task, "pick_up_seq_go_to").unwrapped.action_kinds == ["pick up seq go to"]
+    assert len(FakeMixedEnv.instances) == num_constructions + 1
+
+
+def make_env_by_rejection(base_task, goal, **kwargs):
+    """The construction `make_mixed_env` replaced: build environments until one has the goal."""
+    while True:
+        env = gym.make(base_task, **kwargs)
+        if env.unwrapped.action_kinds[0].replace(" ", "_") == goal:
+            return env
+        env.close()
+
+
+@pytest.mark.parametrize("goal", GOALS)
+def test_mixed_env_episodes_match_the_previous_construction(goal):
+    if "BabyAI-MixedTrainLocal-v0" not in gym.envs.registry:
+        pytest.skip("BabyAI-MixedTrainLocal-v0 requires BALROG's fork of minigrid")
+    env = make_mixed_env("BabyAI-MixedTrainLocal-v0", goal, num_dists=0)
+    previous_env = make_env_by_rejection("BabyAI-MixedTrainLocal-v0", goal, num_dists=0)
+
+    # The mission and layout of an episode depend only on the goal and the reset seed, not on the seed the
+    # environment was constructed with
+    for seed in range(10):
+        obs, _ = env.reset(seed=seed)
+        previous_obs, _ = previous_env.reset(seed=seed)
+        assert obs["mission"] == previous_obs["mission"]
+        assert (env.unwrapped.grid.encode() == previous_env.unwrapped.grid.encode()).all()
+        assert tuple(env.unwrapped.agent_pos) == tuple(previous_env.unwrapped.agent_pos)
@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from omegaconf import OmegaConf
+from PIL import Image
+
+from balrog.cache import ResponseCache
+from balrog.client import CachedClientWrapper, LLMClientWrapper, LLMResponse, create_llm_client
+from balrog.prompt_builder.history import Message
+
+
+def make_config(**overrides):
+    config = {
+        "client_name": "openai",
+        "model_id": "gpt-4o-mini",
+        "base_url": None,
+        "generate_kwargs": {"temperature": 1.0, "max_tokens": 1024},
+        "timeout": 60,
+        "max_retries": 5,
+        "delay": 2,
+        "alternate_roles": False,
+        "image_format": "png",
+    }
+    config.update(overrides)
+    return OmegaConf.create(config)
+
+
+def make_wrapper(tmp_path, **overrides):
+    config = make_config(**overrides)
+    return CachedClientWrapper(config, LLMClientWrapper(config), ResponseCache(str(tmp_path / "cache.sqlite")))
+
+
+def make_messages(image_value=0):
+    image = Image.fromarray(np.full((8, 8, 3), image_value, dtype=np.uint8))
+    return [
+        Message(role="user", content="You are an agent playing a game."),
+        Message(role="assistant", content="north"),
+        Message(role="user", content="Current observation: a wall to the east.", attachment=image),
+    ]
+
+
+def test_cache_key_is_stable(tmp_path):
+    key = make_wrapper(tmp_path).cache_key(make_messages())
+    assert make_wrapper(tmp_path).cache_key(make_messages()) == key
+
+
+def test_cache_key_depends_on_messages_settings_and_images(tmp_path):
+    key = make_wrapper(tmp_path).cache_key(make_messages())
+    other_messages = make_messages()
+    other_messages[1] = Message(role="assistant", content="south")
+    assert make_wrapper(tmp_path).cache_key(other_messages) != key
+    assert make_wrapper(tmp_path).cache_key(make_messages(image_value=255)) != key
+    assert make_wrapper(tmp_path, model_id="gpt-4o").cache_key(make_messages()) != key
+    assert make_wrapper(tmp_path, generate_kwargs={"temperature": 0.0}).cache_key(make_messages()) != key
+    assert make_wrapper(tmp_path, image_format="webp").cache_key(make_messages()) != key
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_size_mb=3000 / (1024 * 1024))
+    for key in "abc":
+        cache.put(key, key * 1000)
+    assert cache.total_size() == 3000
+
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == "a" * 1000
+    cache.put("d", "d" * 1000)
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in "acd"] == [True, True, True]
+    assert cache.total_size() == 3000
+
+    # Replacing an entry accounts for the size of the value it replaces
+    cache.put("d", "d" * 500)
+    assert cache.total_size() == 2500
+
+    # The running total is shared with another handle on the same database
+    assert ResponseCache(cache.path, max_size_mb=1).total_size() == 2500
+
+
+def test_cache_is_usable_from_several_threads(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.put("a", "value")
+    # Act-only agents call their client from the worker threads of the async engine
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(cache.get, ["a", "a"])) == ["value", "value"]
+
+
+class FakeClient(LLMClientWrapper):
+    def __init__(self, client_config):
+        super().__init__(client_config)
+        self.calls = 0
+
+    def generate(self, messages):
+        self.calls += 1
+        return LLMResponse("fake", f"answer {self.calls}", "stop", 100, 5, None)
+
+
+def test_cached_responses_spend_no_tokens(tmp_path):
+    config = make_config(generate_kwargs={"temperature": 0.0})
+    wrapper = CachedClientWrapper(config, FakeClient(config), ResponseCache(str(tmp_path / "cache.sqlite")))
+    first = wrapper.generate(make_messages())
+    second = wrapper.generate(make_messages())
+    assert (first.completion, first.input_tokens, first.output_tokens) == ("answer 1", 100, 5)
+    assert (second.completion, second.input_tokens, second.output_tokens) == ("answer 1", 0, 0)
+    assert (wrapper.cache_hits, wrapper.cache_misses) == (1, 1)
+    assert (wrapper.cached_input_tokens, wrapper.cached_output_tokens) == (100, 5)
+
+
+def test_only_deterministic_clients_are_cached(tmp_path):
+    def create(temperature):
+        config = make_config(
+            generate_kwargs={"temperature": temperature, "max_tokens": 1024},
+            cache_path=str(tmp_path / "cache.sqlite"),
+            cache_max_size_mb=1,
+            batch_window=0.0,
+        )
+        return create_llm_client(config)()
+
+    assert isinstance(create(0.0), CachedClientWrapper)
+    # Sampled responses must not be replayed for identical prompts
+    assert not isinstance(create(1.0), CachedClientWrapper)
+    assert not isinstance(create(None), CachedClientWrapper)
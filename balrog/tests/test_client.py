@@ -0,0 +1,277 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+from google.genai import errors, types
+from omegaconf import OmegaConf
+from PIL import Image
+
+from balrog import client as client_module
+from balrog.client import (
+    GEMINI_ICL_CACHE_REFRESH,
+    GEMINI_ICL_CACHE_TTL,
+    BatchingClientWrapper,
+    ClaudeWrapper,
+    CompletionsBatcher,
+    GoogleGenerativeAIWrapper,
+    LLMResponse,
+    OpenAIWrapper,
+)
+from balrog.prompt_builder.history import Message
+
+
+def make_config(**overrides):
+    config = {
+        "client_name": "vllm",
+        "model_id": "meta-llama/Llama-3.2-1B-Instruct",
+        "base_url": "http://localhost:8080/v1",
+        "generate_kwargs": {"temperature": 0.0, "max_tokens": 16},
+        "timeout": 60,
+        "max_retries": 1,
+        "delay": 0,
+        "alternate_roles": False,
+        "image_format": "png",
+        "batch_window": 0.05,
+        "max_batch_size": 64,
+    }
+    config.update(overrides)
+    return OmegaConf.create(config)
+
+
+class FakeTokenizer:
+    """Renders a conversation as "role: content" lines and counts one token per character."""
+
+    def apply_chat_template(self, conversation, tokenize=True, add_generation_prompt=True):
+        text = "".join(f"{message['role']}: {message['content']}\n" for message in conversation) + "assistant: "
+        return [ord(char) for char in text]
+
+    def encode(self, text, add_special_tokens=False):
+        return [ord(char) for char in text]
+
+
+class FakeCompletions:
+    """Answers every prompt with its last user line, returning the choices in reverse order."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, model, prompt, max_tokens, temperature=None):
+        self.requests.append(prompt)
+        await asyncio.sleep(0)
+        choices = []
+        for idx, token_ids in enumerate(prompt):
+            text = "".join(chr(token_id) for token_id in token_ids)
+            last_user_line = [line for line in text.splitlines() if line.startswith("user: ")][-1]
+            choices.append(SimpleNamespace(index=idx, text=f" {last_user_line[6:]} ", finish_reason="stop"))
+        return SimpleNamespace(choices=choices[::-1])
+
+
+def make_batcher(**overrides):
+    batcher = CompletionsBatcher(make_config(**overrides))
+    batcher._tokenizer = FakeTokenizer()
+    batcher.async_client = SimpleNamespace(completions=FakeCompletions())
+    batcher._async_initialized = True
+    return batcher
+
+
+class FakeChatClient(OpenAIWrapper):
+    """Chat client answering requests that are not batched."""
+
+    async def agenerate(self, messages):
+        return LLMResponse(self.model_id, "chat", "stop", 1, 1, None)
+
+
+def make_clients(batcher, num_clients, **overrides):
+    config = make_config(**overrides)
+    return [BatchingClientWrapper(config, FakeChatClient(config), batcher) for _ in range(num_clients)]
+
+
+def test_concurrent_requests_are_sent_as_one_completions_request():
+    batcher = make_batcher()
+    clients = make_clients(batcher, 5)
+
+    async def run():
+        return await asyncio.gather(
+            *(client.agenerate([Message(role="user", content=f"observation {idx}")]) for idx, client in enumerate(clients))
+        )
+
+    responses = asyncio.run(run())
+    assert len(batcher.async_client.completions.requests) == 1
+    assert len(batcher.async_client.completions.requests[0]) == 5
+    # Each episode receives the answer to its own conversation
+    assert [response.completion for response in responses] == [f"observation {idx}" for idx in range(5)]
+    assert responses[0].input_tokens == len("user: observation 0\nassistant: ")
+    assert responses[0].output_tokens == len(" observation 0 ")
+
+
+def test_batches_are_limited_to_max_batch_size():
+    batcher = make_batcher(max_batch_size=2)
+    clients = make_clients(batcher, 5)
+
+    async def run():
+        return await asyncio.gather(*(client.agenerate([Message(role="user", content="observation")]) for client in clients))
+
+    asyncio.run(run())
+    assert [len(prompts) for prompts in batcher.async_client.completions.requests] == [2, 2, 1]
+
+
+def test_prefix_is_batched_and_images_are_sent_on_their_own():
+    batcher = make_batcher()
+    client = make_clients(batcher, 1)[0]
+    client.cache_icl_demo([Message(role="user", content="demonstration")])
+
+    response = asyncio.run(client.agenerate([Message(role="user", content="observation")]))
+    prompt = "".join(chr(token_id) for token_id in batcher.async_client.completions.requests[0][0])
+    assert prompt == "user: demonstration\nuser: observation\nassistant: "
+    assert response.completion == "observation"
+
+    image = Image.fromarray(np.zeros((8, 8, 3), dtype=np.uint8))
+    response = asyncio.run(client.agenerate([Message(role="user", content="observation", attachment=image)]))
+    assert response.completion == "chat"
+    assert len(batcher.async_client.completions.requests) == 1
+
+
+def test_alternate_roles_merge_consecutive_messages():
+    client = make_clients(make_batcher(), 1, alternate_roles=True)[0]
+    conversation = client.convert_messages(
+        [Message(role="user", content="instructions"), Message(role="user", content="observation")]
+    )
+    assert conversation == [{"role": "user", "content": "instructions\n\nobservation"}]
+
+
+def make_prefix(last_role="assistant"):
+    image = Image.fromarray(np.zeros((8, 8, 3), dtype=np.uint8))
+    return [
+        Message(role="user", content="demonstration observation", attachment=image),
+        Message(role=last_role, content="demonstration action"),
+    ]
+
+
+def breakpoints(converted_messages):
+    """Return the (message index, block index) of every prompt cache breakpoint."""
+    return [
+        (message_idx, block_idx)
+        for message_idx, message in enumerate(converted_messages)
+        if not isinstance(message["content"], str)
+        for block_idx, block in enumerate(message["content"])
+        if "cache_control" in block
+    ]
+
+
+def test_claude_breakpoint_ends_the_prefix():
+    client = ClaudeWrapper(make_config(client_name="claude"))
+    client.cache_icl_demo(make_prefix())
+    converted_messages = client.convert_with_icl_prefix([Message(role="user", content="observation")])
+    assert breakpoints(converted_messages) == [(1, 0)]
+    assert converted_messages[1]["content"][0]["text"] == "demonstration action"
+
+    # The converted prefix is reused, and the breakpoint is not copied onto the new messages
+    next_messages = client.convert_with_icl_prefix([Message(role="user", content="next observation")])
+    assert next_messages[0] is converted_messages[0]
+    assert breakpoints(next_messages) == [(1, 0)]
+
+
+def test_claude_breakpoint_on_plain_string_content():
+    # A system message is followed by a plain-string "I'm ready!" message, which ends the prefix
+    client = ClaudeWrapper(make_config(client_name="claude"))
+    client.cache_icl_demo(make_prefix(last_role="system"))
+    converted_messages = client.convert_with_icl_prefix([Message(role="user", content="observation")])
+    assert converted_messages[2]["content"] == [
+        {"type": "text", "text": "I'm ready!", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert breakpoints(converted_messages) == [(2, 0)]
+
+
+def test_claude_breakpoint_with_alternate_roles():
+    client = ClaudeWrapper(make_config(client_name="claude", alternate_roles=True))
+    client.cache_icl_demo(make_prefix())
+    converted_messages = client.convert_with_icl_prefix([Message(role="user", content="observation")])
+    assert breakpoints(converted_messages) == [(1, 0)]
+    # The image block ends the first message of the prefix
+    client.cache_icl_demo(make_prefix()[:1])
+    converted_messages = client.convert_with_icl_prefix([Message(role="user", content="observation")])
+    assert breakpoints(converted_messages) == [(0, 1)]
+
+
+def test_claude_breakpoint_on_a_merged_message():
+    # The last block of the prefix may be merged with the first messages into one message
+    client = ClaudeWrapper(make_config(client_name="claude"))
+    converted_prefix = [
+        {"role": "user", "content": [{"type": "text", "text": "demonstration observation"}]},
+        {"role": "assistant", "content": [{"type": "text", "text": "demonstration action"}]},
+    ]
+    converted_messages = [
+        {"role": "user", "content": [{"type": "text", "text": "demonstration observation"}]},
+        {"role": "assistant", "content": [{"type": "text", "text": "demonstration action"}, {"type": "text", "text": "plan"}]},
+        {"role": "user", "content": [{"type": "text", "text": "observation"}]},
+    ]
+    client.mark_icl_prefix_end(converted_messages, converted_prefix)
+    assert breakpoints(converted_messages) == [(1, 0)]
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+        self.updated = []
+
+    def create(self, model, config):
+        self.created.append(config)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    def update(self, name, config):
+        self.updated.append((name, config.ttl))
+
+    def delete(self, name):
+        pass
+
+
+class FakeModels:
+    """Rejects requests referencing an expired cached content, answers the others."""
+
+    def __init__(self, expired=()):
+        self.expired = set(expired)
+        self.requests = []
+
+    def generate_content(self, model, contents, config):
+        self.requests.append(config.cached_content)
+        if config.cached_content in self.expired:
+            message = "CachedContent not found (or permission denied)"
+            raise errors.ClientError(403, {"error": {"code": 403, "message": message, "status": "PERMISSION_DENIED"}})
+        part = SimpleNamespace(text="north", thought=False)
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason="STOP")],
+            usage_metadata=SimpleNamespace(prompt_token_count=10, candidates_token_count=1),
+        )
+
+
+def make_gemini_client(expired=()):
+    client = GoogleGenerativeAIWrapper(make_config(client_name="gemini", max_retries=2))
+    client.client = SimpleNamespace(caches=FakeCaches(), models=FakeModels(expired))
+    client.generation_config = types.GenerateContentConfig(max_output_tokens=16)
+    client._initialized = True
+    client.cache_icl_demo([Message(role="user", content="demonstration")])
+    return client
+
+
+def test_gemini_cached_prefix_is_extended_on_use(monkeypatch):
+    client = make_gemini_client()
+    now = [0.0]
+    monkeypatch.setattr(client_module.time, "monotonic", lambda: now[0])
+
+    client.generate([Message(role="user", content="observation")])
+    assert len(client.client.caches.created) == 1
+    assert client.client.caches.updated == []
+
+    now[0] = GEMINI_ICL_CACHE_REFRESH + 1
+    client.generate([Message(role="user", content="observation")])
+    assert client.client.caches.updated == [("cachedContents/1", f"{GEMINI_ICL_CACHE_TTL}s")]
+    assert client.client.models.requests == ["cachedContents/1", "cachedContents/1"]
+
+
+def test_gemini_expired_cached_prefix_is_recreated(monkeypatch):
+    monkeypatch.setattr(client_module.time, "sleep", lambda seconds: None)
+    client = make_gemini_client(expired={"cachedContents/1"})
+
+    response = client.generate([Message(role="user", content="observation")])
+    assert response.completion == "north"
+    assert client.client.models.requests == ["cachedContents/1", "cachedContents/2"]
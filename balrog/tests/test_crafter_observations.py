@@ -0,0 +1,135 @@
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+import pytest
+
+crafter = pytest.importorskip("crafter")
+pytest.importorskip("gym")
+pytest.importorskip("scipy")
+
+from balrog.environments.crafter import env as crafter_env  # noqa: E402
+from balrog.environments.crafter.env import describe_env, describe_loc_old, describe_loc_precise  # noqa: E402
+
+
+def reference_describe_env(info, unique_items=True, precise_location=False, skip_items=[], edge_only_items=[]):
+    """The cell-by-cell implementation `describe_env` replaced, kept to check that the output is unchanged."""
+    id_to_item = crafter_env.id_to_item
+    player_idx = crafter_env.player_idx
+    assert info["semantic"][info["player_pos"][0], info["player_pos"][1]] == player_idx
+    semantic = info["semantic"][
+        info["player_pos"][0] - info["view"][0] // 2 : info["player_pos"][0] + info["view"][0] // 2 + 1,
+        info["player_pos"][1] - info["view"][1] // 2 + 1 : info["player_pos"][1] + info["view"][1] // 2,
+    ]
+    center = np.array([info["view"][0] // 2, info["view"][1] // 2 - 1])
+    describe_loc = describe_loc_precise if precise_location else describe_loc_old
+    obj_info_list = []
+
+    facing = info["player_facing"]
+    max_x, max_y = semantic.shape
+    target_x = center[0] + facing[0]
+    target_y = center[1] + facing[1]
+    if 0 <= target_x < max_x and 0 <= target_y < max_y:
+        target_id = semantic[int(target_x), int(target_y)]
+        target_item = id_to_item[target_id]
+        if target_id in [id_to_item.index(o) for o in skip_items]:
+            target_item = "nothing"
+        obs = "You face {} at your front.".format(target_item)
+    else:
+        obs = "You face nothing at your front."
+
+    edge_masks = {}
+    for item_name in edge_only_items:
+        item_idx = id_to_item.index(item_name)
+        edge_masks[item_idx] = crafter_env.get_edge_items(semantic, item_idx)
+
+    for i in range(semantic.shape[0]):
+        for j in range(semantic.shape[1]):
+            idx = semantic[i, j]
+            if idx == player_idx:
+                continue
+            if idx in edge_masks and not edge_masks[idx][i, j]:
+                continue
+            if idx in [id_to_item.index(o) for o in skip_items]:
+                continue
+            obj_info_list.append((id_to_item[idx], describe_loc(np.array([0, 0]), np.array([i, j]) - center)))
+
+    def extract_numbers(s):
+        return [int(num) for num in re.findall(r"\d+", s)]
+
+    if unique_items:
+        closest_obj_info_list = defaultdict(str)
+        for item_name, loc in obj_info_list:
+            loc_dist = sum(extract_numbers(loc))
+            current_dist = (
+                sum(extract_numbers(closest_obj_info_list[item_name]))
+                if closest_obj_info_list[item_name]
+                else float("inf")
+            )
+            if loc_dist < current_dist:
+                closest_obj_info_list[item_name] = loc
+        obj_info_list = [(name, loc) for name, loc in closest_obj_info_list.items()]
+
+    if len(obj_info_list) > 0:
+        status_str = "You see:\n{}".format("\n".join(["- {} {}".format(name, loc) for name, loc in obj_info_list]))
+    else:
+        status_str = "You see nothing away from you."
+    return (status_str + "\n\n" + obs.strip()).strip()
+
+
+def describe(describe_env, info, options):
+    """Return the description, or the type of the error (e.g. near the map border, see `describe_frame`)."""
+    try:
+        return describe_env(info, **options)
+    except Exception as e:
+        return type(e)
+
+
+@lru_cache(maxsize=None)
+def seeded_infos(seed, num_steps=60):
+    """Return the infos of a seeded crafter episode played with random actions."""
+    env = crafter.Env(seed=seed)
+    env.reset()
+    rng = np.random.default_rng(seed)
+    infos = []
+    for _ in range(num_steps):
+        _, _, done, info = env.step(int(rng.integers(env.action_space.n)))
+        info["view"] = env._view
+        info["player_facing"] = env._player.facing
+        infos.append(info)
+        if done:
+            break
+    return infos
+
+
+OPTIONS = [
+    {},
+    {"unique_items": False},
+    {"precise_location": True},
+    {"skip_items": ["grass", "sand", "path"]},
+    {"edge_only_items": ["water", "lava"]},
+    {"unique_items": False, "precise_location": True, "skip_items": ["grass"], "edge_only_items": ["water"]},
+]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("options", OPTIONS)
+def test_describe_env_matches_reference(seed, options):
+    for info in seeded_infos(seed):
+        assert describe(describe_env, info, options) == describe(reference_describe_env, info, options)
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+def test_describe_env_matches_reference_on_random_maps(options):
+    # Random maps contain every item type at many distances, including ties between cells
+    rng = np.random.default_rng(0)
+    view = np.array([9, 9])
+    for _ in range(200):
+        semantic = rng.integers(0, len(crafter_env.id_to_item), size=(20, 20))
+        semantic[semantic == crafter_env.player_idx] = 2
+        player_pos = rng.integers(5, 15, size=2)
+        semantic[player_pos[0], player_pos[1]] = crafter_env.player_idx
+        facing = [(0, 1), (0, -1), (1, 0), (-1, 0)][rng.integers(4)]
+        info = {"semantic": semantic, "player_pos": player_pos, "view": view, "player_facing": facing}
+        assert describe_env(info, **options) == reference_describe_env(info, **options)
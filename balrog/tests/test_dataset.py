@@ -0,0 +1,86 @@
+import logging
+import os
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from balrog.dataset import CompiledDemoStore, InContextDataset, compile_demos, episode_events, find_demos
+
+
+def write_recording(path, num_steps, done=True):
+    texts = [{"long_term_context": f"observation {step} ✓"} for step in range(num_steps + 1)]
+    np.savez_compressed(
+        path,
+        text=np.array(texts, dtype=object),
+        action=np.array(["noop"] + [f"action {step}" for step in range(num_steps)]),
+        reward=np.zeros(num_steps + 1),
+        terminated=np.array([False] * num_steps + [done]),
+        truncated=np.zeros(num_steps + 1, dtype=bool),
+    )
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.calls = []
+
+    def update_icl_observation(self, obs):
+        self.calls.append(("observation", obs["text"]["long_term_context"]))
+
+    def update_icl_action(self, action):
+        self.calls.append(("action", action))
+
+    def wrap_episode(self):
+        self.calls.append(("wrap",))
+
+
+def make_dataset(tmp_path, num_recordings=3):
+    demos_dir = tmp_path / "records" / "crafter" / "default"
+    demos_dir.mkdir(parents=True)
+    for idx in range(num_recordings):
+        write_recording(demos_dir / f"20241201T225823-seed{idx}-rew1.00-len{idx + 2}.npz", idx + 2, done=idx != 1)
+    config = OmegaConf.create({"eval": {"icl_dataset": "records"}})
+    return InContextDataset(config, "crafter", str(tmp_path)), str(demos_dir)
+
+
+def replay(dataset, demo_paths, task):
+    agent = RecordingAgent()
+    for demo_path in demo_paths:
+        dataset.load_in_context_learning_episode(demo_path, agent, task=task)
+    return agent.calls
+
+
+def test_compiled_store_matches_recordings(tmp_path):
+    dataset, demos_dir = make_dataset(tmp_path)
+    demo_paths = find_demos(demos_dir)
+    expected = replay(dataset, demo_paths, task=None)
+
+    assert compile_demos(demos_dir) == 3
+    store = CompiledDemoStore(demos_dir)
+    assert store.demo_paths() == demo_paths
+    for demo_path in demo_paths:
+        assert store.episode_events(demo_path) == episode_events(demo_path)
+
+    assert dataset.store("default") is not None
+    assert dataset.icl_episodes("default") == demo_paths
+    assert replay(dataset, demo_paths, task="default") == expected
+
+
+def test_stale_compiled_store_is_ignored(tmp_path, caplog):
+    dataset, demos_dir = make_dataset(tmp_path)
+    compile_demos(demos_dir)
+    assert not CompiledDemoStore(demos_dir).is_stale()
+
+    # A recording added after the compilation
+    write_recording(os.path.join(demos_dir, "20241201T225823-seed9-rew1.00-len4.npz"), 4)
+    assert CompiledDemoStore(demos_dir).is_stale()
+    with caplog.at_level(logging.WARNING):
+        assert dataset.store("default") is None
+    assert "changed since they were compiled" in caplog.text
+    assert dataset.icl_episodes("default") == find_demos(demos_dir)
+
+    # A recording changed in place
+    compile_demos(demos_dir)
+    demo_path = find_demos(demos_dir)[0]
+    mtime_ns = os.stat(demo_path).st_mtime_ns
+    os.utime(demo_path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    assert CompiledDemoStore(demos_dir).is_stale()
@@ -0,0 +1,53 @@
+import importlib
+
+import pytest
+
+
+def reference_nethack_envs(gym):
+    return [env_spec.id for env_spec in gym.envs.registry.all() if "NetHack" in env_spec.id]
+
+
+def reference_minihack_envs(gym):
+    return [env_spec.id for env_spec in gym.envs.registry.all() if env_spec.id.split("-")[0] == "MiniHack"]
+
+
+def reference_babyai_envs(gym):
+    from balrog.environments.babyai_text.babyai_env import MIXED_ENVS, broken_bonus_envs
+
+    envs = []
+    for env_spec in gym.envs.registry:
+        if env_spec.split("-")[0] == "BabyAI" and env_spec not in broken_bonus_envs:
+            envs.append(env_spec)
+    return envs + MIXED_ENVS
+
+
+@pytest.mark.parametrize(
+    "module_name, constant, gym_name, reference, dependency",
+    [
+        ("balrog.environments.nle.nle_env", "NETHACK_ENVS", "gym", reference_nethack_envs, "nle"),
+        ("balrog.environments.minihack.minihack_env", "MINIHACK_ENVS", "gym", reference_minihack_envs, "minihack"),
+        ("balrog.environments.babyai_text.babyai_env", "BABYAI_ENVS", "gymnasium", reference_babyai_envs, "minigrid"),
+    ],
+)
+def test_lazy_env_lists_match_the_registry(module_name, constant, gym_name, reference, dependency):
+    pytest.importorskip(dependency)
+    gym = pytest.importorskip(gym_name)
+    module = importlib.import_module(module_name)
+
+    envs = getattr(module, constant)
+    assert envs == reference(gym)
+    assert len(envs) > 0
+    # The list is computed once
+    assert getattr(module, constant) is envs
+    with pytest.raises(AttributeError):
+        module.UNKNOWN_CONSTANT
+
+
+def test_crafter_item_table_matches_the_environment():
+    crafter = pytest.importorskip("crafter")
+    pytest.importorskip("gym")
+    pytest.importorskip("scipy")
+    from balrog.environments.crafter import env as crafter_env
+
+    assert crafter_env.id_to_item == crafter_env.semantic_item_names(crafter.Env())
+    assert crafter_env.id_to_item[crafter_env.player_idx] == "player"
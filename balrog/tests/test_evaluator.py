@@ -0,0 +1,142 @@
+import asyncio
+import csv
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("crafter")
+pytest.importorskip("gym")
+pytest.importorskip("scipy")
+
+from hydra import compose, initialize  # noqa: E402
+
+from balrog.agents.naive import NaiveAgent  # noqa: E402
+from balrog.client import LLMResponse  # noqa: E402
+from balrog import evaluator as evaluator_module  # noqa: E402
+from balrog.environments import pool as env_pool  # noqa: E402
+from balrog.evaluator import EvaluatorManager  # noqa: E402
+from balrog.prompt_builder import create_prompt_builder  # noqa: E402
+
+ACTIONS = ["Move West", "Move East", "Move North", "Move South", "Do", "Noop"]
+
+
+class FakeClient:
+    """Client answering after `latency` seconds with an action derived from the prompt."""
+
+    def __init__(self, stats, latency=0.02):
+        self.stats = stats
+        self.latency = latency
+
+    def respond(self, messages):
+        action = ACTIONS[sum(len(message.content) for message in messages) % len(ACTIONS)]
+        return LLMResponse("fake", action, "stop", 10, 1, None)
+
+    def generate(self, messages):
+        return self.respond(messages)
+
+    async def agenerate(self, messages):
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.stats["in_flight"] -= 1
+        return self.respond(messages)
+
+
+class FakeAgentFactory:
+    def __init__(self, config):
+        self.config = config
+        self.stats = {"in_flight": 0, "max_in_flight": 0}
+
+    def create_agent(self):
+        return NaiveAgent(lambda: FakeClient(self.stats), create_prompt_builder(self.config.agent))
+
+
+def make_config(episodes_in_flight):
+    with initialize(config_path="../config", version_base=None):
+        config = compose(
+            config_name="config",
+            overrides=[
+                "envs.names=crafter",
+                "envs.env_kwargs.seed=7",
+                "envs.crafter_kwargs.area=[32,32]",
+                "eval.num_episodes.crafter=4",
+                "eval.num_workers=1",
+                f"eval.episodes_in_flight={episodes_in_flight}",
+                "eval.max_steps_per_episode=8",
+                "eval.schedule=fifo",
+            ],
+        )
+    return config
+
+
+def run(tmp_path, episodes_in_flight):
+    config = make_config(episodes_in_flight)
+    agent_factory = FakeAgentFactory(config)
+    results = EvaluatorManager(config, output_dir=str(tmp_path)).run(agent_factory)
+    episodes = sorted(results["crafter"], key=lambda episode_log: episode_log["episode_idx"])
+    return episodes, agent_factory.stats
+
+
+def summary(episode_log):
+    keys = ["task", "episode_idx", "seed", "num_steps", "episode_return", "action_frequency", "progression"]
+    return {key: episode_log[key] for key in keys}
+
+
+def test_async_engine_matches_sequential(tmp_path):
+    sequential, _ = run(tmp_path / "sequential", episodes_in_flight=1)
+    concurrent, stats = run(tmp_path / "async", episodes_in_flight=3)
+
+    assert len(concurrent) == 4
+    assert [summary(episode_log) for episode_log in concurrent] == [summary(episode_log) for episode_log in sequential]
+    # Every slot had a request in flight at the same time
+    assert stats["max_in_flight"] == 3
+
+
+def test_async_engine_runs_environments_off_the_event_loop(tmp_path, monkeypatch):
+    calling_threads = set()
+    make_env = env_pool.make_env
+
+    def recording_make_env(*args, **kwargs):
+        calling_threads.add(threading.get_ident())
+        env = make_env(*args, **kwargs)
+        reset, step = env.reset, env.step
+
+        def recording_reset(*args, **kwargs):
+            calling_threads.add(threading.get_ident())
+            return reset(*args, **kwargs)
+
+        def recording_step(*args, **kwargs):
+            calling_threads.add(threading.get_ident())
+            return step(*args, **kwargs)
+
+        env.reset, env.step = recording_reset, recording_step
+        return env
+
+    monkeypatch.setattr(env_pool, "make_env", recording_make_env)
+    run(tmp_path, episodes_in_flight=2)
+
+    # The event loop runs in the main thread
+    assert calling_threads
+    assert threading.main_thread().ident not in calling_threads
+
+
+@pytest.mark.parametrize("episodes_in_flight", [1, 2])
+def test_trajectory_is_written_before_the_episode_log(tmp_path, monkeypatch, episodes_in_flight):
+    trajectory_lengths = {}
+    dump = json.dump
+
+    def recording_dump(episode_log, f, **kwargs):
+        with open(f.name.removesuffix(".json") + ".csv", newline="", encoding="utf-8") as trajectory:
+            num_rows = len(list(csv.reader(trajectory))) - 1
+        trajectory_lengths[episode_log["episode_idx"]] = (num_rows, episode_log["num_steps"])
+        return dump(episode_log, f, **kwargs)
+
+    monkeypatch.setattr(evaluator_module.json, "dump", recording_dump)
+    run(tmp_path, episodes_in_flight)
+
+    assert len(trajectory_lengths) == 4
+    for num_rows, num_steps in trajectory_lengths.values():
+        assert num_rows == num_steps
@@ -0,0 +1,140 @@
+import base64
+from io import BytesIO
+
+import numpy as np
+import pytest
+from omegaconf import OmegaConf
+from PIL import Image
+
+from balrog.image import ImageEncoder, LazyImage, create_image_encoder, resolve_image
+from balrog.prompt_builder.history import HistoryPromptBuilder
+
+
+class Renderer:
+    """Renders the frame of a live counter, like environments whose render reads their current state."""
+
+    def __init__(self):
+        self.frame = 0
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return np.full((4, 6, 4), self.frame, dtype=np.uint8)
+
+
+def test_lazy_image_is_rendered_once_when_resolved():
+    render = Renderer()
+    image = LazyImage(render)
+    assert render.calls == 0
+
+    resolved = image.resolve()
+    assert isinstance(resolved, Image.Image)
+    assert resolved.mode == "RGB" and resolved.size == (6, 4)
+    assert image.resolve() is resolved
+    assert resolve_image(image) is resolved
+    assert render.calls == 1
+
+
+def test_expired_lazy_image_cannot_be_rendered():
+    render = Renderer()
+    resolved, unresolved = LazyImage(render), LazyImage(render)
+    resolved.resolve()
+    resolved.expire()
+    unresolved.expire()
+
+    # An image resolved before it expired stays available, the other one is gone
+    assert resolved.resolve().getpixel((0, 0)) == (0, 0, 0)
+    with pytest.raises(RuntimeError, match="expired"):
+        unresolved.resolve()
+    assert render.calls == 1
+
+
+def test_resolve_image_passes_other_images_through():
+    image = Image.new("RGB", (2, 2))
+    assert resolve_image(image) is image
+    assert resolve_image(None) is None
+
+
+def test_history_renders_images_while_their_frame_is_current():
+    render = Renderer()
+    builder = HistoryPromptBuilder(max_image_history=1)
+    image = LazyImage(render)
+    builder.update_observation({"text": {"long_term_context": "first"}, "image": image})
+    # The environment moves to the next frame
+    image.expire()
+    render.frame = 1
+
+    assert builder.get_prompt()[-1].attachment.getpixel((0, 0)) == (0, 0, 0)
+
+    # Without images in the history, lazy images are never rendered
+    builder = HistoryPromptBuilder(max_image_history=0)
+    builder.update_observation({"text": {"long_term_context": "first"}, "image": LazyImage(render)})
+    assert render.calls == 1
+
+
+def make_image(width=64, height=48):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+@pytest.mark.parametrize(
+    "format, pil_format, media_type",
+    [("png", "PNG", "image/png"), ("webp", "WEBP", "image/webp"), ("jpeg", "JPEG", "image/jpeg")],
+)
+def test_image_encoder_codecs(format, pil_format, media_type):
+    encoder = ImageEncoder(format=format)
+    assert encoder.media_type == media_type
+    image = make_image()
+    decoded = Image.open(BytesIO(encoder.encode(image)))
+    assert decoded.format == pil_format
+    assert decoded.size == image.size
+    assert base64.b64decode(encoder.encode_base64(image)) == encoder.encode(image)
+    if format == "png":
+        assert (np.asarray(decoded) == np.asarray(image)).all()
+
+
+def test_image_encoder_downscales_large_images():
+    encoder = ImageEncoder(max_size=32)
+    image = make_image(64, 48)
+    assert Image.open(BytesIO(encoder.encode(image))).size == (32, 24)
+    assert image.size == (64, 48)
+
+
+def test_image_encoder_caches_by_image(monkeypatch):
+    encoder = ImageEncoder(cache_size=2)
+    calls = []
+    encode = encoder._encode
+    monkeypatch.setattr(encoder, "_encode", lambda image: calls.append(image) or encode(image))
+
+    first, second, third = make_image(), make_image(), make_image()
+    encoder.encode_base64(first)
+    encoder.encode(first)
+    encoder.encode(second)
+    assert len(calls) == 2
+    # The least recently used image is evicted
+    encoder.encode(third)
+    encoder.encode(second)
+    encoder.encode(first)
+    assert len(calls) == 4
+
+
+def test_image_encoder_does_not_reuse_the_encoding_of_a_freed_image():
+    encoder = ImageEncoder()
+    first = make_image(8, 8)
+    first_bytes = encoder.encode(first)
+    key = id(first)
+    del first
+
+    # A new image may get the id of the freed one
+    second = Image.new("RGB", (8, 8), color=(255, 0, 0))
+    encoder._cache[id(second)] = encoder._cache.pop(key)
+    assert encoder.encode(second) != first_bytes
+    assert Image.open(BytesIO(encoder.encode(second))).getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_create_image_encoder_from_client_config():
+    config = OmegaConf.create({"image_format": "webp", "image_quality": 50, "image_max_size": 128})
+    encoder = create_image_encoder(config)
+    assert (encoder.format, encoder.quality, encoder.compress_level, encoder.max_size) == ("webp", 50, 6, 128)
+    with pytest.raises(ValueError, match="Unsupported image format"):
+        ImageEncoder(format="gif")
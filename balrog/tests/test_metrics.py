@@ -0,0 +1,123 @@
+import re
+import urllib.request
+
+import numpy as np
+import pytest
+
+from balrog import metrics as metrics_module
+from balrog.metrics import METRICS_FILENAME, EvalMetrics, is_step_report, report_step, set_step_sink
+
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="[^"]*"'
+SAMPLE = re.compile(rf"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{{({LABEL}(,{LABEL})*)?\}})? (\S+)$")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metrics_module.time, "time", lambda: now[0])
+    return now
+
+
+def step(env_name, process_num, time, latency, input_tokens=10, output_tokens=2, invalid_action=False):
+    return {
+        "metric": "step",
+        "env_name": env_name,
+        "process_num": process_num,
+        "time": time,
+        "latency": latency,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "invalid_action": invalid_action,
+    }
+
+
+def parse(text):
+    """Parse the Prometheus text format, checking that every sample belongs to a declared metric."""
+    types, samples = {}, {}
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+        elif not line.startswith("# HELP "):
+            match = SAMPLE.match(line)
+            assert match, line
+            name, labels, value = match.group(1), match.group(3), float(match.group(5))
+            base_name = re.sub(r"_(sum|count)$", "", name) if name not in types else name
+            assert base_name in types, f"{name} has no TYPE"
+            samples[(name, labels or "")] = value
+    return types, samples
+
+
+def test_render_follows_the_prometheus_text_format(tmp_path, clock):
+    metrics = EvalMetrics(str(tmp_path), total_episodes=10, window=60.0)
+    latencies = [0.1 * (idx + 1) for idx in range(10)]
+    for idx, latency in enumerate(latencies):
+        metrics.record_step(step("nle", "0", clock[0] + idx, latency, invalid_action=idx == 3))
+    metrics.record_step(step("crafter", "1", clock[0], 1.0, input_tokens=5, output_tokens=1))
+    metrics.record_episode("nle", {"episode_idx": 0})
+    metrics.record_episode("nle", {"error": "boom"})
+    clock[0] += 20
+
+    types, samples = parse(metrics.render())
+    assert types["balrog_llm_latency_seconds"] == "summary"
+    assert types["balrog_steps_total"] == "counter"
+    assert samples[("balrog_episodes_remaining", "")] == 8
+    assert samples[("balrog_episodes_total", 'env="nle"')] == 1
+    assert samples[("balrog_episode_errors_total", 'env="nle"')] == 1
+    assert samples[("balrog_steps_total", 'env="nle"')] == 10
+    assert samples[("balrog_invalid_actions_total", 'env="nle"')] == 1
+    assert samples[("balrog_input_tokens_total", 'env="crafter"')] == 5
+    assert samples[("balrog_steps_per_second", 'env="nle"')] == pytest.approx(10 / 20)
+    assert samples[("balrog_tokens_per_second", 'env="nle"')] == pytest.approx(120 / 20)
+    for q in metrics_module.LATENCY_QUANTILES:
+        assert samples[("balrog_llm_latency_seconds", f'env="nle",quantile="{q:g}"')] == pytest.approx(
+            np.quantile(latencies, q)
+        )
+    assert samples[("balrog_llm_latency_seconds_sum", 'env="nle"')] == pytest.approx(sum(latencies))
+    assert samples[("balrog_llm_latency_seconds_count", 'env="nle"')] == 10
+    assert samples[("balrog_worker_seconds_since_last_step", 'process="0"')] == pytest.approx(11)
+
+
+def test_rates_and_quantiles_only_cover_the_window(tmp_path, clock):
+    metrics = EvalMetrics(str(tmp_path), total_episodes=1, window=60.0)
+    metrics.record_step(step("nle", "0", clock[0], 10.0))
+    clock[0] += 100
+    metrics.record_step(step("nle", "0", clock[0], 1.0))
+    clock[0] += 30
+
+    _, samples = parse(metrics.render())
+    assert samples[("balrog_llm_latency_seconds", 'env="nle",quantile="0.99"')] == 1.0
+    assert samples[("balrog_steps_per_second", 'env="nle"')] == pytest.approx(1 / 60)
+    # The counters are cumulative
+    assert samples[("balrog_llm_latency_seconds_count", 'env="nle"')] == 2
+
+
+def test_metrics_are_written_and_served(tmp_path):
+    metrics = EvalMetrics(str(tmp_path), total_episodes=1, interval=3600.0, port=0)
+    try:
+        metrics.record_episode("nle", {"episode_idx": 0})
+        # The first record writes the file, later ones wait for the interval
+        metrics.record_episode("nle", {"episode_idx": 1})
+        assert "balrog_episodes_total{env=\"nle\"} 1" in (tmp_path / METRICS_FILENAME).read_text()
+
+        host, port = metrics._server.server_address[:2]
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            parse(response.read().decode("utf-8"))
+    finally:
+        metrics.close()
+    assert "balrog_episodes_total{env=\"nle\"} 2" in (tmp_path / METRICS_FILENAME).read_text()
+
+
+def test_steps_are_reported_to_the_sink():
+    reports = []
+    set_step_sink(reports.append)
+    try:
+        report_step("nle", "0", 0.5, 10, 2, False)
+    finally:
+        set_step_sink(None)
+    report_step("nle", "0", 0.5, 10, 2, False)
+
+    assert len(reports) == 1 and is_step_report(reports[0])
+    assert not is_step_report({"episode_idx": 0})
@@ -0,0 +1,109 @@
+from functools import lru_cache
+
+import numpy as np
+import pytest
+
+gym = pytest.importorskip("gym")
+pytest.importorskip("nle")
+
+from nle import nethack  # noqa: E402
+
+from balrog.environments.nle import NLELanguageWrapper  # noqa: E402
+from balrog.environments.nle.render_rgb import IncrementalTileRenderer, rgb_render_image  # noqa: E402
+
+
+def reference_ascii_render(chars):
+    """The character-by-character implementation `NLELanguageWrapper.ascii_render` replaced."""
+    rows, cols = chars.shape
+    result = ""
+    for i in range(rows):
+        for j in range(cols):
+            entry = chr(chars[i, j])
+            result += entry
+        result += "\n"
+    return result
+
+
+@lru_cache(maxsize=None)
+def seeded_observations(seed, num_steps=200):
+    """Return the observations of a seeded NetHack episode played with random moves."""
+    env = gym.make("NetHackChallenge-v0")
+    env.unwrapped.seed(core=seed, disp=seed, reseed=False)
+    rng = np.random.default_rng(seed)
+    # Moving around (and dismissing --More-- prompts) keeps the map changing between steps
+    actions = list(env.unwrapped.actions)
+    moves = [actions.index(action) for action in nethack.CompassDirection] + [actions.index(nethack.MiscAction.MORE)]
+    # NLE updates its observation arrays in place, so each step is copied
+    observations = [{key: value.copy() for key, value in env.reset().items()}]
+    for _ in range(num_steps):
+        obs, _, done, _ = env.step(int(rng.choice(moves)))
+        observations.append({key: value.copy() for key, value in obs.items()})
+        if done:
+            break
+    env.close()
+    return observations
+
+
+@pytest.fixture(scope="module")
+def wrapper():
+    env = gym.make("NetHackChallenge-v0")
+    yield NLELanguageWrapper(env, vlm=True)
+    env.close()
+
+
+def reference_translation(nle_language, obs):
+    """The translation of every observation part from scratch, as before translations were reused."""
+    glyphs, blstats, tty_cursor = obs["glyphs"], obs["blstats"], obs["tty_cursor"]
+    return {
+        "text_glyphs": nle_language.text_glyphs(glyphs, blstats).decode("latin-1"),
+        "text_blstats": nle_language.text_blstats(blstats).decode("latin-1"),
+        "text_inventory": nle_language.text_inventory(obs["inv_strs"], obs["inv_letters"]).decode("latin-1"),
+        "text_cursor": nle_language.text_cursor(glyphs, blstats, tty_cursor).decode("latin-1"),
+    }
+
+
+def test_reused_translations_match_reference():
+    env = gym.make("NetHackChallenge-v0")
+    wrapper = NLELanguageWrapper(env, vlm=True)
+    # Two episodes in a row, as a pooled environment translates them
+    for seed in [0, 1]:
+        wrapper._translations.clear()
+        for obs in seeded_observations(seed):
+            translation = wrapper.nle_obsv_to_language(obs)
+            for key, text in reference_translation(wrapper.nle_language, obs).items():
+                assert translation[key] == text
+    env.close()
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_ascii_render_matches_reference(wrapper, seed):
+    for obs in seeded_observations(seed):
+        assert wrapper.ascii_render(obs["tty_chars"]) == reference_ascii_render(obs["tty_chars"])
+        assert wrapper.ascii_render(obs["tty_chars"][1:]) == reference_ascii_render(obs["tty_chars"][1:])
+
+
+def test_ascii_render_matches_reference_on_every_byte(wrapper):
+    chars = np.arange(256, dtype=np.uint8).reshape(8, 32)
+    assert wrapper.ascii_render(chars) == reference_ascii_render(chars)
+
+
+def test_incremental_tile_renderer_matches_full_render():
+    renderer = IncrementalTileRenderer()
+    # Two episodes in a row, as a pooled environment renders them
+    for seed in [0, 1]:
+        for obs in seeded_observations(seed):
+            np.testing.assert_array_equal(renderer.render(obs["glyphs"]), rgb_render_image(obs["glyphs"]))
+
+    # A grid of another shape is rendered from scratch
+    glyphs = seeded_observations(0)[-1]["glyphs"][:10, :20]
+    np.testing.assert_array_equal(renderer.render(glyphs), rgb_render_image(glyphs))
+
+
+def test_incremental_tile_renderer_does_not_keep_the_caller_glyphs():
+    renderer = IncrementalTileRenderer()
+    first, last = seeded_observations(0)[0]["glyphs"], seeded_observations(0)[-1]["glyphs"]
+    glyphs = first.copy()
+    renderer.render(glyphs)
+    # The renderer must compare against what it rendered, not against the caller's (reused) array
+    glyphs[:] = last
+    np.testing.assert_array_equal(renderer.render(glyphs), rgb_render_image(last))
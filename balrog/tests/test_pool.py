@@ -0,0 +1,129 @@
+import pytest
+from omegaconf import OmegaConf
+
+from balrog.environments import pool as env_pool
+from balrog.environments.pool import EnvPool, close_env_pool, get_env_pool
+
+
+def make_config(reuse_envs=True, crafter_seed=None):
+    return OmegaConf.create(
+        {
+            "eval": {"reuse_envs": reuse_envs},
+            "envs": {
+                "env_kwargs": {"seed": None},
+                "crafter_kwargs": {
+                    "area": [32, 32],
+                    "view": [9, 9],
+                    "size": [64, 64],
+                    "reward": True,
+                    "seed": crafter_seed,
+                    "max_episode_steps": 100,
+                },
+            },
+        }
+    )
+
+
+class FakeEnv:
+    def __init__(self, env_name, task):
+        self.env_name = env_name
+        self.task_name = task
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_make_env(monkeypatch):
+    created = []
+
+    def make_env(env_name, task, config):
+        created.append(FakeEnv(env_name, task))
+        return created[-1]
+
+    monkeypatch.setattr(env_pool, "make_env", make_env)
+    return created
+
+
+def test_reusable_envs_are_reused_per_task(fake_make_env):
+    pool = EnvPool(make_config())
+    env = pool.acquire("crafter", "default")
+    pool.release(env)
+    assert pool.acquire("crafter", "default") is env
+    assert pool.acquire("crafter", "default") is not env
+    assert pool.acquire("nle", "default").env_name == "nle"
+    assert not env.closed
+
+    # TextWorld environments, and all environments when reuse is disabled, are closed after their episode
+    textworld_env = pool.acquire("textworld", "treasure_hunter")
+    pool.release(textworld_env)
+    assert textworld_env.closed
+    no_reuse_pool = EnvPool(make_config(), reuse=False)
+    env = no_reuse_pool.acquire("crafter", "default")
+    no_reuse_pool.release(env)
+    assert env.closed and no_reuse_pool.acquire("crafter", "default") is not env
+
+
+def test_env_is_discarded_when_its_episode_raises(fake_make_env):
+    pool = EnvPool(make_config())
+    with pytest.raises(RuntimeError):
+        with pool.lease("crafter", "default") as env:
+            raise RuntimeError("step failed")
+    assert env.closed
+    assert pool.acquire("crafter", "default") is not env
+
+    with pool.lease("crafter", "default") as env:
+        pass
+    pool.close()
+    assert env.closed
+
+
+def test_pools_are_per_process(fake_make_env, monkeypatch):
+    config = make_config()
+    monkeypatch.setattr(env_pool.os, "getpid", lambda: 1)
+    parent_pool = get_env_pool(config)
+    assert get_env_pool(config) is parent_pool
+    env = parent_pool.acquire("crafter", "default")
+    parent_pool.release(env)
+
+    # A forked child gets its own pool, and never the parent's environments
+    monkeypatch.setattr(env_pool.os, "getpid", lambda: 2)
+    child_pool = get_env_pool(config)
+    assert child_pool is not parent_pool
+    assert child_pool.acquire("crafter", "default") is not env
+    close_env_pool()
+
+    monkeypatch.setattr(env_pool.os, "getpid", lambda: 1)
+    close_env_pool()
+    assert env.closed
+    assert get_env_pool(config) is not parent_pool
+    close_env_pool()
+
+
+def play(env, seed, actions=("Move West", "Do", "Move North", "Noop")):
+    obs, _ = env.reset(seed=seed)
+    texts = [obs["text"]["long_term_context"]]
+    for action in actions:
+        obs, _, _, _, _ = env.step(action)
+        texts.append(obs["text"]["long_term_context"])
+    return texts
+
+
+@pytest.mark.parametrize("crafter_seed", [None, 3])
+def test_reused_crafter_env_matches_a_new_one(crafter_seed):
+    pytest.importorskip("crafter")
+    pytest.importorskip("gym")
+    pytest.importorskip("scipy")
+    config = make_config(crafter_seed=crafter_seed)
+    pool = EnvPool(config)
+
+    env = pool.acquire("crafter", "default")
+    first_episode = play(env, seed=1)
+    pool.release(env)
+    assert pool.acquire("crafter", "default") is env
+    reused_episode = play(env, seed=2)
+
+    assert reused_episode == play(env_pool.make_env("crafter", "default", config), seed=2)
+    # A configured world seed gives every episode the same world, otherwise the episode seed picks it
+    assert (reused_episode == first_episode) == (crafter_seed is not None)
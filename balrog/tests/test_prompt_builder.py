@@ -0,0 +1,195 @@
+import random
+from collections import deque
+
+import pytest
+
+from balrog.prompt_builder.history import HistoryPromptBuilder, Message
+from balrog.prompt_builder.tokenizer import ApproxTokenCounter, create_token_counter
+
+
+class ReferencePromptBuilder:
+    """The implementation `HistoryPromptBuilder` replaced, which rebuilt every message on each `get_prompt`."""
+
+    def __init__(self, max_text_history=16, max_image_history=1, system_prompt=None, max_cot_history=1):
+        self.max_text_history = max_text_history
+        self.max_image_history = max_image_history
+        self.max_history = max(max_text_history, max_image_history)
+        self.system_prompt = system_prompt
+        self._events = deque(maxlen=self.max_history * 2)
+        self._last_short_term_obs = None
+        self.previous_reasoning = None
+        self.max_cot_history = max_cot_history
+
+    def update_observation(self, obs):
+        self._last_short_term_obs = obs["text"].get("short_term_context", "")
+        self._events.append(
+            {"type": "observation", "text": obs["text"].get("long_term_context", ""), "image": obs.get("image")}
+        )
+
+    def update_action(self, action):
+        self._events.append({"type": "action", "action": action, "reasoning": self.previous_reasoning})
+
+    def update_reasoning(self, reasoning):
+        self.previous_reasoning = reasoning
+
+    def reset(self):
+        self._events.clear()
+
+    def get_prompt(self, icl_episodes=False):
+        messages = []
+        if self.system_prompt and not icl_episodes:
+            messages.append(Message(role="user", content=self.system_prompt))
+
+        text_needed = self.max_text_history
+        images_needed = self.max_image_history
+        for event in reversed(self._events):
+            if event["type"] == "observation":
+                event["include_text"] = text_needed > 0 and event.get("text") is not None
+                text_needed -= event["include_text"]
+                event["include_image"] = images_needed > 0 and event.get("image") is not None
+                images_needed -= event["include_image"]
+
+        reasoning_needed = self.max_cot_history
+        for event in reversed(self._events):
+            if event["type"] == "action":
+                if reasoning_needed > 0 and event.get("reasoning") is not None:
+                    reasoning_needed -= 1
+                else:
+                    event["reasoning"] = None
+
+        for idx, event in enumerate(self._events):
+            if event["type"] == "observation":
+                message_parts = []
+                if idx == len(self._events) - 1:
+                    message_parts.append("Current Observation:")
+                    if self._last_short_term_obs:
+                        message_parts.append(self._last_short_term_obs)
+                else:
+                    message_parts.append("Observation:")
+                if event["include_text"]:
+                    message_parts.append(event["text"])
+                image = None
+                if event["include_image"]:
+                    image = event["image"]
+                    message_parts.append("Image observation provided.")
+                message = Message(role="user", content="\n".join(message_parts), attachment=image)
+            else:
+                if event.get("reasoning") is not None:
+                    content = "Previous plan:\n" + event["reasoning"]
+                else:
+                    content = event["action"]
+                message = Message(role="assistant", content=content)
+            messages.append(message)
+        return messages
+
+
+def as_tuples(messages):
+    return [(message.role, message.content, message.attachment) for message in messages]
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        {"max_text_history": 16, "max_image_history": 1, "max_cot_history": 1},
+        {"max_text_history": 4, "max_image_history": 0, "max_cot_history": 0},
+        {"max_text_history": 2, "max_image_history": 3, "max_cot_history": 2},
+        {"max_text_history": 0, "max_image_history": 1, "max_cot_history": 1},
+    ],
+)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_prompt_matches_reference(settings, seed):
+    rng = random.Random(seed)
+    builder = HistoryPromptBuilder(system_prompt="You are an agent.", **settings)
+    reference = ReferencePromptBuilder(system_prompt="You are an agent.", **settings)
+
+    # Episodes as the agents play them: the previous action, the new observation, the prompt, the reasoning
+    for _ in range(3):
+        builder.reset()
+        reference.reset()
+        prev_action = None
+        for step in range(40):
+            if prev_action is not None:
+                builder.update_action(prev_action)
+                reference.update_action(prev_action)
+            obs = {
+                "text": {
+                    "long_term_context": f"long term context {step}",
+                    "short_term_context": rng.choice(["", f"short term context {step}"]),
+                },
+                "image": rng.choice([None, f"image {step}"]),
+            }
+            builder.update_observation(obs)
+            reference.update_observation(obs)
+
+            icl_episodes = rng.random() < 0.2
+            prompt = builder.get_prompt(icl_episodes=icl_episodes)
+            assert as_tuples(prompt) == as_tuples(reference.get_prompt(icl_episodes=icl_episodes))
+
+            # Agents append their instructions to the last message, which must not alter the history
+            prompt[-1].content += "\nInstructions"
+
+            if rng.random() < 0.7:
+                reasoning = f"reasoning {step}"
+                builder.update_reasoning(reasoning)
+                reference.update_reasoning(reasoning)
+            prev_action = rng.choice(["north", "south", "east", "west"])
+
+
+def play_steps(builder, num_steps, observation_length=40):
+    for step in range(num_steps):
+        if step > 0:
+            builder.update_action(f"action {step - 1}")
+        builder.update_observation({"text": {"long_term_context": f"{step} ".ljust(observation_length, "x")}})
+
+
+def count_tokens(message):
+    return len(message.content)
+
+
+@pytest.mark.parametrize("max_prompt_tokens", [0, 60, 100, 150, 200, 10_000])
+def test_prompt_fits_the_token_budget(max_prompt_tokens):
+    builder = HistoryPromptBuilder(
+        max_text_history=16, system_prompt="You are an agent.", max_prompt_tokens=max_prompt_tokens, token_counter=len
+    )
+    play_steps(builder, 10)
+    prompt = builder.get_prompt()
+
+    assert prompt[0].content == "You are an agent."
+    history = prompt[1:]
+    # The current observation is always kept, even when it alone exceeds the budget
+    assert history[-1].role == "user" and history[-1].content.startswith("Current Observation:\n9 ")
+    assert history[0].role == "user"
+    if len(history) > 1:
+        assert sum(map(count_tokens, prompt)) <= max_prompt_tokens
+
+    # The budget only trims the history, which otherwise matches the prompt without a budget
+    unlimited = HistoryPromptBuilder(max_text_history=16, system_prompt="You are an agent.")
+    play_steps(unlimited, 10)
+    assert as_tuples(history) == as_tuples(unlimited.get_prompt()[-len(history) :])
+
+
+def test_trimmed_history_does_not_start_with_an_action():
+    # Observations are much longer than actions, so the budget often ends right after an action
+    builder = HistoryPromptBuilder(max_text_history=16, max_prompt_tokens=130, token_counter=len)
+    play_steps(builder, 10)
+    prompt = builder.get_prompt()
+    assert [message.role for message in prompt] == ["user", "assistant", "user"]
+    assert sum(map(count_tokens, prompt)) + len("action 7") <= 130
+
+
+def test_approx_token_counter():
+    counter = create_token_counter("approx")
+    assert counter is create_token_counter("approx")
+    assert counter("") == 1
+    assert counter("x" * 40) == 11
+    # The approximation is the default counter of a budget
+    builder = HistoryPromptBuilder(max_prompt_tokens=100)
+    assert isinstance(builder.token_counter, ApproxTokenCounter)
+
+
+def test_tiktoken_counter():
+    pytest.importorskip("tiktoken")
+    counter = create_token_counter("cl100k_base")
+    assert counter("hello world") == 2
+    # Special tokens are counted as text instead of being rejected
+    assert counter("<|endoftext|>") > 1
@@ -0,0 +1,74 @@
+import json
+import os
+
+from balrog.results import ResultsIndex
+from balrog.scheduler import load_step_history
+from balrog.utils import collect_and_summarize_results
+
+
+def write_episode(output_dir, env_name, task, episode_idx, progression):
+    episode_log = {
+        "task": task,
+        "episode_idx": episode_idx,
+        "progression": progression,
+        "num_steps": 10,
+        "input_tokens": 100,
+        "output_tokens": 20,
+        "step_timings": {"agent": [0.02] * 10},
+    }
+    path = os.path.join(output_dir, env_name, task, f"{task}_run_{episode_idx:02d}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(episode_log, f)
+    return episode_log
+
+
+def test_reconcile_indexes_episodes_written_before_a_crash(tmp_path):
+    output_dir = str(tmp_path)
+    results_index = ResultsIndex(output_dir)
+    results_index.add("babyai", write_episode(output_dir, "babyai", "BabyAI-MixedTrainLocal-v0/goto", 0, 1.0))
+    results_index.add("crafter", write_episode(output_dir, "crafter", "default", 0, 0.5))
+    # The run crashed after writing these episodes but before indexing them
+    write_episode(output_dir, "babyai", "BabyAI-MixedTrainLocal-v0/goto", 1, 0.0)
+    write_episode(output_dir, "crafter", "default", 1, 0.25)
+
+    env_summaries, _, _ = ResultsIndex(output_dir).summarize()
+    assert env_summaries["babyai"]["episodes_played"] == 1
+
+    # On resume, the existing index is reconciled with the episode files
+    resumed_index = ResultsIndex(output_dir)
+    resumed_index.reconcile(output_dir)
+    env_summaries, _, _ = resumed_index.summarize()
+    assert env_summaries["babyai"]["episodes_played"] == 2
+    assert env_summaries["babyai"]["progression_percentage"] == 50.0
+    assert env_summaries["crafter"]["episodes_played"] == 2
+    assert env_summaries["crafter"]["step_timings"]["agent"]["steps"] == 20
+
+    # Reconciling again does not index anything twice
+    resumed_index.reconcile(output_dir)
+    env_summaries, _, _ = resumed_index.summarize()
+    assert env_summaries["crafter"]["episodes_played"] == 2
+
+
+def test_summary_includes_unindexed_episodes(tmp_path):
+    output_dir = str(tmp_path)
+    ResultsIndex(output_dir).add("crafter", write_episode(output_dir, "crafter", "default", 0, 1.0))
+    write_episode(output_dir, "crafter", "default", 1, 0.0)
+
+    summary = collect_and_summarize_results(output_dir)
+    assert summary["environments"]["crafter"]["episodes_played"] == 2
+    assert summary["average_progress"] == 50.0
+
+
+def test_step_history_is_read_from_the_index(tmp_path):
+    indexed_dir = str(tmp_path / "indexed")
+    os.makedirs(indexed_dir)
+    results_index = ResultsIndex(indexed_dir)
+    for episode_idx, num_steps in enumerate([10, 30]):
+        episode_log = write_episode(indexed_dir, "crafter", "default", episode_idx, 0.0)
+        results_index.add("crafter", {**episode_log, "num_steps": num_steps})
+    unindexed_dir = str(tmp_path / "unindexed")
+    write_episode(unindexed_dir, "crafter", "default", 0, 0.0)
+
+    history = load_step_history([indexed_dir, unindexed_dir])
+    assert sorted(history[("crafter", "default")]) == [10, 10, 30]
@@ -0,0 +1,80 @@
+import json
+import os
+
+from omegaconf import OmegaConf
+
+from balrog.results import ResultsIndex
+from balrog.scheduler import DEFAULT_MAX_STEPS, configured_max_steps, schedule_tasks
+
+
+def make_config(max_steps_per_episode=None):
+    return OmegaConf.create(
+        {
+            "eval": {"max_steps_per_episode": max_steps_per_episode},
+            "envs": {
+                "nle_kwargs": {"max_episode_steps": 100000},
+                "crafter_kwargs": {"max_episode_steps": 2000},
+                "babyai_kwargs": {"num_dists": 0},
+            },
+        }
+    )
+
+
+def write_episode(output_dir, env_name, task, episode_idx, num_steps):
+    episode_log = {"task": task, "episode_idx": episode_idx, "progression": 0.0, "num_steps": num_steps}
+    path = os.path.join(output_dir, env_name, task, f"{task}_run_{episode_idx:02d}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(episode_log, f)
+    return episode_log
+
+
+TASKS = [
+    ("babyai", "goto", 0),
+    ("babyai", "goto", 1),
+    ("crafter", "default", 0),
+    ("nle", "NetHackChallenge-v0", 0),
+    ("babyai", "pickup", 0),
+    ("crafter", "default", 1),
+]
+
+
+def test_configured_max_steps():
+    assert configured_max_steps(make_config(), "crafter") == 2000
+    assert configured_max_steps(make_config(), "babyai") == DEFAULT_MAX_STEPS
+    assert configured_max_steps(make_config(max_steps_per_episode=50), "crafter") == 50
+
+
+def test_without_history_longest_step_limit_goes_first():
+    scheduled = schedule_tasks(TASKS, make_config())
+    # Episodes of equal expected length keep their config order
+    assert scheduled == [
+        ("nle", "NetHackChallenge-v0", 0),
+        ("crafter", "default", 0),
+        ("crafter", "default", 1),
+        ("babyai", "goto", 0),
+        ("babyai", "goto", 1),
+        ("babyai", "pickup", 0),
+    ]
+
+
+def test_recorded_lengths_take_precedence(tmp_path):
+    # A previous run without a results index, and one with
+    json_run, indexed_run = str(tmp_path / "json_run"), str(tmp_path / "indexed_run")
+    write_episode(json_run, "nle", "NetHackChallenge-v0", 0, 300)
+    write_episode(json_run, "babyai", "pickup", 0, 4000)
+    write_episode(json_run, "babyai", "pickup", 1, 6000)
+    results_index = ResultsIndex(indexed_run)
+    results_index.add("crafter", write_episode(indexed_run, "crafter", "default", 0, 1000))
+    results_index.add("nle", write_episode(indexed_run, "nle", "NetHackChallenge-v0", 1, 500))
+
+    scheduled = schedule_tasks(TASKS, make_config(), history_dirs=[json_run, indexed_run, str(tmp_path / "missing")])
+    # pickup: mean of 5000 steps, crafter: 1000, nle: mean of 400, goto: the default step limit
+    assert scheduled == [
+        ("babyai", "pickup", 0),
+        ("crafter", "default", 0),
+        ("crafter", "default", 1),
+        ("nle", "NetHackChallenge-v0", 0),
+        ("babyai", "goto", 0),
+        ("babyai", "goto", 1),
+    ]
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("textworld")
+pytest.importorskip("gym")
+
+from balrog.environments.textworld import base as textworld_base  # noqa: E402
+from balrog.environments.textworld.base import MANIFEST_FILENAME, load_game_manifest  # noqa: E402
+
+
+def add_game(games_path, task, name):
+    path = games_path / task / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"game")
+    # Make sure the directory looks modified even on file systems with coarse timestamps
+    stat = os.stat(path.parent)
+    os.utime(path.parent, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def games_path(tmp_path):
+    add_game(tmp_path, "treasure_hunter", "game_1.ulx")
+    add_game(tmp_path, "treasure_hunter", "game_2.ulx")
+    add_game(tmp_path, "the_cooking_game", "game_1.z8")
+    (tmp_path / "treasure_hunter" / "game_1.json").write_text("{}")
+    return tmp_path
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    scans = []
+    scan_games = textworld_base.scan_games
+
+    def counting_scan_games(games_path):
+        scans.append(games_path)
+        return scan_games(games_path)
+
+    monkeypatch.setattr(textworld_base, "scan_games", counting_scan_games)
+    return scans
+
+
+def test_manifest_is_written_and_reused(games_path, scans):
+    games = load_game_manifest(str(games_path), ["treasure_hunter"])
+    assert games == {
+        "treasure_hunter": [
+            os.path.join("treasure_hunter", "game_1.ulx"),
+            os.path.join("treasure_hunter", "game_2.ulx"),
+        ],
+        "the_cooking_game": [os.path.join("the_cooking_game", "game_1.z8")],
+    }
+    assert (games_path / MANIFEST_FILENAME).is_file()
+    assert load_game_manifest(str(games_path), ["treasure_hunter", "the_cooking_game"]) == games
+    assert len(scans) == 1
+
+
+def test_manifest_is_rebuilt_when_games_change(games_path, scans):
+    load_game_manifest(str(games_path))
+    add_game(games_path, "treasure_hunter", "game_3.ulx")
+    games = load_game_manifest(str(games_path))
+    assert os.path.join("treasure_hunter", "game_3.ulx") in games["treasure_hunter"]
+    assert len(scans) == 2
+
+    # Removing a game modifies its directory too
+    (games_path / "the_cooking_game" / "game_1.z8").unlink()
+    stat = os.stat(games_path / "the_cooking_game")
+    os.utime(games_path / "the_cooking_game", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert "the_cooking_game" not in load_game_manifest(str(games_path))
+    assert len(scans) == 3
+
+
+def test_manifest_is_rebuilt_when_outdated_or_unreadable(games_path, scans):
+    load_game_manifest(str(games_path))
+    # A task that is not in the manifest, e.g. a directory added at the root
+    add_game(games_path, "coin_collector", "game_1.ulx")
+    assert "coin_collector" in load_game_manifest(str(games_path), ["coin_collector"])
+    assert len(scans) == 2
+
+    manifest_path = games_path / MANIFEST_FILENAME
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] = textworld_base.MANIFEST_VERSION + 1
+    manifest_path.write_text(json.dumps(manifest))
+    load_game_manifest(str(games_path))
+    assert len(scans) == 3
+
+    manifest_path.write_text("{")
+    assert "coin_collector" in load_game_manifest(str(games_path))
+    assert len(scans) == 4
+    assert json.loads(manifest_path.read_text())["version"] == textworld_base.MANIFEST_VERSION
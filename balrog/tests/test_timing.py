@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from balrog.timing import PHASES, HISTOGRAM_BOUNDS, StepTimer, histogram_bucket, histogram_labels, timed
+
+
+def test_phases_accumulate_within_a_step():
+    with StepTimer() as timer:
+        with timed("agent"):
+            with timed("llm"):
+                time.sleep(0.01)
+            with timed("llm"):
+                time.sleep(0.01)
+        timer.end_step()
+        with timed("env_step"):
+            pass
+        timer.end_step()
+
+    assert set(timer.durations) == set(PHASES)
+    assert timer.durations["llm"][0] >= 0.02
+    assert timer.durations["agent"][0] >= timer.durations["llm"][0]
+    # Phases a step did not go through are recorded as 0
+    assert timer.durations["llm"][1] == 0.0
+    assert timer.durations["trajectory"] == [0.0, 0.0]
+    assert all(len(durations) == 2 for durations in timer.durations.values())
+
+
+def test_new_phases_are_backfilled():
+    with StepTimer() as timer:
+        timer.end_step()
+        timer.add("custom", 1.5)
+        timer.end_step()
+    assert timer.durations["custom"] == [0.0, 1.5]
+
+
+def test_timed_reports_to_the_innermost_active_timer():
+    # Without a timer, timed blocks are not recorded anywhere
+    with timed("agent"):
+        time.sleep(0.01)
+
+    with StepTimer() as outer:
+        with StepTimer() as inner:
+            with timed("agent"):
+                time.sleep(0.01)
+        # The outer timer is active again once the inner one exits
+        with timed("llm"):
+            time.sleep(0.01)
+    inner.end_step()
+    outer.end_step()
+
+    assert inner.durations["agent"][0] >= 0.01 and inner.durations["llm"] == [0.0]
+    assert outer.durations["agent"] == [0.0] and outer.durations["llm"][0] >= 0.01
+
+
+def sleep_in_thread(phase, seconds):
+    with timed(phase):
+        time.sleep(seconds)
+
+
+async def play_episode(seconds, num_steps=3):
+    with StepTimer() as timer:
+        for _ in range(num_steps):
+            with timed("agent"):
+                await asyncio.sleep(seconds)
+            await asyncio.to_thread(sleep_in_thread, "env_step", seconds)
+            timer.end_step()
+    return timer.durations
+
+
+def test_timers_follow_episodes_into_threads_and_stay_separate():
+    async def run():
+        return await asyncio.gather(play_episode(0.01), play_episode(0.05))
+
+    fast, slow = asyncio.run(run())
+    for durations, seconds in [(fast, 0.01), (slow, 0.05)]:
+        assert len(durations["env_step"]) == 3
+        assert all(seconds <= duration < seconds + 0.04 for duration in durations["env_step"])
+        assert all(seconds <= duration < seconds + 0.04 for duration in durations["agent"])
+
+
+def test_histogram_buckets():
+    labels = histogram_labels()
+    assert len(labels) == len(HISTOGRAM_BOUNDS) + 1 and labels[-1] == "+Inf"
+    assert histogram_bucket(0.0) == 0
+    # Bucket bounds are inclusive
+    assert histogram_bucket(0.001) == 0
+    assert histogram_bucket(0.0011) == 1
+    assert histogram_bucket(1000.0) == len(HISTOGRAM_BOUNDS)
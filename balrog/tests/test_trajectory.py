@@ -0,0 +1,63 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from balrog.trajectory import TRAJECTORY_COLUMNS, TrajectoryWriter
+
+
+@pytest.fixture
+def writer():
+    # A long flush interval, so that only sync and close make the data visible
+    writer = TrajectoryWriter(flush_interval=60.0, max_batch_size=4)
+    yield writer
+    writer.close()
+
+
+def write_episode(writer, path, format, num_steps):
+    trajectory = writer.open(str(path), format)
+    for step in range(num_steps):
+        observation = f'observation, "{step}"\nnext line'
+        trajectory.write_step(step, f"action {step}", "", observation, np.float32(0.5), np.bool_(False))
+    return trajectory
+
+
+def test_csv_rows_are_written_in_order(tmp_path, writer):
+    trajectory = write_episode(writer, tmp_path / "episode", "csv", 50)
+    writer.sync()
+    with open(tmp_path / "episode.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f, escapechar="˘"))
+    assert rows[0] == TRAJECTORY_COLUMNS
+    assert [row[0] for row in rows[1:]] == [str(step) for step in range(50)]
+    assert rows[1] == ["0", "action 0", "", 'observation, "0"\nnext line', "0.5", "False"]
+    trajectory.close()
+
+
+def test_jsonl_rows_are_written_in_order(tmp_path, writer):
+    write_episode(writer, tmp_path / "first", "jsonl", 20)
+    write_episode(writer, tmp_path / "second", "jsonl", 10)
+    writer.sync()
+    for name, num_steps in [("first", 20), ("second", 10)]:
+        with open(tmp_path / f"{name}.jsonl", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert [row["Step"] for row in rows] == list(range(num_steps))
+        # NumPy rewards and done flags are stored as JSON numbers and booleans
+        assert rows[0]["Reward"] == 0.5 and rows[0]["Done"] is False
+
+
+def test_close_writes_and_flushes_everything(tmp_path):
+    writer = TrajectoryWriter(flush_interval=60.0)
+    write_episode(writer, tmp_path / "episode", "csv", 30)
+    writer.save_image(Image.new("RGB", (4, 4)), str(tmp_path / "images" / "step_0000.png"))
+    writer.close()
+
+    with open(tmp_path / "episode.csv", newline="", encoding="utf-8") as f:
+        assert len(list(csv.reader(f, escapechar="˘"))) == 31
+    assert Image.open(tmp_path / "images" / "step_0000.png").size == (4, 4)
+
+
+def test_unsupported_format_is_rejected(tmp_path, writer):
+    with pytest.raises(ValueError, match="Unsupported trajectory format"):
+        writer.open(str(tmp_path / "episode"), "parquet")
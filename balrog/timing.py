@@ -0,0 +1,82 @@
+import contextvars
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Phases timed in every step. "llm" is part of "agent" (the rest being prompt building and answer parsing),
+# and "observation" is part of "env_step".
+PHASES = ("agent", "llm", "env_step", "observation", "trajectory")
+
+# Upper bounds (in seconds) of the buckets of the step duration histograms; the last bucket is unbounded
+HISTOGRAM_BOUNDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+_STEP_TIMER = contextvars.ContextVar("balrog_step_timer", default=None)
+
+
+class StepTimer:
+    """Collects the per-phase durations of the steps of an episode.
+
+    While the timer is active (inside its `with` block), `timed` blocks anywhere in the call stack add their
+    duration to the current step. The timer is held in a context variable, so it follows the episode into
+    `asyncio.to_thread` calls and stays separate between the episodes in flight of the async engine.
+    """
+
+    def __init__(self):
+        self.durations = {phase: [] for phase in PHASES}
+        self._current = {}
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = _STEP_TIMER.get()
+        _STEP_TIMER.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _STEP_TIMER.set(self._previous)
+
+    def add(self, phase, duration):
+        """Add `duration` seconds to `phase` in the current step.
+
+        Args:
+            phase (str): Name of the phase.
+            duration (float): Duration in seconds.
+        """
+        self._current[phase] = self._current.get(phase, 0.0) + duration
+
+    def end_step(self):
+        """Close the current step, recording 0 for the phases it did not go through."""
+        num_steps = len(self.durations["agent"])
+        for phase in self._current:
+            if phase not in self.durations:
+                self.durations[phase] = [0.0] * num_steps
+        for phase, durations in self.durations.items():
+            durations.append(round(self._current.get(phase, 0.0), 6))
+        self._current = {}
+
+
+@contextmanager
+def timed(phase):
+    """Time the enclosed block as `phase` of the current step, if a StepTimer is active.
+
+    Args:
+        phase (str): Name of the phase.
+    """
+    timer = _STEP_TIMER.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(phase, time.perf_counter() - start)
+
+
+def histogram_bucket(duration):
+    """Return the index of the histogram bucket of `duration`, in `HISTOGRAM_BOUNDS` order."""
+    return bisect_left(HISTOGRAM_BOUNDS, duration)
+
+
+def histogram_labels():
+    """Return the labels of the histogram buckets: their upper bounds, then "+Inf"."""
+    return [f"{bound:g}" for bound in HISTOGRAM_BOUNDS] + ["+Inf"]
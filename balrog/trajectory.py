@@ -0,0 +1,209 @@
+import csv
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRAJECTORY_COLUMNS = ["Step", "Action", "Reasoning", "Observation", "Reward", "Done"]
+TRAJECTORY_FORMATS = ("csv", "jsonl")
+
+
+class TrajectoryWriter:
+    """Background thread writing trajectory files and step images.
+
+    The evaluation loop only enqueues rows and images; the writer thread drains the queue in batches,
+    writes through buffered file handles and flushes them every `flush_interval` seconds, so disk I/O
+    (and PNG encoding) never blocks the agent between two LLM calls. The queue is bounded, so a disk that
+    cannot keep up slows the evaluation down instead of filling the memory.
+    """
+
+    def __init__(self, flush_interval=1.0, max_batch_size=256, max_queue_size=4096):
+        """Initialize the TrajectoryWriter and start its thread.
+
+        Args:
+            flush_interval (float, optional): Seconds between flushes of the open files. Defaults to 1.0.
+            max_batch_size (int, optional): Maximum number of queued operations handled per batch.
+                Defaults to 256.
+            max_queue_size (int, optional): Number of pending operations above which enqueueing blocks.
+                Defaults to 4096.
+        """
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._files = {}
+        self._thread = threading.Thread(target=self._run, name="trajectory-writer", daemon=True)
+        self._thread.start()
+
+    def open(self, path, format="csv"):
+        """Open a trajectory file.
+
+        Args:
+            path (str): Path of the file, without extension.
+            format (str, optional): "csv" or "jsonl". Defaults to "csv".
+
+        Returns:
+            TrajectoryFile: Handle to append the steps of the episode to.
+        """
+        if format not in TRAJECTORY_FORMATS:
+            raise ValueError(f"Unsupported trajectory format: {format}. Use one of {list(TRAJECTORY_FORMATS)}.")
+        trajectory = TrajectoryFile(self, f"{path}.{format}", format)
+        self._queue.put(("open", trajectory))
+        return trajectory
+
+    def save_image(self, image, path):
+        """Save an image in the background.
+
+        Args:
+            image (PIL.Image.Image): The image to save. It must not be modified afterwards.
+            path (str): Destination path.
+        """
+        self._queue.put(("image", image, path))
+
+    def sync(self):
+        """Block until every operation enqueued so far is written and flushed."""
+        done = threading.Event()
+        self._queue.put(("sync", done))
+        done.wait()
+
+    def close(self):
+        """Write everything pending, close the open files and stop the thread."""
+        self._queue.put(("stop",))
+        self._thread.join()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for op in batch:
+                try:
+                    if op[0] == "stop":
+                        running = False
+                    else:
+                        self._handle(op)
+                except Exception as e:
+                    logger.error(f"Failed to write trajectory data ({op[0]}): {e}")
+
+            if not running or time.monotonic() - last_flush >= self.flush_interval:
+                for f, _ in self._files.values():
+                    f.flush()
+                last_flush = time.monotonic()
+
+        for f, _ in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _handle(self, op):
+        kind = op[0]
+        if kind == "open":
+            trajectory = op[1]
+            Path(trajectory.path).parent.mkdir(exist_ok=True, parents=True)
+            f = open(trajectory.path, mode="w", newline="", encoding="utf-8")
+            writer = None
+            if trajectory.format == "csv":
+                writer = csv.writer(f, escapechar="˘", quoting=csv.QUOTE_MINIMAL)
+                writer.writerow(TRAJECTORY_COLUMNS)
+            self._files[trajectory.path] = (f, writer)
+        elif kind == "row":
+            f, writer = self._files[op[1]]
+            if writer is not None:
+                writer.writerow(op[2])
+            else:
+                f.write(json.dumps(dict(zip(TRAJECTORY_COLUMNS, op[2])), default=_json_default) + "\n")
+        elif kind == "close":
+            f, _ = self._files.pop(op[1])
+            f.close()
+        elif kind == "image":
+            image, path = op[1], op[2]
+            Path(path).parent.mkdir(exist_ok=True, parents=True)
+            image.save(path)
+        elif kind == "sync":
+            for f, _ in self._files.values():
+                f.flush()
+            op[1].set()
+
+
+def _json_default(value):
+    """Convert the values `json` cannot serialize, such as NumPy rewards and done flags."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+class TrajectoryFile:
+    """Trajectory file of one episode, written by a TrajectoryWriter. Can be used as a context manager."""
+
+    def __init__(self, writer, path, format):
+        self.writer = writer
+        self.path = path
+        self.format = format
+
+    def write_step(self, step, action, reasoning, observation, reward, done):
+        """Append a step to the trajectory."""
+        self.writer._queue.put(("row", self.path, [step, action, reasoning, observation, reward, done]))
+
+    def close(self):
+        """Close the file once the steps enqueued before are written."""
+        self.writer._queue.put(("close", self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NullTrajectory:
+    """Stand-in for a TrajectoryFile when trajectories are not saved."""
+
+    def write_step(self, step, action, reasoning, observation, reward, done):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_TRAJECTORY_WRITERS = {}
+
+
+def get_trajectory_writer():
+    """Return the trajectory writer of the current process, starting it if needed.
+
+    Returns:
+        TrajectoryWriter: The writer of the current process.
+    """
+    pid = os.getpid()
+    if pid not in _TRAJECTORY_WRITERS:
+        _TRAJECTORY_WRITERS[pid] = TrajectoryWriter()
+    return _TRAJECTORY_WRITERS[pid]
+
+
+def close_trajectory_writer():
+    """Write everything pending and stop the trajectory writer of the current process, if any."""
+    writer = _TRAJECTORY_WRITERS.pop(os.getpid(), None)
+    if writer is not None:
+        writer.close()
@@ -40,6 +40,8 @@ setup(
     entry_points={
         "console_scripts": [
             "balrog-post-install=balrog.scripts.post_install:main",
+            "balrog-compile-demos=balrog.scripts.compile_demos:main",
+            "balrog-benchmark-startup=balrog.scripts.benchmark_startup:main",
         ],
     },
     extras_require={